@@ -0,0 +1,230 @@
+"""Token authentication with the token-to-user lookup cached in two tiers.
+
+The shared cache holds each resolved user (with ``profile`` already
+attached, so serializers don't lazy-load it) under a digest of the token,
+next to a random stamp. Each process keeps a small LRU of the same entries.
+A request reads only the stamp from the shared cache when its local entry
+is warm, and stamp plus user together when it isn't, so an authenticated
+request costs one cache round trip and no database queries.
+
+Revoking is deleting the shared entry: every process checks the stamp on
+every request, so a logged-out token stops working everywhere at once.
+Entries are also dropped whenever the user or their profile is saved.
+
+A request that misses reads the user from the database, and a revocation
+can land between that read and its cache write. So revoking also bumps a
+version kept next to the entry. The filling request reads the version
+before going to the database and only writes if it's unchanged; it checks
+again after writing and drops its entry if a revocation slipped in.
+Deleting a Token anywhere (logout, admin, shell, a cascade) revokes it
+through a ``post_delete`` receiver.
+
+The cache is an optimisation, not a dependency: when it can't be reached
+tokens are resolved from the database, and a failed invalidation is
+logged (the entries it missed expire with ``TOKEN_CACHE_TTL``).
+"""
+import hashlib
+import logging
+import pickle
+import secrets
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+logger = logging.getLogger(__name__)
+
+def token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def stamp_key(digest):
+    return f'auth:token:{digest}:stamp'
+
+def user_key(digest):
+    return f'auth:token:{digest}:user'
+
+def version_key(digest):
+    return f'auth:token:{digest}:version'
+
+def owner_key(user_id):
+    return f'auth:user:{user_id}'
+
+class LocalTokenCache:
+    """Per-process LRU of digest -> (stamp, pickled user)"""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+            return entry
+    
+    def set(self, digest, stamp, blob):
+        with self._lock:
+            self._entries[digest] = (stamp, blob)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_local = None
+
+def get_local_cache():
+    # Created on first use so settings are read after Django is configured
+    global _local
+    if _local is None:
+        _local = LocalTokenCache(settings.TOKEN_CACHE_LOCAL_SIZE)
+    return _local
+
+def load_token_user(key):
+    """Resolve a token to its active user with ``profile`` loaded, from the database"""
+    try:
+        token = Token.objects.select_related('user__profile').get(key=key)
+    except Token.DoesNotExist:
+        return None
+    user = token.user
+    if not user.is_active:
+        return None
+    if not hasattr(user, 'profile'):
+        # Cache the missing profile too, so reading it never queries
+        user._state.fields_cache['profile'] = None
+    return user
+
+def resolve_token(key):
+    """Return the active user for a token key, or None, via the cache tiers"""
+    try:
+        return resolve_cached(key)
+    except CacheUnavailable:
+        return load_token_user(key)
+
+class CacheUnavailable(Exception):
+    """The shared cache backend raised; the original error is the cause"""
+
+def shared(operation, *args, **kwargs):
+    """Run a shared cache operation, wrapping whatever the backend raises"""
+    try:
+        return getattr(cache, operation)(*args, **kwargs)
+    except Exception as e:
+        logger.warning('Token cache %s failed: %s', operation, e)
+        raise CacheUnavailable() from e
+
+def resolve_cached(key):
+    digest = token_digest(key)
+    local = get_local_cache()
+    entry = local.get(digest)
+    
+    if entry is not None:
+        found = shared('get_many', [stamp_key(digest), version_key(digest)])
+        stamp = found.get(stamp_key(digest))
+        if stamp is not None and stamp == entry[0]:
+            return pickle.loads(entry[1])
+        local.discard(digest)
+    else:
+        found = shared('get_many', [stamp_key(digest), user_key(digest), version_key(digest)])
+        stamp, blob = found.get(stamp_key(digest)), found.get(user_key(digest))
+        if stamp is not None and blob is not None:
+            local.set(digest, stamp, blob)
+            return pickle.loads(blob)
+    version = found.get(version_key(digest))
+    
+    user = load_token_user(key)
+    if user is None:
+        return None
+    try:
+        cache_user(digest, user, version)
+    except CacheUnavailable:
+        pass
+    return user
+
+def cache_user(digest, user, version):
+    """Cache a user read from the database, unless revoked since ``version`` was read"""
+    if shared('get', version_key(digest)) != version:
+        # Revoked or changed while it was read; this request keeps what it read
+        return
+    
+    stamp = secrets.token_hex(8)
+    blob = pickle.dumps(user)
+    shared('set_many', {
+        stamp_key(digest): stamp,
+        user_key(digest): blob,
+        owner_key(user.pk): digest,
+    }, timeout=settings.TOKEN_CACHE_TTL)
+    if shared('get', version_key(digest)) != version:
+        shared('delete_many', [stamp_key(digest), user_key(digest)])
+        return
+    get_local_cache().set(digest, stamp, blob)
+
+def bump_version(digest):
+    # Outlives any request that read the old version
+    key = version_key(digest)
+    cache.add(key, 0, timeout=settings.TOKEN_CACHE_TTL)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Expired between the two calls
+        cache.set(key, 1, timeout=settings.TOKEN_CACHE_TTL)
+
+def invalidate_digest(digest):
+    get_local_cache().discard(digest)
+    try:
+        bump_version(digest)
+        cache.delete_many([stamp_key(digest), user_key(digest)])
+    except Exception:
+        logger.exception('Token cache invalidation failed')
+
+def invalidate_token(key):
+    invalidate_digest(token_digest(key))
+
+def invalidate_user(user_id):
+    """Drop the cached entry for a user's token, in every process"""
+    invalidate_users([user_id])
+
+def invalidate_users(user_ids):
+    """``invalidate_user`` for many users, with one database query"""
+    user_ids = list(user_ids)
+    # The owner key is only written once an entry is cached, so a token
+    # still being filled is found in the database
+    keys = Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True)
+    digests = {token_digest(key) for key in keys}
+    owners = [owner_key(user_id) for user_id in user_ids]
+    try:
+        digests.update(cache.get_many(owners).values())
+        cache.delete_many(owners)
+    except Exception:
+        logger.exception('Token cache invalidation failed')
+    for digest in digests:
+        invalidate_digest(digest)
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # The key is the primary key, which delete() clears once the signals have run
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that resolves tokens through the cache tiers"""
+    
+    def authenticate_credentials(self, key):
+        user = resolve_token(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return (user, Token(key=key, user=user))
@@ -0,0 +1,290 @@
+"""Personal data exports, streamed into a zip archive.
+
+An account can hold millions of messages and gigabytes of media, so the
+archive is never built in memory. Each table is read with
+``values_list().iterator()``, which uses a server-side cursor on
+PostgreSQL. Rows are encoded as NDJSON in batches, straight into their zip
+entry. Uploaded files are copied into the archive block by block. The
+zip is written to a temporary file on the worker and then saved to storage
+in chunks. Memory is bounded by the batch and block sizes, not by what the
+account holds.
+
+Soft-deleted messages are still held, so the user's own are included
+(with ``is_deleted`` set); ones the other side deleted are left out, as
+they are of the conversation itself.
+
+A finished export is downloaded through a signed link: a
+``TimestampSigner`` token over the export id, valid for
+``DATA_EXPORT_TTL_DAYS``. The link is emailed to the user, and expired
+archives are deleted by a periodic task.
+"""
+import json
+import shutil
+import tempfile
+import uuid
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from content.models import Comment, Media, Post, PostLike
+from creators.models import Creator, CreatorSocialLinks
+from messaging.models import Broadcast, Conversation, Message
+from payments.exports import encode
+from payments.models import Earning, PaymentMethod, Payout, Tip, Transaction
+from subscriptions.models import Subscription, SubscriptionHistory
+from .models import DataExport, User, UserProfile
+
+SIGNING_SALT = 'accounts.data-export'
+COPY_BLOCK_SIZE = 1024 * 1024
+# Missing files are counted; only this many are named in the manifest
+MISSING_LISTED = 1000
+
+class ExportBuilder:
+    """Writes everything held about one user into an open ``ZipFile``"""
+    
+    def __init__(self, user_id, chunk_size=None):
+        self.user_id = user_id
+        self.creator_id = Creator.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+        self.chunk_size = chunk_size or settings.DATA_EXPORT_CHUNK_SIZE
+        self.rows = {}
+        self.files = 0
+        self.missing = 0
+        self.missing_listed = []
+    
+    def sections(self):
+        """(archive path, queryset, fields) per table"""
+        user, creator = self.user_id, self.creator_id
+        conversations = Q(subscriber_id=user)
+        if creator is not None:
+            conversations |= Q(creator_id=creator)
+        messages = Message.objects.filter(
+            Q(is_deleted=False) | Q(sender_id=user),
+            conversation__in=Conversation.objects.filter(conversations)
+        )
+        
+        sections = [
+            ('profile.ndjson', User.objects.filter(pk=user), [
+                'id', 'username', 'email', 'first_name', 'last_name', 'account_type', 'date_of_birth',
+                'is_age_verified', 'profile_picture', 'bio', 'date_joined', 'last_login', 'created_at', 'updated_at'
+            ]),
+            ('settings.ndjson', UserProfile.objects.filter(user_id=user), [
+                'phone_number', 'country', 'city', 'timezone', 'email_notifications', 'push_notifications',
+                'show_subscriber_count', 'show_earnings'
+            ]),
+            ('subscriptions.ndjson', Subscription.objects.filter(subscriber_id=user), [
+                'id', 'creator_id', 'status', 'price', 'created_at', 'current_period_start',
+                'current_period_end', 'cancelled_at'
+            ]),
+            ('subscription_history.ndjson', SubscriptionHistory.objects.filter(subscription__subscriber_id=user), [
+                'id', 'subscription_id', 'action', 'amount', 'timestamp', 'notes'
+            ]),
+            ('conversations.ndjson', Conversation.objects.filter(conversations), [
+                'id', 'creator_id', 'subscriber_id', 'created_at', 'last_message_at'
+            ]),
+            ('messages.ndjson', messages, [
+                'id', 'conversation_id', 'sender_id', 'message_type', 'content', 'media_file',
+                'tip_amount', 'is_deleted', 'created_at'
+            ]),
+            ('likes.ndjson', PostLike.objects.filter(user_id=user), ['id', 'post_id', 'created_at']),
+            ('comments.ndjson', Comment.objects.filter(user_id=user), [
+                'id', 'post_id', 'parent_id', 'content', 'created_at', 'updated_at'
+            ]),
+            ('tips.ndjson', Tip.objects.filter(tipper_id=user), [
+                'id', 'creator_id', 'amount', 'message', 'status', 'created_at', 'completed_at'
+            ]),
+            ('payment_methods.ndjson', PaymentMethod.objects.filter(user_id=user), [
+                'id', 'brand', 'last4', 'exp_month', 'exp_year', 'is_default', 'created_at'
+            ]),
+            ('transactions.ndjson', Transaction.objects.filter(user_id=user), [
+                'id', 'transaction_type', 'amount', 'status', 'subscription_id', 'tip_id', 'payout_id', 'created_at'
+            ]),
+        ]
+        if creator is not None:
+            sections += [
+                ('creator/profile.ndjson', Creator.objects.filter(pk=creator), [
+                    'id', 'display_name', 'category', 'cover_image', 'description', 'subscription_price',
+                    'subscriber_count', 'total_posts', 'total_earnings', 'is_active', 'accepts_tips',
+                    'allows_messages', 'is_adult_content', 'created_at', 'updated_at'
+                ]),
+                ('creator/social_links.ndjson', CreatorSocialLinks.objects.filter(creator_id=creator), [
+                    'website', 'twitter', 'instagram', 'youtube', 'tiktok'
+                ]),
+                ('creator/posts.ndjson', Post.objects.filter(creator_id=creator), [
+                    'id', 'title', 'content', 'post_type', 'visibility', 'likes_count', 'comments_count',
+                    'is_pinned', 'is_archived', 'created_at', 'updated_at'
+                ]),
+                ('creator/media.ndjson', Media.objects.filter(post__creator_id=creator), [
+                    'id', 'post_id', 'media_type', 'file', 'thumbnail', 'file_size', 'duration',
+                    'width', 'height', 'created_at'
+                ]),
+                ('creator/broadcasts.ndjson', Broadcast.objects.filter(creator_id=creator), [
+                    'id', 'message_type', 'content', 'media_file', 'status', 'total_recipients',
+                    'sent_count', 'created_at', 'completed_at'
+                ]),
+                ('creator/tips_received.ndjson', Tip.objects.filter(creator_id=creator), [
+                    'id', 'amount', 'message', 'status', 'platform_fee', 'creator_amount', 'created_at', 'completed_at'
+                ]),
+                ('creator/earnings.ndjson', Earning.objects.filter(creator_id=creator), [
+                    'id', 'earning_type', 'gross_amount', 'platform_fee', 'net_amount', 'subscription_id',
+                    'tip_id', 'is_paid_out', 'payout_id', 'payout_date', 'created_at'
+                ]),
+                ('creator/payouts.ndjson', Payout.objects.filter(creator_id=creator), [
+                    'id', 'amount', 'period_start', 'period_end', 'status', 'earnings_count',
+                    'created_at', 'processed_at'
+                ]),
+            ]
+        return sections
+    
+    def file_sources(self):
+        """(queryset, file fields) for the uploaded files to include"""
+        user, creator = self.user_id, self.creator_id
+        # Broadcast copies share their broadcast's file, so a creator's
+        # broadcast files are taken once, from the broadcasts
+        messages = Q(conversation__subscriber_id=user)
+        if creator is not None:
+            messages |= Q(conversation__creator_id=creator, broadcast__isnull=True)
+        messages &= Q(is_deleted=False) | Q(sender_id=user)
+        sources = [
+            (User.objects.filter(pk=user), ['profile_picture']),
+            (Message.objects.filter(messages), ['media_file', 'media_thumbnail']),
+        ]
+        if creator is not None:
+            sources += [
+                (Creator.objects.filter(pk=creator), ['cover_image']),
+                (Media.objects.filter(post__creator_id=creator), ['file', 'thumbnail']),
+                (Broadcast.objects.filter(creator_id=creator), ['media_file', 'media_thumbnail']),
+            ]
+        return sources
+    
+    def write(self, archive):
+        for path, queryset, fields in self.sections():
+            self.write_rows(archive, path, queryset, fields)
+        
+        for queryset, fields in self.file_sources():
+            # Only rows that have a file, so the cursor skips text messages
+            has_file = Q()
+            for field in fields:
+                has_file |= ~Q(**{field: ''}) & Q(**{f'{field}__isnull': False})
+            rows = queryset.filter(has_file).order_by('pk').values_list(*fields).iterator(chunk_size=self.chunk_size)
+            for names in rows:
+                for name in names:
+                    if name:
+                        self.write_file(archive, name)
+        
+        archive.writestr('manifest.json', json.dumps({
+            'user': self.user_id,
+            'created_at': timezone.now().isoformat(),
+            'rows': self.rows,
+            'files': self.files,
+            'missing_files': self.missing,
+            'missing_file_names': self.missing_listed,
+        }, indent=2))
+    
+    def write_rows(self, archive, path, queryset, fields):
+        rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=self.chunk_size)
+        self.rows[path] = 0
+        
+        def counted(rows):
+            for row in rows:
+                self.rows[path] += 1
+                yield row
+        
+        with archive.open(path, 'w', force_zip64=True) as entry:
+            for chunk in encode(fields, counted(rows), 'ndjson', batch_size=self.chunk_size):
+                entry.write(chunk.encode())
+    
+    def write_file(self, archive, name):
+        # Media is already compressed; storing it saves the worker's CPU
+        info = zipfile.ZipInfo(f'files/{name}', date_time=timezone.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        try:
+            source = default_storage.open(name, 'rb')
+        except OSError:
+            self.missing += 1
+            if len(self.missing_listed) < MISSING_LISTED:
+                self.missing_listed.append(name)
+            return
+        with source, archive.open(info, 'w', force_zip64=True) as entry:
+            shutil.copyfileobj(source, entry, COPY_BLOCK_SIZE)
+        self.files += 1
+
+def build_export(export_id, chunk_size=None):
+    """Build (or rebuild after a failure) an export's archive and email its link"""
+    export = DataExport.objects.select_related('user').get(pk=export_id)
+    if export.status == 'completed':
+        return export
+    DataExport.objects.filter(pk=export.pk).update(status='running', error='')
+    try:
+        with tempfile.TemporaryFile(prefix='export-') as archive_file:
+            with zipfile.ZipFile(archive_file, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                ExportBuilder(export.user_id, chunk_size).write(archive)
+            size = archive_file.tell()
+            archive_file.seek(0)
+            # An unguessable name: the signed link is the way in
+            name = default_storage.save(f'exports/{uuid.uuid4().hex}.zip', File(archive_file))
+    except Exception as e:
+        DataExport.objects.filter(pk=export.pk).update(status='failed', error=f'{type(e).__name__}: {e}'[:2000])
+        raise
+    
+    now = timezone.now()
+    DataExport.objects.filter(pk=export.pk).update(
+        status='completed',
+        file=name,
+        size=size,
+        completed_at=now,
+        expires_at=now + timedelta(days=settings.DATA_EXPORT_TTL_DAYS)
+    )
+    export.refresh_from_db()
+    send_link(export)
+    return export
+
+def download_token(export):
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(export.pk))
+
+def download_url(export):
+    path = reverse('accounts:data-export-download', args=[download_token(export)])
+    return settings.SITE_URL.rstrip('/') + path
+
+def export_for_token(token):
+    """The completed, unexpired export a download token is for, or None"""
+    try:
+        export_id = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=timedelta(days=settings.DATA_EXPORT_TTL_DAYS)
+        )
+    except signing.BadSignature:
+        return None
+    return DataExport.objects.filter(
+        pk=export_id, status='completed', expires_at__gt=timezone.now()
+    ).first()
+
+def send_link(export):
+    user = export.user
+    if not user.is_active:
+        return
+    send_mail(
+        'Your data export is ready',
+        f'Hi {user.first_name or user.username},\n\n'
+        f'The archive of your data is ready. Download it within {settings.DATA_EXPORT_TTL_DAYS} days:\n\n'
+        f'{download_url(export)}\n',
+        None,
+        [user.email]
+    )
+
+def purge_expired():
+    """Delete expired archives and their export records; returns how many"""
+    expired = DataExport.objects.filter(expires_at__lt=timezone.now())
+    purged = 0
+    for export in expired.iterator():
+        if export.file:
+            default_storage.delete(export.file.name)
+        export.delete()
+        purged += 1
+    return purged
@@ -0,0 +1,242 @@
+"""Account deletion: deactivate now, clean up in bounded chunks later.
+
+Deleting a User outright runs Django's cascade collector across every
+subscription, post, message and payment that hangs off it, all in memory
+and under one long transaction. Instead a deletion request only
+deactivates the account, in a single short transaction:
+- the user is anonymized and can't log in
+- their tokens are revoked
+- their creator page is hidden
+- an ``AccountDeletion`` job is recorded
+
+A worker then removes the dependent rows phase by phase. Each chunk is
+``ACCOUNT_DELETION_CHUNK_SIZE`` primary keys, deleted with set-based
+statements (children first, so nothing is left to cascade) in its own
+transaction. Every phase re-selects what is left, so a failed or
+interrupted job resumes where it stopped. Stripe subscriptions are
+cancelled before their rows go. Uploaded files are deleted by a separate
+task once a chunk commits. Counters on other creators' rows (subscribers,
+post likes and comments) drop in the same transaction as the rows they
+counted.
+
+Financial records are kept: tips, earnings, payouts and transactions
+point at the anonymized user and creator rows (with PROTECT, so the rows
+can't be deleted from under them). A tip's personal note is cleared.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from content.models import Comment, Media, Post, PostLike
+from creators.models import Creator, CreatorSocialLinks
+from events.bus import publish
+from messaging.models import Broadcast, Conversation, Message
+from payments.models import PaymentMethod, Tip
+from payments.stripe_client import stripe
+from subscriptions.models import Subscription, SubscriptionHistory
+from .models import AccountDeletion, DataExport, User, UserProfile
+
+def file_names(*files):
+    return [f.name for f in files if f]
+
+def schedule_file_deletion(names):
+    if names:
+        from .tasks import delete_files
+        transaction.on_commit(lambda: delete_files.delay(names), robust=True)
+
+def request_deletion(user):
+    """Deactivate and anonymize ``user`` and queue the cleanup; returns the job"""
+    with transaction.atomic():
+        user = User.objects.select_for_update().get(pk=user.pk)
+        job, created = AccountDeletion.objects.get_or_create(user=user)
+        if not created:
+            return job
+        
+        files = file_names(user.profile_picture)
+        user.username = f'deleted-{user.pk}'
+        user.email = f'deleted-{user.pk}@deleted.invalid'
+        user.first_name = user.last_name = user.bio = ''
+        user.date_of_birth = None
+        user.is_age_verified = False
+        user.profile_picture = None
+        user.is_active = False
+        user.set_unusable_password()
+        user.save()
+        
+        creator = Creator.objects.filter(user=user).first()
+        if creator is not None:
+            files += file_names(creator.cover_image)
+            Creator.objects.filter(pk=creator.pk).update(
+                display_name='Deleted creator',
+                description='',
+                cover_image=None,
+                is_active=False,
+                accepts_tips=False,
+                allows_messages=False,
+                updated_at=timezone.now()
+            )
+        
+        # Dropped from the token cache by the post_delete receiver
+        Token.objects.filter(user=user).delete()
+        
+        schedule_file_deletion(files)
+        publish('user', user.pk, 'account.deletion_requested', {'job': job.pk})
+    return job
+
+class DeletionRun:
+    """One pass of the cleanup phases over a deletion job"""
+    
+    def __init__(self, job, chunk_size=None):
+        self.job = job
+        self.user_id = job.user_id
+        self.creator_id = Creator.objects.filter(user_id=job.user_id).values_list('id', flat=True).first()
+        self.chunk_size = chunk_size or settings.ACCOUNT_DELETION_CHUNK_SIZE
+    
+    def phases(self):
+        """(name, model, rows left to handle, chunk handler), children before parents"""
+        user, creator = self.user_id, self.creator_id
+        phases = [
+            ('subscription_history', SubscriptionHistory, Q(subscription__subscriber_id=user), self.delete),
+            ('subscriptions', Subscription, Q(subscriber_id=user), self.delete_subscriptions),
+            ('messages', Message, Q(conversation__subscriber_id=user), self.delete_messages),
+            ('conversations', Conversation, Q(subscriber_id=user), self.delete),
+            ('likes', PostLike, Q(user_id=user), self.delete_likes),
+            ('comments', Comment, Q(user_id=user), self.delete_comments),
+            ('payment_methods', PaymentMethod, Q(user_id=user), self.delete),
+            ('tip_notes', Tip, Q(tipper_id=user) & ~Q(message=''), self.clear_tip_notes),
+            ('data_exports', DataExport, Q(user_id=user), self.delete_exports),
+        ]
+        if creator is not None:
+            phases += [
+                ('creator_subscription_history', SubscriptionHistory, Q(subscription__creator_id=creator), self.delete),
+                ('creator_subscriptions', Subscription, Q(creator_id=creator), self.delete_subscriptions),
+                ('creator_messages', Message, Q(conversation__creator_id=creator), self.delete_messages),
+                ('creator_conversations', Conversation, Q(creator_id=creator), self.delete),
+                ('broadcasts', Broadcast, Q(creator_id=creator), self.delete_broadcasts),
+                ('post_media', Media, Q(post__creator_id=creator), self.delete_media),
+                ('post_likes', PostLike, Q(post__creator_id=creator), self.delete),
+                ('post_comments', Comment, Q(post__creator_id=creator), self.delete_comments),
+                ('posts', Post, Q(creator_id=creator), self.delete),
+            ]
+        return phases
+    
+    def run(self):
+        for name, model, remaining, handle_chunk in self.phases():
+            AccountDeletion.objects.filter(pk=self.job.pk).update(phase=name)
+            while True:
+                ids = list(model.objects.filter(remaining).order_by('pk').values_list('pk', flat=True)[:self.chunk_size])
+                if not ids:
+                    break
+                if model is Subscription:
+                    # Outside the transaction, so no locks are held over the network
+                    self.cancel_in_stripe(ids)
+                with transaction.atomic():
+                    deleted = handle_chunk(model, ids)
+                    AccountDeletion.objects.filter(pk=self.job.pk).update(
+                        rows_deleted=F('rows_deleted') + deleted
+                    )
+        
+        with transaction.atomic():
+            UserProfile.objects.filter(user_id=self.user_id).delete()
+            if self.creator_id is not None:
+                CreatorSocialLinks.objects.filter(creator_id=self.creator_id).delete()
+                # update() skips auto_now; the list's ETag is built from updated_at
+                Creator.objects.filter(pk=self.creator_id).update(
+                    subscriber_count=0, total_posts=0, updated_at=timezone.now()
+                )
+            AccountDeletion.objects.filter(pk=self.job.pk).update(
+                status='completed', phase='', completed_at=timezone.now()
+            )
+    
+    # Chunk handlers: given the model and primary keys, return rows deleted.
+    # Earlier phases have removed the children, so each DELETE has nothing
+    # left to cascade to.
+    
+    def delete(self, model, ids):
+        return model.objects.filter(pk__in=ids).delete()[0]
+    
+    def cancel_in_stripe(self, ids):
+        # Stop billing before the rows go; one that's already gone in Stripe is fine
+        for stripe_id in Subscription.objects.filter(
+            pk__in=ids, status__in=['active', 'pending']
+        ).values_list('stripe_subscription_id', flat=True):
+            try:
+                stripe.Subscription.cancel(stripe_id)
+            except stripe.error.InvalidRequestError:
+                pass
+    
+    def delete_subscriptions(self, model, ids):
+        live = Subscription.objects.filter(pk__in=ids, status__in=['active', 'pending'])
+        # The deleted creator's own count is zeroed at the end
+        live = live.exclude(creator_id=self.creator_id)
+        for row in live.values('creator_id').annotate(n=Count('id')).order_by():
+            Creator.objects.filter(pk=row['creator_id']).update(
+                subscriber_count=Greatest(F('subscriber_count') - row['n'], 0),
+                updated_at=timezone.now()
+            )
+        return self.delete(model, ids)
+    
+    def delete_messages(self, model, ids):
+        # Broadcast copies share the broadcast's file, which goes with the broadcast
+        schedule_file_deletion(self.files(
+            Message.objects.filter(pk__in=ids, broadcast__isnull=True), 'media_file', 'media_thumbnail'
+        ))
+        return self.delete(model, ids)
+    
+    def delete_broadcasts(self, model, ids):
+        schedule_file_deletion(self.files(Broadcast.objects.filter(pk__in=ids), 'media_file', 'media_thumbnail'))
+        return self.delete(model, ids)
+    
+    def delete_media(self, model, ids):
+        schedule_file_deletion(self.files(Media.objects.filter(pk__in=ids), 'file', 'thumbnail'))
+        return self.delete(model, ids)
+    
+    def delete_likes(self, model, ids):
+        self.uncount(PostLike.objects.filter(pk__in=ids), 'likes_count')
+        return self.delete(model, ids)
+    
+    def delete_comments(self, model, ids):
+        # Replies go with the comment they answer, deepest level first
+        levels, level = [], ids
+        while level:
+            levels.append(level)
+            level = list(Comment.objects.filter(parent_id__in=level).values_list('pk', flat=True))
+        self.uncount(Comment.objects.filter(pk__in=[pk for level in levels for pk in level]), 'comments_count')
+        return sum(self.delete(model, level) for level in reversed(levels))
+    
+    def uncount(self, rows, field):
+        # Take rows about to go off their posts' counters; the deleted creator's posts go entirely
+        rows = rows.exclude(post__creator_id=self.creator_id)
+        for row in rows.values('post_id').annotate(n=Count('id')).order_by():
+            Post.objects.filter(pk=row['post_id']).update(**{
+                field: Greatest(F(field) - row['n'], 0),
+                'updated_at': timezone.now(),
+            })
+    
+    def delete_exports(self, model, ids):
+        schedule_file_deletion(self.files(DataExport.objects.filter(pk__in=ids), 'file'))
+        return self.delete(model, ids)
+    
+    def clear_tip_notes(self, model, ids):
+        Tip.objects.filter(pk__in=ids).update(message='')
+        return 0
+    
+    def files(self, queryset, *fields):
+        return [name for names in queryset.values_list(*fields) for name in names if name]
+
+def run_deletion(job_id, chunk_size=None):
+    """Run (or resume) a deletion job"""
+    job = AccountDeletion.objects.get(pk=job_id)
+    if job.status == 'completed':
+        return job
+    AccountDeletion.objects.filter(pk=job.pk).update(status='running', last_error='')
+    try:
+        DeletionRun(job, chunk_size).run()
+    except Exception as e:
+        AccountDeletion.objects.filter(pk=job.pk).update(status='failed', last_error=f'{type(e).__name__}: {e}'[:2000])
+        raise
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,7 @@
+"""Reactions to account events, run by the outbox dispatcher"""
+from events.bus import handles
+from .tasks import delete_account
+
+@handles('account.deletion_requested')
+def start_deletion(event):
+    delete_account.delay(event.payload['job'])
@@ -0,0 +1,217 @@
+"""Bulk import of users and creators from another platform.
+
+Records are streamed from a CSV or NDJSON file and written in chunks: one
+transaction per chunk with ``bulk_create`` for User, UserProfile, Creator
+and CreatorSocialLinks. Plain-text passwords are hashed on a process pool,
+one chunk ahead of the database writes; already-hashed passwords in a
+format Django understands are stored as they are.
+
+Emails that already exist are skipped rather than merged, and inserts
+ignore conflicts with concurrent signups, so replaying a chunk is
+harmless. The number of records committed is checkpointed after every
+chunk so an interrupted import resumes where it stopped.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import transaction
+
+from creators.models import Creator, CreatorSocialLinks
+from .models import User, UserProfile
+
+USER_FIELDS = ['first_name', 'last_name', 'bio']
+SOCIAL_FIELDS = ['website', 'twitter', 'instagram', 'youtube', 'tiktok']
+CATEGORIES = {value for value, _ in settings.CONTENT_CATEGORIES}
+
+def read_records(path, file_format=None):
+    """Yield one dict per record from a .csv or .ndjson/.jsonl file"""
+    file_format = file_format or ('csv' if path.endswith('.csv') else 'ndjson')
+    with open(path, newline='') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def to_bool(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+def to_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def is_hashed(value):
+    try:
+        identify_hasher(value)
+        return True
+    except ValueError:
+        return False
+
+def hash_password(password):
+    # make_password(None) gives an unusable password, for accounts that
+    # have to reset before their first login
+    return make_password(password or None)
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+def write_checkpoint(path, done):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(str(done))
+    os.replace(tmp, path)
+
+class UserImporter:
+    def __init__(self, path, file_format=None, chunk_size=2000, workers=None, checkpoint=None):
+        self.path = path
+        self.file_format = file_format
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint = checkpoint or f'{path}.checkpoint'
+        self.stats = {'created': 0, 'existing': 0, 'conflicts': 0, 'invalid': 0, 'creators': 0}
+        self.done = read_checkpoint(self.checkpoint)
+    
+    def chunks(self):
+        records = islice(read_records(self.path, self.file_format), self.done, None)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def run(self, progress=None):
+        """Import everything after the checkpoint; ``progress(importer)`` runs after each chunk"""
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) as pool:
+            pending = None
+            for chunk in self.chunks():
+                hashes = self.hash_chunk(pool, chunk)
+                if pending is not None:
+                    self.commit(*pending)
+                    if progress:
+                        progress(self)
+                # Hash this chunk on the pool while the previous one is written
+                pending = (chunk, hashes)
+            if pending is not None:
+                self.commit(*pending)
+                if progress:
+                    progress(self)
+        return self.stats
+    
+    def hash_chunk(self, pool, chunk):
+        # Accounts that already exist are skipped, so don't spend hashing on them
+        existing = set(User.objects.filter(email__in=[
+            User.objects.normalize_email((record.get('email') or '').strip()) for record in chunk
+        ]).values_list('email', flat=True))
+        passwords = [record.get('password') or '' for record in chunk]
+        plain = [
+            i for i, password in enumerate(passwords)
+            if password and not is_hashed(password)
+            and User.objects.normalize_email((chunk[i].get('email') or '').strip()) not in existing
+        ]
+        futures = pool.map(hash_password, [passwords[i] for i in plain], chunksize=64)
+        return passwords, plain, futures
+    
+    def commit(self, chunk, hashes):
+        passwords, plain, futures = hashes
+        for i, hashed in zip(plain, futures):
+            passwords[i] = hashed
+        # Unusable passwords don't need the pool
+        passwords = [password or hash_password(None) for password in passwords]
+        
+        with transaction.atomic():
+            self.write_chunk(chunk, passwords)
+        self.done += len(chunk)
+        write_checkpoint(self.checkpoint, self.done)
+    
+    def write_chunk(self, chunk, passwords):
+        users = {}
+        records = {}
+        for record, password in zip(chunk, passwords):
+            email = User.objects.normalize_email((record.get('email') or '').strip())
+            username = (record.get('username') or '').strip()
+            if not email or not username or email in users:
+                self.stats['invalid'] += 1
+                continue
+            account_type = 'creator' if record.get('account_type') == 'creator' else 'subscriber'
+            users[email] = User(
+                email=email,
+                username=username,
+                password=password,
+                account_type=account_type,
+                date_of_birth=to_date(record.get('date_of_birth')),
+                **{field: record.get(field) or '' for field in USER_FIELDS}
+            )
+            records[email] = record
+        
+        existing = set(User.objects.filter(email__in=list(users)).values_list('email', flat=True))
+        self.stats['existing'] += len(existing)
+        new_users = [user for email, user in users.items() if email not in existing]
+        User.objects.bulk_create(new_users, batch_size=1000, ignore_conflicts=True)
+        
+        # ignore_conflicts doesn't return ids; read back the rows this chunk inserted
+        user_ids = dict(User.objects.filter(
+            email__in=[user.email for user in new_users]
+        ).values_list('email', 'id'))
+        inserted = [user for user in new_users if user.email in user_ids]
+        self.stats['created'] += len(inserted)
+        self.stats['conflicts'] += len(new_users) - len(inserted)
+        
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user_ids[user.email], country=records[user.email].get('country') or '')
+            for user in inserted
+        ], batch_size=1000, ignore_conflicts=True)
+        
+        creators = [user for user in inserted if user.account_type == 'creator']
+        Creator.objects.bulk_create([
+            self.build_creator(user_ids[user.email], user, records[user.email])
+            for user in creators
+        ], batch_size=1000, ignore_conflicts=True)
+        self.stats['creators'] += len(creators)
+        
+        creator_ids = dict(Creator.objects.filter(
+            user_id__in=[user_ids[user.email] for user in creators]
+        ).values_list('user_id', 'id'))
+        CreatorSocialLinks.objects.bulk_create([
+            CreatorSocialLinks(
+                creator_id=creator_ids[user_ids[user.email]],
+                **{field: records[user.email].get(field) or '' for field in SOCIAL_FIELDS}
+            )
+            for user in creators
+            if user_ids[user.email] in creator_ids
+        ], batch_size=1000, ignore_conflicts=True)
+    
+    def build_creator(self, user_id, user, record):
+        category = record.get('category')
+        try:
+            price = Decimal(record.get('subscription_price') or '9.99')
+        except InvalidOperation:
+            price = Decimal('9.99')
+        return Creator(
+            user_id=user_id,
+            display_name=(record.get('display_name') or user.full_name or user.username)[:100],
+            category=category if category in CATEGORIES else 'lifestyle',
+            description=(record.get('description') or '')[:1000],
+            subscription_price=min(max(price, Decimal('4.99')), Decimal('49.99')),
+            accepts_tips=to_bool(record.get('accepts_tips'), True),
+            allows_messages=to_bool(record.get('allows_messages'), True),
+            is_adult_content=to_bool(record.get('is_adult_content'), False)
+        )
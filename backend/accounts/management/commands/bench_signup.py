@@ -0,0 +1,88 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User, UserProfile
+from accounts.serializers import UserRegistrationSerializer
+
+PREFIX = 'bench-signup-'
+
+def legacy_signup(data):
+    """The previous registration path, kept for comparison"""
+    if User.objects.filter(email=data['email']).exists():
+        return
+    if User.objects.filter(username=data['username']).exists():
+        return
+    user = User.objects.create_user(username=data['username'], email=data['email'])
+    user.set_password(data['password'])
+    user.save()
+    UserProfile.objects.create(user=user)
+    Token.objects.get_or_create(user=user)
+
+def current_signup(data):
+    """What RegisterView does, without the HTTP layer"""
+    serializer = UserRegistrationSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    with transaction.atomic():
+        user = serializer.save()
+        Token.objects.create(user=user)
+
+class Command(BaseCommand):
+    help = 'Benchmark registration throughput and queries per signup, previous path vs current'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--signups', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=1, help='Threads (needs PostgreSQL above 1)')
+        parser.add_argument('--real-hashing', action='store_true',
+                            help='Use the configured password hasher instead of a fast one')
+    
+    def handle(self, *args, **options):
+        hashers = None if options['real_hashing'] else ['django.contrib.auth.hashers.MD5PasswordHasher']
+        with override_settings(PASSWORD_HASHERS=hashers) if hashers else override_settings():
+            try:
+                for label, signup in [('legacy', legacy_signup), ('current', current_signup)]:
+                    self.run(label, signup, options['signups'], options['concurrency'])
+            finally:
+                User.objects.filter(username__startswith=PREFIX).delete()
+    
+    def run(self, label, signup, count, concurrency):
+        def payload():
+            name = f'{PREFIX}{uuid.uuid4().hex[:12]}'
+            return {
+                'username': name,
+                'email': f'{name}@example.com',
+                'password': 'bench-password-1',
+                'password_confirm': 'bench-password-1',
+            }
+        
+        # Queries per signup, measured serially
+        with CaptureQueriesContext(connection) as queries:
+            signup(payload())
+        query_count = len(queries)
+        
+        def worker(n):
+            try:
+                for _ in range(n):
+                    signup(payload())
+            finally:
+                connection.close()
+        
+        shares = [count // concurrency + (i < count % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            for _ in range(count):
+                signup(payload())
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(worker, shares))
+        elapsed = time.perf_counter() - started
+        
+        self.stdout.write(
+            f'{label}: {query_count} queries/signup, {count / elapsed:,.0f} signups/s '
+            f'({elapsed / count * 1000:.2f}ms each, concurrency {concurrency})'
+        )
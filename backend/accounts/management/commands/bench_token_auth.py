@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from accounts.authentication import CachedTokenAuthentication
+from accounts.models import User, UserProfile
+from accounts.serializers import UserSerializer
+
+class Command(BaseCommand):
+    help = 'Compare DB queries and time per request for TokenAuthentication and CachedTokenAuthentication'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(
+            email='bench-token-auth@example.com',
+            defaults={'username': 'bench-token-auth'}
+        )
+        UserProfile.objects.get_or_create(user=user)
+        token, _ = Token.objects.get_or_create(user=user)
+        factory = APIRequestFactory()
+        
+        for label, backend in [
+            ('TokenAuthentication', TokenAuthentication()),
+            ('CachedTokenAuthentication', CachedTokenAuthentication()),
+        ]:
+            count = options['requests']
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(count):
+                    request = factory.get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+                    authed_user, _ = backend.authenticate(request)
+                    # What a typical /auth/profile/ response touches
+                    UserSerializer(authed_user).data
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label}: {len(queries) / count:.2f} queries/request, '
+                f'{elapsed / count * 1e6:.0f}us/request'
+            )
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.imports import UserImporter
+
+class Command(BaseCommand):
+    help = 'Bulk import users and creators from a CSV or NDJSON file (resumable)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Default: from the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--checkpoint', help='Progress file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+    
+    def handle(self, *args, **options):
+        importer = UserImporter(
+            options['path'],
+            file_format=options['format'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            checkpoint=options['checkpoint']
+        )
+        if options['restart']:
+            importer.done = 0
+        elif importer.done:
+            self.stdout.write(f'Resuming after {importer.done} records')
+        
+        started = time.perf_counter()
+        resumed_at = importer.done
+        
+        def progress(importer):
+            elapsed = time.perf_counter() - started
+            rate = (importer.done - resumed_at) / elapsed if elapsed else 0
+            self.stdout.write(f'{importer.done} records ({rate:,.0f} rows/s)')
+        
+        try:
+            stats = importer.run(progress=progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Import stopped after {importer.done} records: {e}')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} users ({stats['creators']} creators); "
+            f"{stats['existing']} already existed, {stats['conflicts']} username conflicts, "
+            f"{stats['invalid']} invalid in {time.perf_counter() - started:.1f}s"
+        ))
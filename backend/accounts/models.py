@@ -1,6 +1,22 @@
+from django.contrib.auth import models as auth_models
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        if 'is_active' not in kwargs:
+            return super().update(**kwargs)
+        # Bulk updates skip save(), so drop cached token lookups here
+        user_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        from .authentication import invalidate_users
+        transaction.on_commit(lambda: invalidate_users(user_ids))
+        return updated
+
+class UserManager(auth_models.UserManager.from_queryset(UserQuerySet)):
+    pass
 
 class User(AbstractUser):
     ACCOUNT_TYPE_CHOICES = [
@@ -31,12 +47,23 @@ class User(AbstractUser):
     # For creators
     stripe_account_id = models.CharField(max_length=255, blank=True, null=True)
     
+    objects = UserManager()
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
     def __str__(self):
         return f"{self.username} ({self.get_account_type_display()})"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        
+        if not is_new:
+            # Cached token lookups carry a copy of the user
+            from .authentication import invalidate_user
+            transaction.on_commit(lambda: invalidate_user(self.pk))
+    
     @property
     def is_creator(self):
         return self.account_type == 'creator'
@@ -66,3 +93,61 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
+    
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        
+        if not is_new:
+            # The profile is part of the user's representation, so its
+            # validators (ETag/Last-Modified) have to change with it
+            User.objects.filter(pk=self.user_id).update(updated_at=timezone.now())
+            from .authentication import invalidate_user
+            transaction.on_commit(lambda: invalidate_user(self.user_id))
+
+class AccountDeletion(models.Model):
+    """A deleted account's cleanup, run in chunks by a worker after the account is deactivated"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    # The user row is kept, anonymized, for the financial records that point at it
+    user = models.OneToOneField(User, on_delete=models.PROTECT, related_name='deletion')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    phase = models.CharField(max_length=50, blank=True)
+    rows_deleted = models.PositiveBigIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    requested_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Deletion of user {self.user_id} ({self.status})"
+
+class DataExport(models.Model):
+    """A user's personal data archive, built by a worker and downloaded through a signed link"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='exports/', blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    requested_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-requested_at']
+    
+    def __str__(self):
+        return f"Data export {self.pk} of user {self.user_id} ({self.status})"
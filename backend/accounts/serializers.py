@@ -1,6 +1,43 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, UserProfile
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from .data_export import download_url
+from .models import DataExport, User, UserProfile
+
+_unique_constraints = None
+
+def unique_constraints():
+    """The user table's single-column unique constraint and index names -> field name"""
+    global _unique_constraints
+    if _unique_constraints is None:
+        columns = {field.column: field.name for field in User._meta.concrete_fields}
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        _unique_constraints = {
+            name: columns[constraint['columns'][0]]
+            for name, constraint in constraints.items()
+            if constraint['unique'] and len(constraint['columns']) == 1
+        }
+    return _unique_constraints
+
+def violated_field(error, user):
+    """The field whose unique constraint an IntegrityError on saving ``user`` broke, or None"""
+    constraints = unique_constraints()
+    # psycopg reports the constraint; other drivers may only name it in the message
+    name = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+    if name is None:
+        message = str(error)
+        name = next((n for n in sorted(constraints, key=len, reverse=True) if n in message), None)
+    if name is not None:
+        return constraints.get(name)
+    
+    # Nothing to go on (SQLite names the column, not the constraint): look
+    for field in ('email', 'username'):
+        if User.objects.filter(**{field: getattr(user, field)}).exists():
+            return field
+    return None
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -12,28 +49,37 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             'username', 'email', 'password', 'password_confirm',
             'first_name', 'last_name', 'account_type', 'date_of_birth'
         ]
+        # Uniqueness is enforced by the database on insert instead of a
+        # query per field up front
+        extra_kwargs = {
+            'email': {'validators': []},
+            'username': {'validators': [UnicodeUsernameValidator()]},
+        }
     
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
             raise serializers.ValidationError("Passwords don't match")
         return attrs
     
-    def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email already exists")
-        return value
-    
-    def validate_username(self, value):
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("Username already exists")
-        return value
-    
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
+        validated_data['email'] = User.objects.normalize_email(validated_data['email'])
+        validated_data['username'] = User.normalize_username(validated_data['username'])
+        user = User(**validated_data)
         user.set_password(password)
-        user.save()
+        
+        try:
+            # A savepoint, so the transaction can still be queried after a conflict
+            with transaction.atomic():
+                user.save()
+        except IntegrityError as e:
+            field = violated_field(e, user)
+            if field == 'email':
+                raise serializers.ValidationError({'email': ["Email already exists"]})
+            if field == 'username':
+                raise serializers.ValidationError({'username': ["Username already exists"]})
+            raise
         
         # Create user profile
         UserProfile.objects.create(user=user)
@@ -83,4 +129,20 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         model = User
         fields = [
             'first_name', 'last_name', 'bio', 'profile_picture'
-        ]
\ No newline at end of file
+        ]
+
+class DataExportSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DataExport
+        fields = [
+            'id', 'status', 'size', 'requested_at', 'completed_at',
+            'expires_at', 'download_url'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or obj.expires_at is None or obj.expires_at <= timezone.now():
+            return None
+        return download_url(obj)
@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.core.files.storage import default_storage
+from .data_export import build_export, purge_expired
+from .deletion import run_deletion
+
+@shared_task(acks_late=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def delete_account(job_id):
+    """Remove a deactivated account's data in chunks (resumes where it stopped)"""
+    return run_deletion(job_id).status
+
+@shared_task(acks_late=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def delete_files(names):
+    """Delete uploaded files from storage; missing files are skipped"""
+    for name in names:
+        default_storage.delete(name)
+
+@shared_task(acks_late=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def build_data_export(export_id):
+    """Stream a user's data into a zip archive and email the download link"""
+    return build_export(export_id).status
+
+@shared_task
+def purge_data_exports():
+    """Delete data export archives whose links have expired"""
+    return purge_expired()
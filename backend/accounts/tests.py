@@ -1,3 +1,282 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import IntegrityError
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+
+from content.models import Comment, Post, PostLike
+from creators.models import Creator
+from messaging.models import Conversation, Message
+from payments.models import Earning, Tip, Transaction
+from payments.stripe_client import get_stripe
+from subscriptions.models import Subscription
+from . import authentication
+from .authentication import get_local_cache, invalidate_token, resolve_token
+from .data_export import build_export, download_token
+from .deletion import DeletionRun, request_deletion, run_deletion
+from .models import AccountDeletion, DataExport, User
+from .serializers import UserRegistrationSerializer
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        get_local_cache().clear()
+        self.user = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        self.key = Token.objects.create(user=self.user).key
+
+    def tearDown(self):
+        get_local_cache().clear()
+
+    def test_revocation_during_a_miss_is_not_cached(self):
+        load = authentication.load_token_user
+
+        def load_then_revoke(key):
+            # The token is revoked after this request read it from the database
+            user = load(key)
+            Token.objects.filter(key=key).delete()
+            invalidate_token(key)
+            return user
+
+        with mock.patch.object(authentication, 'load_token_user', side_effect=load_then_revoke):
+            self.assertEqual(resolve_token(self.key), self.user)
+        self.assertIsNone(resolve_token(self.key))
+
+    def test_revocation_after_the_check_is_undone(self):
+        set_many = authentication.cache.set_many
+
+        def revoke_then_set_many(*args, **kwargs):
+            # Revoked between the version check and the cache write
+            Token.objects.filter(key=self.key).delete()
+            invalidate_token(self.key)
+            return set_many(*args, **kwargs)
+
+        with mock.patch.object(authentication.cache, 'set_many', side_effect=revoke_then_set_many):
+            self.assertEqual(resolve_token(self.key), self.user)
+        self.assertIsNone(resolve_token(self.key))
+
+    def test_bulk_deactivation_drops_cached_users(self):
+        self.assertEqual(resolve_token(self.key), self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(resolve_token(self.key))
+
+    def test_deleting_the_token_revokes_it(self):
+        self.assertEqual(resolve_token(self.key), self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(key=self.key).delete()
+        self.assertIsNone(resolve_token(self.key))
+
+    def test_falls_back_to_the_database_when_the_cache_is_down(self):
+        self.assertEqual(resolve_token(self.key), self.user)
+        get_local_cache().clear()
+        error = ConnectionError('Connection refused')
+        with mock.patch.object(authentication.cache, 'get_many', side_effect=error), \
+                mock.patch.object(authentication.cache, 'delete_many', side_effect=error):
+            self.assertEqual(resolve_token(self.key), self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                Token.objects.filter(key=self.key).delete()
+            self.assertIsNone(resolve_token(self.key))
+
+    def test_cached_after_a_clean_miss(self):
+        self.assertEqual(resolve_token(self.key), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_token(self.key), self.user)
+
+class RegistrationConflictTests(TestCase):
+    data = {
+        'username': 'fan', 'email': 'fan@example.com', 'password': 'password123',
+        'password_confirm': 'password123',
+    }
+
+    def create(self, constraint_name, message):
+        # psycopg reports the violated constraint on the cause's diag
+        cause = Exception(message)
+        if constraint_name is not None:
+            cause.diag = mock.Mock(constraint_name=constraint_name)
+        error = IntegrityError(message)
+        error.__cause__ = cause
+        serializer = UserRegistrationSerializer(data=self.data)
+        self.assertTrue(serializer.is_valid())
+        constraints = {'accounts_user_email_key': 'email', 'accounts_user_username_key': 'username'}
+        with mock.patch('accounts.serializers.unique_constraints', return_value=constraints), \
+                mock.patch.object(User, 'save', side_effect=error):
+            serializer.save()
+
+    def test_maps_the_constraint_to_its_field(self):
+        with self.assertRaises(serializers.ValidationError) as raised:
+            self.create('accounts_user_email_key', 'duplicate key value violates unique constraint')
+        self.assertIn('email', raised.exception.detail)
+
+        with self.assertRaises(serializers.ValidationError) as raised:
+            self.create('accounts_user_username_key', 'duplicate key (email)=(fan@example.com)')
+        self.assertIn('username', raised.exception.detail)
+
+    def test_other_constraints_are_not_mistaken_for_email(self):
+        with self.assertRaises(IntegrityError):
+            self.create('accounts_userprofile_user_id_key', 'Key (email)=(fan@example.com) is still referenced')
+
+    def test_without_diag_the_message_names_the_constraint(self):
+        with self.assertRaises(serializers.ValidationError) as raised:
+            self.create(None, 'duplicate key value violates unique constraint "accounts_user_email_key"')
+        self.assertIn('email', raised.exception.detail)
+
+    def test_without_a_constraint_name_the_table_is_checked(self):
+        User.objects.create_user(username='fan', email='other@example.com', password='password123')
+        serializer = UserRegistrationSerializer(data=self.data)
+        self.assertTrue(serializer.is_valid())
+        # Whatever the backend reports, a real conflict comes back as a field error
+        with self.assertRaises(serializers.ValidationError) as raised:
+            serializer.save()
+        self.assertIn('username', raised.exception.detail)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class DataExportTests(TestCase):
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        self.user = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        conversation = Conversation.objects.create(creator=creator, subscriber=self.user)
+        self.kept = [
+            Message.objects.create(conversation=conversation, sender=creator_user, content='hi'),
+            Message.objects.create(conversation=conversation, sender=self.user, content='mine', is_deleted=True),
+        ]
+        Message.objects.create(conversation=conversation, sender=creator_user, content='oops', is_deleted=True)
+        self.export = build_export(DataExport.objects.create(user=self.user).pk)
+
+    def test_leaves_out_messages_the_other_side_deleted(self):
+        with self.export.file.open('rb') as f, zipfile.ZipFile(f) as archive:
+            rows = [json.loads(line) for line in archive.read('messages.ndjson').splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(message.pk for message in self.kept))
+
+    def test_download_streams_under_asgi(self):
+        url = reverse('accounts:data-export-download', args=[download_token(self.export)])
+
+        async def fetch():
+            response = await AsyncClient().get(url)
+            self.assertEqual(response.status_code, 200)
+            # An async iterator, so the ASGI handler doesn't read the file into memory
+            self.assertTrue(response.is_async)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        body = async_to_sync(fetch)()
+        with self.export.file.open('rb') as f:
+            self.assertEqual(body, f.read())
+        self.assertIn('manifest.json', zipfile.ZipFile(io.BytesIO(body)).namelist())
+
+        response = self.client.get(url)
+        self.assertFalse(response.is_async)
+        self.assertEqual(b''.join(response.streaming_content), body)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AccountDeletionTests(TestCase):
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator = Creator.objects.create(user=creator_user, display_name='Creator', subscriber_count=1)
+        self.user = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123', first_name='Fan'
+        )
+        self.key = Token.objects.create(user=self.user).key
+        now = timezone.now()
+        Subscription.objects.create(
+            subscriber=self.user, creator=self.creator, stripe_subscription_id='sub_1', status='active',
+            price=5, current_period_start=now, current_period_end=now + timedelta(days=30)
+        )
+
+        self.post = Post.objects.create(creator=self.creator, content='Hello', likes_count=2, comments_count=4)
+        PostLike.objects.create(user=self.user, post=self.post)
+        PostLike.objects.create(user=creator_user, post=self.post)
+        first = Comment.objects.create(user=self.user, post=self.post, content='first')
+        # A reply goes with the comment it answers
+        Comment.objects.create(user=creator_user, post=self.post, parent=first, content='thanks')
+        Comment.objects.create(user=self.user, post=self.post, content='second')
+        Comment.objects.create(user=creator_user, post=self.post, content='mine')
+
+        self.tip = Tip.objects.create(
+            tipper=self.user, creator=self.creator, amount=5, message='for you', status='completed'
+        )
+        Earning.objects.create(
+            creator=self.creator, earning_type='tip', gross_amount=5, platform_fee=Decimal('0.60'),
+            net_amount=Decimal('4.40'), tip=self.tip
+        )
+        Transaction.objects.create(
+            user=self.user, transaction_type='tip_payment', amount=5, status='completed', tip=self.tip
+        )
+
+        patcher = mock.patch.object(get_stripe().Subscription, 'cancel')
+        self.cancel = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_cleaned_up(self):
+        self.creator.refresh_from_db()
+        self.assertEqual(self.creator.subscriber_count, 0)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+        self.assertFalse(Subscription.objects.filter(subscriber=self.user).exists())
+        self.assertFalse(PostLike.objects.filter(user=self.user).exists())
+        self.assertEqual(list(Comment.objects.values_list('content', flat=True)), ['mine'])
+
+        # Financial records stay, pointing at the anonymized user
+        self.tip.refresh_from_db()
+        self.assertEqual(self.tip.message, '')
+        self.assertTrue(Earning.objects.filter(tip=self.tip).exists())
+        self.assertTrue(Transaction.objects.filter(user=self.user, tip=self.tip).exists())
+
+    def test_anonymizes_and_cleans_up_keeping_financial_records(self):
+        job = request_deletion(self.user)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.username, f'deleted-{self.user.pk}')
+        self.assertEqual((self.user.email, self.user.first_name), (f'deleted-{self.user.pk}@deleted.invalid', ''))
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(self.user.has_usable_password())
+        self.assertFalse(Token.objects.filter(key=self.key).exists())
+
+        self.assertEqual(run_deletion(job.pk).status, 'completed')
+        self.cancel.assert_called_once_with('sub_1')
+        self.assert_cleaned_up()
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_a_run_stopped_mid_phase_resumes_without_counting_twice(self):
+        job = request_deletion(self.user)
+        delete = DeletionRun.delete
+        comments_deleted = []
+
+        def fail_second_comment(run, model, ids):
+            if model is Comment:
+                # The first chunk deletes the comment and its reply; fail on the next
+                comments_deleted.append(ids)
+                if len(comments_deleted) == 3:
+                    raise RuntimeError('Worker lost')
+            return delete(run, model, ids)
+
+        with mock.patch.object(DeletionRun, 'delete', fail_second_comment), self.assertRaises(RuntimeError):
+            run_deletion(job.pk, chunk_size=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.phase), ('failed', 'comments'))
+        self.post.refresh_from_db()
+        # The first comment's chunk committed, the failed one rolled back whole
+        self.assertEqual(self.post.comments_count, 2)
+
+        self.assertEqual(run_deletion(job.pk, chunk_size=1).status, 'completed')
+        self.assert_cleaned_up()
+        self.assertEqual(AccountDeletion.objects.get(pk=job.pk).last_error, '')
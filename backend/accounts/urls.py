@@ -10,4 +10,6 @@ urlpatterns = [
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('profile/settings/', views.UserProfileUpdateView.as_view(), name='profile-settings'),
     path('verify-age/', views.verify_age, name='verify-age'),
+    path('exports/', views.DataExportListCreateView.as_view(), name='data-exports'),
+    path('exports/download/<str:token>/', views.download_data_export, name='data-export-download'),
 ]
\ No newline at end of file
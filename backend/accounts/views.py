@@ -3,9 +3,18 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
-from django.contrib.auth import login, logout
-from .models import User, UserProfile
+from django.contrib.auth import logout
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse
+from creator_platform.conditional import ConditionalGetMixin
+from creator_platform.ratelimit import ScopedRateLimit
+from creator_platform.streaming import is_asgi, iterate_async
+from .data_export import export_for_token
+from .deletion import request_deletion
+from .models import DataExport, User, UserProfile
 from .serializers import (
+    DataExportSerializer,
     UserRegistrationSerializer,
     UserLoginSerializer,
     UserSerializer,
@@ -19,14 +28,19 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    # No session or token lookup, so rate-limited requests never reach the DB
+    authentication_classes = []
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'register'
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
         
-        # Create auth token
-        token, created = Token.objects.get_or_create(user=user)
+        # User, profile and token are written together or not at all
+        with transaction.atomic():
+            user = serializer.save()
+            token = Token.objects.create(user=user)
         
         return Response({
             'user': UserSerializer(user).data,
@@ -37,17 +51,20 @@ class RegisterView(generics.CreateAPIView):
 class LoginView(generics.GenericAPIView):
     serializer_class = UserLoginSerializer
     permission_classes = [permissions.AllowAny]
+    # Checked before the serializer hashes the password
+    authentication_classes = []
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'login'
     
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         
-        # Create or get auth token
+        # Reuse the existing token; clients authenticate with it, so no
+        # session is created
         token, created = Token.objects.get_or_create(user=user)
         
-        login(request, user)
-        
         return Response({
             'user': UserSerializer(user).data,
             'token': token.key,
@@ -58,22 +75,26 @@ class LoginView(generics.GenericAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def logout_view(request):
     try:
-        # Delete the user's token
-        token = Token.objects.get(user=request.user)
-        token.delete()
+        # Delete the user's token; the post_delete receiver drops it from the cache
+        Token.objects.get(user=request.user).delete()
     except Token.DoesNotExist:
         pass
     
     logout(request)
     return Response({'message': 'Logout successful'})
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    """The user's own account; DELETE (with ``password``) deletes it"""
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
         return self.request.user
     
+    def get_version(self):
+        # Profile saves touch the user, and the user is already loaded
+        return self.request.user.updated_at, None
+    
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -82,6 +103,21 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         self.perform_update(serializer)
         
         return Response(UserSerializer(instance).data)
+    
+    def destroy(self, request, *args, **kwargs):
+        if not request.user.check_password(request.data.get('password') or ''):
+            return Response(
+                {'error': 'Password is incorrect'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # The account is deactivated now; its data is removed in the background
+        job = request_deletion(request.user)
+        logout(request)
+        return Response({
+            'message': 'Account scheduled for deletion',
+            'deletion_id': job.pk
+        }, status=status.HTTP_202_ACCEPTED)
 
 class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
@@ -91,6 +127,52 @@ class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
         profile, created = UserProfile.objects.get_or_create(user=self.request.user)
         return profile
 
+class DataExportListCreateView(generics.ListCreateAPIView):
+    """List the user's data exports or request a new one.
+    
+    The archive is built by a worker; the download link is emailed when it
+    is ready, and shown here too.
+    """
+    serializer_class = DataExportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'data_export'
+    
+    def get_queryset(self):
+        return DataExport.objects.filter(user=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        # One export at a time; a repeated request gets the one in progress
+        export = self.get_queryset().filter(status__in=['pending', 'running']).first()
+        if export is None:
+            from .tasks import build_data_export
+            with transaction.atomic():
+                export = DataExport.objects.create(user=request.user)
+                transaction.on_commit(lambda: build_data_export.delay(export.pk), robust=True)
+        
+        return Response(self.get_serializer(export).data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def download_data_export(request, token):
+    """Stream an export archive; the signed token in the link is the credential"""
+    export = export_for_token(token)
+    if export is None:
+        return Response(
+            {'error': 'Download link is invalid or has expired'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    response = FileResponse(
+        default_storage.open(export.file.name, 'rb'),
+        as_attachment=True,
+        filename=f'data-export-{export.requested_at:%Y%m%d}.zip'
+    )
+    if is_asgi(request):
+        # ASGI would read the sync file iterator into memory whole
+        response.streaming_content = iterate_async(response.streaming_content)
+    return response
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def verify_age(request):
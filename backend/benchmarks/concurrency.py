@@ -0,0 +1,125 @@
+"""WSGI vs ASGI throughput under mixed, I/O-bound load.
+
+Both stacks are driven in-process with the same request mix: the async
+hot reads (featured creators, unread badge), the sync DRF creator list,
+and cancel/reactivate pairs that wait on a fake Stripe with a fixed
+latency. WSGI runs like a threaded worker, one thread per in-flight
+request; ASGI runs every in-flight request on one event loop.
+
+Each worker owns one active subscription and always cancels and then
+reactivates it, so the data is left as it was found.
+"""
+import asyncio
+import threading
+import time
+
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from subscriptions.models import Subscription, SubscriptionHistory
+from .runner import FakeStripe, summarize
+
+def request_cycle(subscription_id):
+    """One round of the mix, as (method, path) pairs"""
+    return [
+        ('get', '/api/creators/featured/'),
+        ('get', '/api/messaging/unread/'),
+        ('get', '/api/creators/'),
+        ('get', '/api/creators/trending/'),
+        ('post', f'/api/subscriptions/{subscription_id}/cancel/'),
+        ('post', f'/api/subscriptions/{subscription_id}/reactivate/'),
+    ]
+
+class ConcurrencyBenchmark:
+    def __init__(self, concurrency=32, cycles=20, stripe_latency=0.15, log=None):
+        self.concurrency = concurrency
+        self.cycles = cycles
+        self.stripe_latency = stripe_latency
+        self.log = log or (lambda message: None)
+    
+    def prepare(self):
+        subscriptions = list(Subscription.objects.filter(
+            status='active'
+        ).select_related('subscriber').order_by('id')[:self.concurrency])
+        if len(subscriptions) < self.concurrency:
+            raise ValueError(f'Need {self.concurrency} active subscriptions, found {len(subscriptions)}')
+        self.tokens = []
+        self.workers = []
+        for subscription in subscriptions:
+            token, created = Token.objects.get_or_create(user=subscription.subscriber)
+            if created:
+                self.tokens.append(token.pk)
+            self.workers.append((token.key, request_cycle(subscription.pk) * self.cycles))
+        self.subscription_ids = [subscription.pk for subscription in subscriptions]
+    
+    def cleanup(self, started_at):
+        SubscriptionHistory.objects.filter(
+            subscription_id__in=self.subscription_ids, timestamp__gte=started_at
+        ).delete()
+        Token.objects.filter(pk__in=self.tokens).delete()
+    
+    def run(self):
+        started_at = timezone.now()
+        self.prepare()
+        try:
+            with FakeStripe(latency=self.stripe_latency):
+                return {'wsgi': self.run_wsgi(), 'asgi': self.run_asgi()}
+        finally:
+            self.cleanup(started_at)
+    
+    def report(self, label, durations, errors, elapsed):
+        result = summarize(durations)
+        result['errors'] = errors
+        result['requests_per_second'] = round(len(durations) / elapsed, 1)
+        self.log(f'{label}: {result["requests_per_second"]} req/s, p50 {result["p50_ms"]}ms, '
+                 f'p95 {result["p95_ms"]}ms, {errors} errors (concurrency {self.concurrency})')
+        return result
+    
+    def run_wsgi(self):
+        durations, errors = [], []
+        lock = threading.Lock()
+        
+        def worker(key, requests):
+            client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Token {key}')
+            own, failed = [], 0
+            try:
+                for method, path in requests:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path)
+                    own.append(time.perf_counter() - started)
+                    failed += response.status_code >= 400
+            finally:
+                connections.close_all()
+            with lock:
+                durations.extend(own)
+                errors.append(failed)
+        
+        threads = [threading.Thread(target=worker, args=worker_args) for worker_args in self.workers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report('wsgi', durations, sum(errors), time.perf_counter() - started)
+    
+    def run_asgi(self):
+        durations, errors = [], 0
+        
+        async def worker(key, requests):
+            nonlocal errors
+            client = AsyncClient(SERVER_NAME='localhost')
+            headers = {'Authorization': f'Token {key}'}
+            for method, path in requests:
+                started = time.perf_counter()
+                response = await getattr(client, method)(path, headers=headers)
+                durations.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+        
+        async def main():
+            await asyncio.gather(*(worker(*worker_args) for worker_args in self.workers))
+        
+        started = time.perf_counter()
+        asyncio.run(main())
+        return self.report('asgi', durations, errors, time.perf_counter() - started)
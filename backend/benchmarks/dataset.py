@@ -0,0 +1,405 @@
+"""Seeded synthetic dataset at production-like scale.
+
+Everything is derived from ``users`` and ``seed``: creators are 2% of the
+users, their popularity follows a Zipf curve, and subscriptions, posts,
+likes, comments, conversations and the payments ledger all follow that
+skew. Rows get explicit ids and are written with ``COPY`` on PostgreSQL
+and ``executemany`` INSERTs elsewhere, bypassing model ``save()``;
+denormalized counters and rollups are fixed with set-based updates at the
+end.
+"""
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from content.models import Comment, Media, Post, PostLike
+from creators.models import Creator, CreatorSocialLinks
+from messaging.models import Conversation, Message
+from payments.fees import calculate_fees_cents, from_cents, to_cents
+from payments.models import Earning, Tip, Transaction
+from payments.rollups import rebuild_rollups
+from subscriptions.models import Subscription
+
+MODELS = [
+    User, UserProfile, Creator, CreatorSocialLinks, Subscription, Post, Media, PostLike,
+    Comment, Conversation, Message, Tip, Earning, Transaction,
+]
+
+WORDS = (
+    'morning workout recipe studio session behind scenes tutorial new drop live '
+    'weekly update thanks everyone preview exclusive bonus playlist sketch travel '
+    'story question answer challenge today tomorrow favourite'
+).split()
+
+def copy_value(value):
+    """Encode one value for COPY ... FROM STDIN text format"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+class TableWriter:
+    """Buffers rows for one model and writes them in batches with explicit ids"""
+    
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.fields = model._meta.concrete_fields
+        self.defaults = {field.attname: field.get_default() for field in self.fields}
+        self.rows = []
+        self.count = 0
+        self.next_id = (model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    
+    def add(self, **values):
+        """Queue a row (keyed by attname) and return its id"""
+        row_id = values.setdefault('id', self.next_id)
+        self.next_id = max(self.next_id, row_id + 1)
+        defaults = self.defaults
+        self.rows.append([
+            values[field.attname] if field.attname in values else defaults[field.attname]
+            for field in self.fields
+        ])
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+        return row_id
+    
+    def flush(self):
+        if not self.rows:
+            return
+        rows = [
+            [field.get_db_prep_save(value, connection) for field, value in zip(self.fields, row)]
+            for row in self.rows
+        ]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in self.fields)
+        
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                data = io.StringIO(''.join(
+                    '\t'.join(copy_value(value) for value in row) + '\n' for row in rows
+                ))
+                sql = f'COPY {table} ({columns}) FROM STDIN'
+                if hasattr(cursor.cursor, 'copy_expert'):
+                    cursor.cursor.copy_expert(sql, data)
+                else:
+                    with cursor.cursor.copy(sql) as copy:
+                        copy.write(data.getvalue())
+            else:
+                placeholders = ', '.join(['%s'] * len(self.fields))
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows)
+        
+        self.count += len(self.rows)
+        self.rows = []
+
+class DatasetGenerator:
+    def __init__(self, users=10000, seed=42, days=365, batch_size=5000, log=None):
+        self.users = users
+        self.creators = max(1, users // 50)
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.password = make_password('benchmark')
+        self.writers = {}
+    
+    def writer(self, model):
+        if model not in self.writers:
+            self.writers[model] = TableWriter(model, self.batch_size)
+        return self.writers[model]
+    
+    def moment(self, after=None):
+        after = after or self.start
+        span = (self.now - after).total_seconds()
+        return after + timedelta(seconds=self.rng.random() * span)
+    
+    def words(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+    
+    def run(self):
+        with transaction.atomic():
+            self.generate_users()
+            self.generate_subscriptions()
+            self.generate_content()
+            self.generate_messages()
+            self.generate_payments()
+            for writer in self.writers.values():
+                writer.flush()
+            self.reset_sequences()
+        self.update_counters()
+        rebuild_rollups()
+        return {model.__name__: writer.count for model, writer in self.writers.items()}
+    
+    def generate_users(self):
+        self.log(f'Users: {self.users} ({self.creators} creators)')
+        users, profiles = self.writer(User), self.writer(UserProfile)
+        creators, links = self.writer(Creator), self.writer(CreatorSocialLinks)
+        categories = [value for value, _ in settings.CONTENT_CATEGORIES]
+        prices = [Decimal(str(price)) for _, price in settings.SUBSCRIPTION_TIERS]
+        
+        self.creator_ids = []
+        self.creator_users = {}
+        self.creator_joined = {}
+        self.subscriber_ids = []
+        for n in range(self.users):
+            is_creator = n < self.creators
+            joined = self.moment()
+            user_id = users.next_id
+            users.add(
+                id=user_id,
+                username=f'bench{user_id}',
+                email=f'bench{user_id}@example.com',
+                password=self.password,
+                first_name=self.rng.choice(WORDS).title(),
+                account_type='creator' if is_creator else 'subscriber',
+                is_age_verified=self.rng.random() < 0.7,
+                is_active=True,
+                date_joined=joined,
+                created_at=joined,
+                updated_at=joined
+            )
+            profiles.add(user_id=user_id)
+            
+            if not is_creator:
+                self.subscriber_ids.append(user_id)
+                continue
+            creator_id = creators.add(
+                user_id=user_id,
+                display_name=f'Creator {user_id}',
+                category=self.rng.choice(categories),
+                description=self.words(5, 30),
+                subscription_price=self.rng.choice(prices),
+                is_adult_content=self.rng.random() < 0.05,
+                created_at=joined,
+                updated_at=joined
+            )
+            links.add(creator_id=creator_id, twitter=f'@bench{user_id}')
+            self.creator_ids.append(creator_id)
+            self.creator_users[creator_id] = user_id
+            self.creator_joined[creator_id] = joined
+        
+        # Zipf popularity over a shuffled creator order
+        ranked = self.creator_ids[:]
+        self.rng.shuffle(ranked)
+        weights = [1 / (rank + 1) ** 1.1 for rank in range(len(ranked))]
+        total = sum(weights)
+        self.popularity = {creator_id: w / total for creator_id, w in zip(ranked, weights)}
+        self.cum_weights = []
+        running = 0
+        for w in weights:
+            running += w
+            self.cum_weights.append(running)
+        self.ranked = ranked
+    
+    def generate_subscriptions(self):
+        subscriptions = self.writer(Subscription)
+        self.subscribers = {creator_id: [] for creator_id in self.creator_ids}
+        self.active = []
+        for user_id in self.subscriber_ids:
+            # Most fans follow one or two creators, a few follow many
+            count = min(int(self.rng.expovariate(0.6)), 12, len(self.ranked))
+            chosen = set(self.rng.choices(self.ranked, cum_weights=self.cum_weights, k=count))
+            for creator_id in chosen:
+                created = self.moment(self.creator_joined[creator_id])
+                roll = self.rng.random()
+                status = 'active' if roll < 0.8 else 'cancelled' if roll < 0.95 else 'expired'
+                period_start = self.now - timedelta(days=self.rng.randint(0, 29))
+                subscription_id = subscriptions.next_id
+                subscriptions.add(
+                    id=subscription_id,
+                    subscriber_id=user_id,
+                    creator_id=creator_id,
+                    stripe_subscription_id=f'sub_bench_{subscription_id}',
+                    status=status,
+                    price=Decimal('9.99'),
+                    created_at=created,
+                    current_period_start=period_start,
+                    current_period_end=period_start + timedelta(days=30),
+                    cancelled_at=self.moment(created) if status == 'cancelled' else None
+                )
+                self.subscribers[creator_id].append(user_id)
+                if status == 'active':
+                    self.active.append((subscription_id, user_id, creator_id, created))
+        self.log(f'Subscriptions: {subscriptions.next_id - 1}')
+    
+    def generate_content(self):
+        posts, media = self.writer(Post), self.writer(Media)
+        likes, comments = self.writer(PostLike), self.writer(Comment)
+        budget = self.users // 2
+        for creator_id in self.creator_ids:
+            fans = self.subscribers[creator_id]
+            post_count = 3 + int(self.popularity[creator_id] * budget)
+            for _ in range(post_count):
+                created = self.moment(self.creator_joined[creator_id])
+                post_type = self.rng.choice(['text', 'image', 'image', 'video', 'mixed'])
+                post_id = posts.add(
+                    creator_id=creator_id,
+                    title=self.words(2, 6).title(),
+                    content=self.words(10, 60),
+                    post_type=post_type,
+                    visibility=self.rng.choice(['public', 'subscribers', 'subscribers', 'premium']),
+                    created_at=created,
+                    updated_at=created
+                )
+                if post_type != 'text':
+                    for _ in range(self.rng.randint(1, 3)):
+                        media_id = media.next_id
+                        media.add(
+                            id=media_id,
+                            post_id=post_id,
+                            media_type='video' if post_type == 'video' else 'image',
+                            file=f'content/bench/{media_id}.jpg',
+                            file_size=self.rng.randint(50_000, 5_000_000),
+                            width=1080,
+                            height=1350,
+                            created_at=created
+                        )
+                
+                if not fans:
+                    continue
+                for user_id in self.rng.sample(fans, min(len(fans), int(self.rng.expovariate(1 / 20)))):
+                    likes.add(user_id=user_id, post_id=post_id, created_at=self.moment(created))
+                thread = []
+                for _ in range(int(self.rng.expovariate(1 / 4))):
+                    when = self.moment(created)
+                    parent = self.rng.choice(thread) if thread and self.rng.random() < 0.2 else None
+                    thread.append(comments.add(
+                        user_id=self.rng.choice(fans),
+                        post_id=post_id,
+                        content=self.words(3, 25),
+                        parent_id=parent,
+                        created_at=when,
+                        updated_at=when
+                    ))
+        self.log(f'Posts: {posts.next_id - 1}')
+    
+    def generate_messages(self):
+        conversations, messages = self.writer(Conversation), self.writer(Message)
+        for _, user_id, creator_id, created in self.active:
+            if self.rng.random() > 0.2:
+                continue
+            conversation_id = conversations.next_id
+            creator_user = self.creator_users[creator_id]
+            when = previous = created
+            from_fan = True
+            last = None
+            for _ in range(self.rng.randint(1, 30)):
+                previous, when = when, self.moment(when)
+                from_fan = self.rng.random() < 0.5
+                last = self.words(2, 20)
+                messages.add(
+                    conversation_id=conversation_id,
+                    sender_id=user_id if from_fan else creator_user,
+                    content=last,
+                    created_at=when
+                )
+            # Both sides have read everything, except that the newest message
+            # is still unread by its recipient in 30% of conversations
+            unread_side = ('creator' if from_fan else 'subscriber') if self.rng.random() < 0.3 else None
+            conversations.add(
+                id=conversation_id,
+                creator_id=creator_id,
+                subscriber_id=user_id,
+                created_at=created,
+                updated_at=when,
+                last_message_at=when,
+                last_message_preview=last[:100],
+                creator_last_read=previous if unread_side == 'creator' else when,
+                subscriber_last_read=previous if unread_side == 'subscriber' else when,
+                creator_unread_count=int(unread_side == 'creator'),
+                subscriber_unread_count=int(unread_side == 'subscriber')
+            )
+        self.log(f'Conversations: {conversations.next_id - 1}')
+    
+    def generate_payments(self):
+        tips, earnings = self.writer(Tip), self.writer(Earning)
+        transactions = self.writer(Transaction)
+        payments = []
+        for subscription_id, user_id, creator_id, created in self.active:
+            months = min(3, max(1, (self.now - created).days // 30))
+            for month in range(months):
+                payments.append(('subscription', subscription_id, user_id, creator_id,
+                                  created + timedelta(days=30 * month), Decimal('9.99')))
+            if self.rng.random() < 0.05:
+                for _ in range(self.rng.randint(1, 3)):
+                    amount = Decimal(self.rng.choice(settings.TIP_AMOUNTS))
+                    payments.append(('tip', None, user_id, creator_id, self.moment(created), amount))
+        
+        fees, nets = calculate_fees_cents([to_cents(p[5]) for p in payments])
+        for (kind, subscription_id, user_id, creator_id, when, amount), fee, net in zip(payments, fees, nets):
+            tip_id = None
+            if kind == 'tip':
+                tip_id = tips.next_id
+                tips.add(
+                    id=tip_id,
+                    tipper_id=user_id,
+                    creator_id=creator_id,
+                    amount=amount,
+                    stripe_payment_intent_id=f'pi_bench_{tip_id}',
+                    status='completed',
+                    platform_fee=from_cents(fee),
+                    creator_amount=from_cents(net),
+                    created_at=when,
+                    completed_at=when
+                )
+            earnings.add(
+                creator_id=creator_id,
+                earning_type=kind,
+                gross_amount=amount,
+                platform_fee=from_cents(fee),
+                net_amount=from_cents(net),
+                subscription_id=subscription_id,
+                tip_id=tip_id,
+                created_at=when
+            )
+            transaction_id = transactions.next_id
+            transactions.add(
+                id=transaction_id,
+                user_id=user_id,
+                transaction_type=f'{kind}_payment',
+                amount=amount,
+                status='completed',
+                stripe_transaction_id=f'pi_bench_{tip_id}' if tip_id else f'in_bench_{transaction_id}',
+                subscription_id=subscription_id,
+                tip_id=tip_id,
+                created_at=when
+            )
+        self.log(f'Payments: {len(payments)}')
+    
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+                cursor.execute(sql)
+    
+    def update_counters(self):
+        """Set denormalized counters from the generated rows"""
+        def count_of(queryset, key):
+            return Coalesce(Subquery(
+                queryset.filter(**{key: OuterRef('pk')}).values(key).annotate(n=Count('pk')).values('n'),
+                output_field=IntegerField()
+            ), Value(0))
+        
+        Creator.objects.update(
+            subscriber_count=count_of(Subscription.objects.filter(status='active'), 'creator'),
+            total_posts=count_of(Post.objects.all(), 'creator')
+        )
+        Post.objects.update(
+            likes_count=count_of(PostLike.objects.all(), 'post'),
+            comments_count=count_of(Comment.objects.all(), 'post')
+        )
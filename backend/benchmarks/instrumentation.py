@@ -0,0 +1,67 @@
+"""What per-request instrumentation costs.
+
+The same request is timed through the full stack with the instrumentation
+middleware and its hooks installed, and with both removed. Rounds alternate
+between the two so drift in the machine's load hits both alike. The result
+is the difference in mean latency, absolute and as a share of the request.
+"""
+import time
+
+from django.test import Client, override_settings
+
+from creator_platform.instrumentation import install_hooks, uninstall_hooks
+from .runner import summarize
+
+CREATOR_LIST_PATH = '/api/creators/'
+
+class InstrumentationBenchmark:
+    def __init__(self, requests=2000, rounds=5, warmup=50, path=CREATOR_LIST_PATH, log=None):
+        self.requests = requests
+        self.rounds = rounds
+        self.warmup = warmup
+        self.path = path
+        self.log = log or (lambda message: None)
+    
+    def run(self):
+        durations = {'on': [], 'off': []}
+        try:
+            for _ in range(self.rounds):
+                for label in durations:
+                    durations[label] += self.measure(enabled=label == 'on')
+        finally:
+            install_hooks()
+        
+        on, off = summarize(durations['on']), summarize(durations['off'])
+        overhead_ms = round(on['mean_ms'] - off['mean_ms'], 3)
+        overhead_percent = round(overhead_ms / off['mean_ms'] * 100, 2)
+        self.log(f'off: mean {off["mean_ms"]}ms, p50 {off["p50_ms"]}ms')
+        self.log(f'on: mean {on["mean_ms"]}ms, p50 {on["p50_ms"]}ms')
+        self.log(f'overhead: {overhead_ms}ms per request ({overhead_percent}%)')
+        return {
+            'path': self.path,
+            'on': on,
+            'off': off,
+            'overhead_ms': overhead_ms,
+            'overhead_percent': overhead_percent,
+        }
+    
+    def measure(self, enabled):
+        # The client loads the middleware when it's created, and the
+        # middleware installs the hooks
+        if enabled:
+            client = Client(SERVER_NAME='localhost')
+        else:
+            uninstall_hooks()
+            with override_settings(INSTRUMENTATION_ENABLED=False):
+                client = Client(SERVER_NAME='localhost')
+        
+        durations = []
+        for n in range(self.warmup + self.requests // self.rounds):
+            started = time.perf_counter()
+            response = client.get(self.path)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f'GET {self.path} returned {response.status_code}')
+            if n >= self.warmup:
+                durations.append(elapsed)
+        return durations
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.concurrency import ConcurrencyBenchmark
+from benchmarks.runner import git_version
+
+class Command(BaseCommand):
+    help = 'Compare WSGI and ASGI throughput under a mixed, Stripe-bound request load'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help='In-flight requests')
+        parser.add_argument('--cycles', type=int, default=20, help='Rounds of the request mix per worker')
+        parser.add_argument('--stripe-latency', type=float, default=0.15, help='Seconds per fake Stripe call')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+    
+    def handle(self, *args, **options):
+        benchmark = ConcurrencyBenchmark(
+            concurrency=options['concurrency'],
+            cycles=options['cycles'],
+            stripe_latency=options['stripe_latency'],
+            log=self.stdout.write
+        )
+        try:
+            results = benchmark.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        wsgi, asgi = results['wsgi']['requests_per_second'], results['asgi']['requests_per_second']
+        self.stdout.write(f'ASGI/WSGI throughput: {asgi / wsgi:.2f}x')
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'version': git_version(), **results}, f, indent=2)
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.instrumentation import CREATOR_LIST_PATH, InstrumentationBenchmark
+from benchmarks.runner import git_version
+
+class Command(BaseCommand):
+    help = 'Measure the per-request cost of the instrumentation middleware and its hooks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests timed each way')
+        parser.add_argument('--rounds', type=int, default=5, help='Alternating on/off rounds')
+        parser.add_argument('--path', default=CREATOR_LIST_PATH, help='GET endpoint to time')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+    
+    def handle(self, *args, **options):
+        benchmark = InstrumentationBenchmark(
+            requests=options['requests'],
+            rounds=options['rounds'],
+            path=options['path'],
+            log=self.stdout.write
+        )
+        try:
+            results = benchmark.run()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'version': git_version(), **results}, f, indent=2)
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.ratelimit import RateLimitBenchmark
+from benchmarks.runner import git_version
+
+class Command(BaseCommand):
+    help = 'Measure rate limit checks per second and the cost of a throttled login'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20000, help='Checks per measurement')
+        parser.add_argument('--threads', type=int, default=8, help='Threads making checks')
+        parser.add_argument('--logins', type=int, default=20, help='Throttled logins to time')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+    
+    def handle(self, *args, **options):
+        benchmark = RateLimitBenchmark(
+            checks=options['checks'],
+            threads=options['threads'],
+            logins=options['logins'],
+            log=self.stdout.write
+        )
+        try:
+            results = benchmark.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'version': git_version(), **results}, f, indent=2)
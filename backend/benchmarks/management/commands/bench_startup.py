@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.runner import compare, git_version, load_results
+from benchmarks.startup import TARGETS, measure_startup
+
+class Command(BaseCommand):
+    help = 'Measure cold start time, peak RSS and loaded modules of fresh worker processes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Processes started per target')
+        parser.add_argument('--target', action='append', choices=list(TARGETS), help='Repeatable; default all')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Results file from an earlier run to diff against')
+    
+    def handle(self, *args, **options):
+        results = {}
+        for target in options['target'] or TARGETS:
+            result = measure_startup(target, runs=options['runs'])
+            results[f'startup_{target}'] = result
+            self.stdout.write(f'{target}: p50 {result["p50_ms"]}ms, max {result["p99_ms"]}ms, '
+                              f'{result["max_rss_mb"]}MB RSS, {result["modules"]} modules')
+        results = {'version': git_version(), 'runs': options['runs'], 'scenarios': results}
+        
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results for {results["version"]} written to {options["output"]}')
+        
+        if options['compare']:
+            previous = load_results(options['compare'])
+            self.stdout.write(f'\n{previous.get("version")} -> {results["version"]}')
+            for name, metric, before, after, change in compare(previous, results):
+                change = f'{change:+.1f}%' if change is not None else 'n/a'
+                self.stdout.write(f'  {name:<24} {metric:<20} {before:>10} {after:>10} {change:>9}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.startup import TARGETS, profile_imports
+
+class Command(BaseCommand):
+    help = 'Show which packages take the most import time when a worker starts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=list(TARGETS), default='wsgi')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list')
+    
+    def handle(self, *args, **options):
+        total_ms, packages = profile_imports(options['target'], top=options['top'])
+        self.stdout.write(f'{options["target"]}: {total_ms}ms importing\n')
+        self.stdout.write(f'  {"package":<24} {"ms":>8} {"share":>6} {"modules":>8}  imported by')
+        for package in packages:
+            share = package['self_ms'] / total_ms * 100 if total_ms else 0
+            self.stdout.write(
+                f'  {package["package"]:<24} {package["self_ms"]:>8} {share:>5.1f}% '
+                f'{package["modules"]:>8}  {package["imported_by"] or "-"}'
+            )
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.runner import BenchmarkRunner, compare, load_results
+
+SCENARIOS = ['creator_list_anonymous', 'creator_list', 'subscription_list', 'inbox', 'feed', 'subscribe_and_cancel']
+
+class Command(BaseCommand):
+    help = 'Benchmark the main endpoints and report p50/p95/p99 and queries per request'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Repeatable; default all')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Results file from an earlier run to diff against')
+    
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            only=options['scenario'],
+            log=self.stdout.write
+        )
+        results = runner.run()
+        
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results for {results["version"]} written to {options["output"]}')
+        
+        if options['compare']:
+            previous = load_results(options['compare'])
+            self.stdout.write(f'\n{previous.get("version")} -> {results["version"]}')
+            for name, metric, before, after, change in compare(previous, results):
+                change = f'{change:+.1f}%' if change is not None else 'n/a'
+                self.stdout.write(f'  {name:<24} {metric:<20} {before:>10} {after:>10} {change:>9}')
@@ -0,0 +1,88 @@
+"""Rate limiter throughput and the cost of a rejected login.
+
+Checks run against whatever the cache is configured with: Redis in a
+deployment, the in-process buckets otherwise. Three numbers come out:
+checks per second that reach the shared store (fresh identities, all
+allowed), checks per second for an identity already known to be empty
+(answered in process), and the latency of a throttled login next to one
+that hashes a wrong password.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from creator_platform.ratelimit import check_rate_limit, parse_rate
+from .runner import summarize
+
+class RateLimitBenchmark:
+    def __init__(self, checks=20000, threads=8, logins=20, log=None):
+        self.checks = checks
+        self.threads = threads
+        self.logins = logins
+        self.log = log or (lambda message: None)
+    
+    def run(self):
+        return {
+            'allowed': self.run_checks('allowed', lambda run, i: check_rate_limit('messaging', user=f'{run}-{i}')),
+            'rejected': self.run_checks('rejected', self.rejected_check()),
+            'login': self.run_logins(),
+        }
+    
+    def rejected_check(self):
+        # Drain one bucket first so every timed check finds it empty
+        user = f'bench-{uuid.uuid4().hex}'
+        while not check_rate_limit('messaging', user=user):
+            pass
+        return lambda run, i: check_rate_limit('messaging', user=user)
+    
+    def run_checks(self, label, check):
+        per_thread = self.checks // self.threads
+        run = uuid.uuid4().hex
+        
+        def worker(offset):
+            for i in range(offset, offset + per_thread):
+                check(run, i)
+        
+        threads = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(self.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        checks_per_second = round(per_thread * self.threads / elapsed)
+        self.log(f'{label}: {checks_per_second} checks/s ({self.threads} threads)')
+        return {'checks_per_second': checks_per_second}
+    
+    def run_logins(self):
+        client = Client(SERVER_NAME='localhost', REMOTE_ADDR='192.0.2.1')
+        email = f'bench-{uuid.uuid4().hex}@example.com'
+        payload = {'email': email, 'password': 'wrong-password'}
+        limit, _ = parse_rate(settings.RATE_LIMITS['login']['account'])
+        
+        failed = []
+        for _ in range(limit):
+            started = time.perf_counter()
+            client.post('/api/auth/login/', payload, content_type='application/json')
+            failed.append(time.perf_counter() - started)
+        
+        throttled, queries = [], 0
+        for _ in range(self.logins):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.post('/api/auth/login/', payload, content_type='application/json')
+                throttled.append(time.perf_counter() - started)
+            queries += len(captured)
+            if response.status_code != 429:
+                raise ValueError(f'Expected 429 once the account bucket is empty, got {response.status_code}')
+        
+        result = {'failed': summarize(failed), 'throttled': summarize(throttled), 'throttled_queries': queries}
+        self.log(f'login: wrong password p50 {result["failed"]["p50_ms"]}ms, '
+                 f'throttled p50 {result["throttled"]["p50_ms"]}ms with {queries} queries')
+        return result
@@ -0,0 +1,311 @@
+"""Endpoint benchmarks against whatever data is in the database.
+
+Requests go through the full middleware and DRF stack in-process, with
+token authentication, so timings include URL routing, auth, queries and
+serialization but no network. Stripe is replaced by ``FakeStripe`` for the
+write scenarios. Results carry the git revision and database vendor so runs
+from different versions can be compared with ``--compare``.
+"""
+import json
+import statistics
+import subprocess
+import time
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, resolve
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from creators.models import Creator
+from messaging.models import Conversation
+from payments.stripe_client import get_stripe
+from subscriptions.models import Subscription
+
+BENCH_PREFIX = 'bench-runner-'
+FEED_PATH = '/api/content/feed/'
+
+class FakeStripe:
+    """Patch the Stripe calls the subscription views make with local stand-ins
+    
+    ``latency`` seconds are slept in every call, to stand in for the network.
+    """
+    
+    def __init__(self, latency=0):
+        self.latency = latency
+        self._patches = []
+    
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def customer_create(self, **kwargs):
+        self.wait()
+        return SimpleNamespace(id=f'cus_bench_{uuid.uuid4().hex[:14]}')
+    
+    def payment_method_attach(self, payment_method_id, **kwargs):
+        self.wait()
+        return SimpleNamespace(id=payment_method_id)
+    
+    def subscription_create(self, **kwargs):
+        self.wait()
+        now = int(time.time())
+        return SimpleNamespace(
+            id=f'sub_bench_{uuid.uuid4().hex[:14]}',
+            status='active',
+            current_period_start=now,
+            current_period_end=now + 30 * 86400
+        )
+    
+    def subscription_modify(self, subscription_id, **kwargs):
+        self.wait()
+        return SimpleNamespace(id=subscription_id, **kwargs)
+    
+    def payment_intent_create(self, **kwargs):
+        self.wait()
+        return SimpleNamespace(id=f'pi_bench_{uuid.uuid4().hex[:14]}', status='succeeded')
+    
+    def __enter__(self):
+        # The SDK is only imported once a write scenario patches it
+        stripe = get_stripe()
+        self._patches = [
+            mock.patch.object(stripe.Customer, 'create', self.customer_create),
+            mock.patch.object(stripe.PaymentMethod, 'attach', self.payment_method_attach),
+            mock.patch.object(stripe.Subscription, 'create', self.subscription_create),
+            mock.patch.object(stripe.Subscription, 'modify', self.subscription_modify),
+            mock.patch.object(stripe.PaymentIntent, 'create', self.payment_intent_create),
+        ]
+        for patch in self._patches:
+            patch.start()
+        return self
+    
+    def __exit__(self, *exc):
+        for patch in reversed(self._patches):
+            patch.stop()
+        self._patches = []
+
+def git_version():
+    """Short commit hash, with ``-dirty`` when the tree has local changes"""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{revision}-dirty' if dirty else revision
+
+def summarize(durations, queries=None):
+    durations = sorted(durations)
+    
+    def pct(fraction):
+        return round(durations[min(len(durations) - 1, int(len(durations) * fraction))] * 1000, 2)
+    
+    return {
+        'requests': len(durations),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 2),
+        **({'queries_per_request': round(statistics.fmean(queries), 2)} if queries else {}),
+    }
+
+class BenchmarkRunner:
+    def __init__(self, iterations=200, warmup=20, only=None, log=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.only = only
+        self.log = log or (lambda message: None)
+        self.client = Client(SERVER_NAME='localhost')
+        self.tokens = []
+    
+    def token_for(self, user):
+        token, created = Token.objects.get_or_create(user=user)
+        if created:
+            self.tokens.append(token.pk)
+        return {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+    
+    def measure(self, name, requests):
+        """Time ``requests``, an iterable of (method, path, data, headers), after warmup"""
+        durations, queries = [], []
+        for n, (method, path, data, headers) in enumerate(requests):
+            call = getattr(self.client, method)
+            kwargs = {'content_type': 'application/json'} if method != 'get' else {}
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = call(path, data, **kwargs, **headers)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: {method.upper()} {path} returned {response.status_code}')
+            if n >= self.warmup:
+                durations.append(elapsed)
+                queries.append(len(captured))
+        if not durations:
+            return None
+        result = summarize(durations, queries)
+        self.log(f'{name}: p50 {result["p50_ms"]}ms, p95 {result["p95_ms"]}ms, '
+                 f'p99 {result["p99_ms"]}ms, {result["queries_per_request"]} queries')
+        return result
+    
+    def repeat(self, method, path, data=None, headers=None):
+        for _ in range(self.warmup + self.iterations):
+            yield method, path, data, headers or {}
+    
+    def run(self):
+        results = {}
+        scenarios = [
+            ('creator_list_anonymous', self.creator_list_anonymous),
+            ('creator_list', self.creator_list),
+            ('subscription_list', self.subscription_list),
+            ('inbox', self.inbox),
+            ('feed', self.feed),
+            ('subscribe_and_cancel', self.subscribe_and_cancel),
+        ]
+        try:
+            for name, scenario in scenarios:
+                if self.only and name not in self.only:
+                    continue
+                measured = scenario()
+                if measured is None:
+                    self.log(f'{name}: skipped')
+                    continue
+                results.update(measured)
+        finally:
+            Token.objects.filter(pk__in=self.tokens).delete()
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        
+        return {
+            'version': git_version(),
+            'database': connection.vendor,
+            'iterations': self.iterations,
+            'dataset': {
+                'users': User.objects.count(),
+                'creators': Creator.objects.count(),
+                'subscriptions': Subscription.objects.count(),
+            },
+            'scenarios': results,
+        }
+    
+    def busiest_subscriber(self):
+        return User.objects.filter(account_type='subscriber').annotate(
+            n=Count('subscriptions')
+        ).order_by('-n').first()
+    
+    def creator_list_anonymous(self):
+        return {'creator_list_anonymous': self.measure(
+            'creator_list_anonymous', self.repeat('get', '/api/creators/')
+        )}
+    
+    def creator_list(self):
+        user = self.busiest_subscriber()
+        if user is None:
+            return None
+        return {'creator_list': self.measure(
+            'creator_list', self.repeat('get', '/api/creators/', headers=self.token_for(user))
+        )}
+    
+    def subscription_list(self):
+        user = self.busiest_subscriber()
+        if user is None:
+            return None
+        return {'subscription_list': self.measure(
+            'subscription_list', self.repeat('get', '/api/subscriptions/', headers=self.token_for(user))
+        )}
+    
+    def inbox(self):
+        subscriber_id = Conversation.objects.values('subscriber').annotate(
+            n=Count('id')
+        ).order_by('-n').values_list('subscriber', flat=True).first()
+        if subscriber_id is None:
+            return None
+        headers = self.token_for(User.objects.get(pk=subscriber_id))
+        return {'inbox': self.measure('inbox', self.repeat('get', '/api/messaging/conversations/', headers=headers))}
+    
+    def feed(self):
+        try:
+            resolve(FEED_PATH)
+        except Resolver404:
+            return None
+        user = self.busiest_subscriber()
+        if user is None:
+            return None
+        return {'feed': self.measure('feed', self.repeat('get', FEED_PATH, headers=self.token_for(user)))}
+    
+    def subscribe_and_cancel(self):
+        """Subscribe a fresh user to N creators, then cancel each one"""
+        count = self.warmup + self.iterations
+        creator_ids = list(Creator.objects.filter(
+            is_active=True, is_adult_content=False
+        ).order_by('-subscriber_count').values_list('id', flat=True)[:count])
+        if not creator_ids:
+            return None
+        distinct = len(creator_ids)
+        # Fewer creators than iterations: one bench user per pass over them
+        creator_ids = (creator_ids * (count // distinct + 1))[:count]
+        
+        users = {}
+        
+        def user_for(n):
+            user_pass = n // distinct
+            if user_pass not in users:
+                user = User.objects.create_user(
+                    username=f'{BENCH_PREFIX}{uuid.uuid4().hex[:12]}',
+                    email=f'{BENCH_PREFIX}{uuid.uuid4().hex[:12]}@example.com',
+                    password=None
+                )
+                users[user_pass] = self.token_for(user)
+            return users[user_pass]
+        
+        created = []
+        
+        def subscribes():
+            for n, creator_id in enumerate(creator_ids):
+                headers = user_for(n)
+                created.append(headers)
+                yield 'post', '/api/subscriptions/create/', {
+                    'creator_id': creator_id, 'payment_method_id': 'pm_card_visa'
+                }, headers
+        
+        def cancels():
+            tokens = {headers['HTTP_AUTHORIZATION'].split()[1] for headers in created}
+            subscriptions = Subscription.objects.filter(
+                subscriber__auth_token__key__in=tokens
+            ).select_related('subscriber__auth_token').order_by('id')
+            for subscription in subscriptions:
+                headers = {'HTTP_AUTHORIZATION': f'Token {subscription.subscriber.auth_token.key}'}
+                yield 'post', f'/api/subscriptions/{subscription.pk}/cancel/', {}, headers
+        
+        # One bench user subscribes far faster than the checkout limit allows
+        unlimited = {**settings.RATE_LIMITS, 'checkout': {}}
+        with FakeStripe(), override_settings(RATE_LIMITS=unlimited):
+            return {
+                'subscribe': self.measure('subscribe', subscribes()),
+                'cancel': self.measure('cancel', cancels()),
+            }
+
+def compare(previous, current):
+    """Rows of (scenario, metric, before, after, change %) for two result files"""
+    rows = []
+    for name, after in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before or not after:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'max_rss_mb'):
+            if metric not in before or metric not in after:
+                continue
+            old, new = before[metric], after[metric]
+            change = round((new - old) / old * 100, 1) if old else None
+            rows.append((name, metric, old, new, change))
+    return rows
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
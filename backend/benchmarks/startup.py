@@ -0,0 +1,132 @@
+"""Cold start: how long a fresh process takes to be ready, and what it imports.
+
+Each target is started in a new interpreter, the way a process manager or
+cron would start it:
+
+- ``command``: ``django.setup()``, all a management command needs
+- ``wsgi``: the WSGI application plus the URLconf and every view it imports,
+  what a web worker has loaded once it serves its first request
+- ``asgi``: the same for the ASGI application, with the WebSocket routing
+- ``celery``: the Celery app with every app's tasks imported
+
+Startup time is the wall time of the whole process, interpreter included.
+Peak RSS and the number of loaded modules are reported by the process itself.
+``profile_imports`` runs a target under ``python -X importtime`` and sums
+the time per top-level package, with the project module that imports it.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .runner import summarize
+
+TARGETS = {
+    'command': 'import django; django.setup()',
+    'wsgi': (
+        'from creator_platform.wsgi import application\n'
+        'from django.urls import get_resolver; get_resolver().url_patterns'
+    ),
+    'asgi': (
+        'from creator_platform.asgi import application\n'
+        'from django.urls import get_resolver; get_resolver().url_patterns'
+    ),
+    'celery': (
+        'import django; django.setup()\n'
+        'from creator_platform.celery import app; app.loader.import_default_modules()'
+    ),
+}
+
+# Linux keeps ru_maxrss across exec, so a child started from a large parent
+# would report the parent's peak; VmHWM is this process's own
+REPORT = '''
+import json, resource, sys
+try:
+    with open('/proc/self/status') as f:
+        max_rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+except OSError:
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        max_rss_kb //= 1024
+print(json.dumps({'max_rss_kb': max_rss_kb, 'modules': len(sys.modules)}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+def run_target(target, importtime=False):
+    """Start ``target`` in a new interpreter; return (wall seconds, completed process)"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', TARGETS[target] + '\n' + REPORT]
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'creator_platform.settings')}
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if process.returncode:
+        raise RuntimeError(f'{target} failed to start:\n{process.stderr[-2000:]}')
+    return elapsed, process
+
+def measure_startup(target, runs=5):
+    durations, reports = [], []
+    for _ in range(runs):
+        elapsed, process = run_target(target)
+        durations.append(elapsed)
+        reports.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    result = summarize(durations)
+    result['max_rss_mb'] = round(max(report['max_rss_kb'] for report in reports) / 1024, 1)
+    result['modules'] = reports[-1]['modules']
+    return result
+
+def parse_importtime(stderr):
+    """(depth, module, self µs, cumulative µs) rows, in the order -X importtime prints them"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((len(indent) // 2, module, int(self_us), int(cumulative_us)))
+    return rows
+
+def importers(rows):
+    """Map each module to the module whose import loaded it (None at the top level)"""
+    # Rows are printed after their children, so a module's importer is the
+    # next row at a lower depth
+    parents, pending = {}, defaultdict(list)
+    for depth, module, _, _ in rows:
+        for child in pending.pop(depth + 1, []):
+            parents[child] = module
+        pending[depth].append(module)
+    for modules in pending.values():
+        for module in modules:
+            parents.setdefault(module, None)
+    return parents
+
+def profile_imports(target='wsgi', top=15):
+    """The ``top`` packages by total import time, each with who pulls it in"""
+    _, process = run_target(target, importtime=True)
+    rows = parse_importtime(process.stderr)
+    parents = importers(rows)
+    
+    packages = defaultdict(lambda: {'self_ms': 0.0, 'modules': 0, 'imported_by': None})
+    for _, module, self_us, _ in rows:
+        package = packages[module.split('.')[0]]
+        package['self_ms'] += self_us / 1000
+        package['modules'] += 1
+    for name, package in packages.items():
+        package['self_ms'] = round(package['self_ms'], 1)
+        # From the package's outermost module, the first importer outside it
+        _, outermost = min((depth, module) for depth, module, _, _ in rows if module.split('.')[0] == name)
+        importer = parents.get(outermost)
+        while importer is not None and importer.split('.')[0] == name:
+            importer = parents.get(importer)
+        package['imported_by'] = importer
+    
+    total_ms = round(sum(self_us for _, _, self_us, _ in rows) / 1000, 1)
+    ranked = sorted(packages.items(), key=lambda item: -item[1]['self_ms'])[:top]
+    return total_ms, [{'package': name, **package} for name, package in ranked]
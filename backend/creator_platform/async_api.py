@@ -0,0 +1,78 @@
+"""Native async JSON views for the hot endpoints.
+
+DRF views are synchronous, so under ASGI every one of them runs on a
+worker thread. ``async_api_view`` covers what those endpoints need from
+DRF, returning the same JSON and errors: token authentication through the
+cached token lookup (session users for safe methods, or with a CSRF
+check), a permission check and JSON rendering. The view itself stays on
+the event loop and only leaves it for ORM, cache and Stripe calls.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import CSRFCheck
+from rest_framework.utils.encoders import JSONEncoder
+
+from accounts.authentication import resolve_token
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+class AuthenticationFailed(Exception):
+    status = 401
+
+class PermissionDenied(Exception):
+    status = 403
+
+def csrf_failure(request):
+    """The reason a session-authenticated unsafe request fails CSRF, or None"""
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+async def authenticate(request):
+    """The request's user, from a token header or else the session"""
+    header = request.headers.get('Authorization', '').split()
+    if header and header[0].lower() == 'token':
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid token header.')
+        user = await sync_to_async(resolve_token)(header[1])
+        if user is None:
+            raise AuthenticationFailed('Invalid token.')
+        return user
+    
+    user = await request.auser()
+    if user.is_authenticated and request.method not in SAFE_METHODS:
+        reason = csrf_failure(request)
+        if reason is not None:
+            raise PermissionDenied(f'CSRF Failed: {reason}')
+    return user
+
+def error(detail, status):
+    response = JsonResponse({'detail': detail}, status=status)
+    if status == 401:
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+def async_api_view(methods=('GET',), authenticated=False):
+    """Wrap an async view returning data (or an HttpResponse) as a JSON API view"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                return error(f'Method "{request.method}" not allowed.', 405)
+            try:
+                request.user = await authenticate(request)
+            except (AuthenticationFailed, PermissionDenied) as exc:
+                return error(str(exc), exc.status)
+            if authenticated and not request.user.is_authenticated:
+                return error('Authentication credentials were not provided.', 401)
+            
+            result = await view(request, *args, **kwargs)
+            if isinstance(result, HttpResponse):
+                return result
+            return JsonResponse(result, encoder=JSONEncoder, safe=False)
+        # CSRF is checked in authenticate(), only for session users, like DRF
+        return csrf_exempt(wrapped)
+    return decorator
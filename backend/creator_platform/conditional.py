@@ -0,0 +1,60 @@
+"""Conditional GET for DRF views.
+
+Views using ``ConditionalGetMixin`` describe their current state with
+``get_version()``, a cheap query over ``updated_at`` (and a row count for
+lists), and never by serializing the response. When the client's
+``If-None-Match``/``If-Modified-Since`` still matches, the view answers 304
+without running its queryset or serializer.
+
+The ETag also covers everything else the body depends on: the query
+string (filters, ordering, page) and whether the viewer sees adult
+content. Last-Modified is only sent for single objects; a list can change
+without its newest ``updated_at`` moving, when a row leaves it.
+
+Used by the creator list and detail, the user's profile and a
+conversation's message history. The inbox is left out since its rows
+carry live presence. Posts have no API views yet; when they do, a post's
+version needs its likes and comments counters, which change through
+``update()`` without touching ``updated_at``.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+def viewer_variant(user):
+    return 'adult' if user.is_authenticated and user.is_age_verified else 'general'
+
+class ConditionalGetMixin:
+    # List views turn this off
+    send_last_modified = True
+    
+    def get_version(self):
+        """Return (last_modified datetime, extra ETag parts), or None to skip validators"""
+        raise NotImplementedError
+    
+    def get(self, request, *args, **kwargs):
+        version = self.get_version()
+        if version is None or version[0] is None:
+            return super().get(request, *args, **kwargs)
+        
+        last_modified, parts = version
+        etag = '"%s"' % hashlib.md5(repr((
+            last_modified.isoformat(),
+            parts,
+            viewer_variant(request.user),
+            request.META.get('QUERY_STRING', ''),
+        )).encode()).hexdigest()
+        timestamp = int(last_modified.timestamp()) if self.send_last_modified else None
+        
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        # Bodies differ per viewer, and clients should revalidate rather than reuse
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,210 @@
+"""Read-replica routing with read-your-writes stickiness.
+
+Replicas are opt-in per view: only views wrapped with ``replica_reads``,
+using ``ReplicaReadMixin`` or reading inside ``use_replica`` read from
+them, everything else (including reads inside a transaction) stays on
+``default``. Writes always go to
+``default``.
+
+After a user's successful write request, ``ReplicaMiddleware`` pins that
+user to the primary for ``REPLICA_STICKY_SECONDS`` so they see their own
+changes. Each process health-checks its replicas every
+``REPLICA_HEALTH_INTERVAL`` seconds and stops using any that are down or
+lagging more than ``REPLICA_MAX_LAG`` seconds; with none left, reads fall
+back to the primary.
+"""
+import functools
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+_use_replica = ContextVar('use_replica', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+def pin_to_primary(user_id):
+    cache.set(pin_key(user_id), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+
+async def ais_pinned(user):
+    return user is not None and user.is_authenticated and await cache.aget(pin_key(user.pk)) is not None
+
+def replica_lag(alias):
+    """Seconds the replica is behind its primary"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            # Local stand-in databases have nothing to lag behind
+            cursor.execute('SELECT 1')
+            return 0.0
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+class ReplicaHealth:
+    """Per-process view of which replicas are usable, refreshed on an interval"""
+    
+    def __init__(self, interval, max_lag):
+        self.interval = interval
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._healthy = replica_aliases()
+        self._lag = {}
+        self._checked_at = 0.0
+    
+    def healthy(self):
+        if time.monotonic() - self._checked_at >= self.interval and self._lock.acquire(blocking=False):
+            # One thread refreshes; the rest keep using the previous result
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+        return self._healthy
+    
+    def refresh(self):
+        healthy, lag = [], {}
+        for alias in replica_aliases():
+            try:
+                lag[alias] = replica_lag(alias)
+            except DatabaseError:
+                lag[alias] = None
+                connections[alias].close()
+                continue
+            if lag[alias] <= self.max_lag:
+                healthy.append(alias)
+        self._healthy = healthy
+        self._lag = lag
+        self._checked_at = time.monotonic()
+    
+    def status(self):
+        return {alias: self._lag.get(alias) for alias in replica_aliases()}
+
+_health = None
+
+def get_health():
+    # Created on first use so settings are read after Django is configured
+    global _health
+    if _health is None:
+        _health = ReplicaHealth(settings.REPLICA_HEALTH_INTERVAL, settings.REPLICA_MAX_LAG)
+    return _health
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or connections['default'].in_atomic_block:
+            return 'default'
+        healthy = get_health().healthy()
+        return random.choice(healthy) if healthy else 'default'
+    
+    def db_for_write(self, model, **hints):
+        return 'default'
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+class use_replica:
+    """Let reads in this block go to a replica, unless the user is pinned to the primary"""
+    
+    def __init__(self, user=None):
+        self.user = user
+    
+    def __enter__(self):
+        self._token = _use_replica.set(bool(replica_aliases()) and not is_pinned(self.user))
+        return self
+    
+    def __exit__(self, *exc):
+        _use_replica.reset(self._token)
+    
+    async def __aenter__(self):
+        self._token = _use_replica.set(bool(replica_aliases()) and not await ais_pinned(self.user))
+        return self
+    
+    async def __aexit__(self, *exc):
+        _use_replica.reset(self._token)
+
+def replica_reads(view):
+    """For function views: place below ``@api_view`` so the user is authenticated"""
+    @functools.wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with use_replica(request.user):
+            return view(request, *args, **kwargs)
+    return wrapped
+
+class ReplicaReadMixin:
+    """For DRF class views: safe-method handlers read from a replica"""
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self._replica = use_replica(request.user)
+            self._replica.__enter__()
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica = getattr(self, '_replica', None)
+        if replica is not None:
+            replica.__exit__(None, None, None)
+            self._replica = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+class ReplicaMiddleware:
+    """Pins users to the primary for a while after each successful write"""
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = self.written_by(request, response)
+        if user is not None:
+            pin_to_primary(user.pk)
+        return response
+    
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user = self.written_by(request, response)
+        if user is not None:
+            await cache.aset(pin_key(user.pk), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+        return response
+    
+    def written_by(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 or not replica_aliases():
+            return None
+        # DRF and async_api_view put the authenticated user on the Django request
+        user = getattr(request, 'user', None)
+        if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+            # Nothing looked at the session user, so don't load it just for this
+            return None
+        return user if user.is_authenticated else None
@@ -0,0 +1,288 @@
+"""Per-request timing: wall time, SQL, outbound HTTP and serializer time.
+
+``InstrumentationMiddleware`` times every request and attributes the time
+to its view. SQL is measured with a database execute wrapper, outbound HTTP
+by timing ``requests.Session.send`` (which Stripe uses), and serialization
+by timing ``.data`` on DRF serializers. Staff (and everyone under DEBUG) get
+a ``Server-Timing`` header; on sync requests the session user is only
+checked if the view already loaded it. Per-view latency histograms are
+kept in memory over two rolling windows and served by the ``metrics`` view.
+
+Recording is a few counter updates per request, so it stays on in
+production; ``bench_instrumentation`` measures what it costs. Set
+``INSTRUMENTATION_HOOKS = False`` to leave ``requests`` and DRF unpatched
+(HTTP and serializer time then read zero), or ``INSTRUMENTATION_ENABLED =
+False`` to remove the middleware entirely. The middleware is async-capable
+so native async views stay on the event loop; the query timer is installed
+on every connection, and finds the request's timings through a context
+variable that ``sync_to_async`` carries into ORM threads.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+# Upper bounds in ms of the latency histogram buckets; the last is open-ended
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+_timings = ContextVar('request_timings', default=None)
+
+class RequestTimings:
+    __slots__ = ('db_count', 'db_time', 'http_count', 'http_time', 'serializer_time', 'serializing')
+    
+    def __init__(self):
+        self.db_count = 0
+        self.db_time = 0.0
+        self.http_count = 0
+        self.http_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+def time_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.db_count += 1
+            timings.db_time += time.perf_counter() - started
+
+def timed_send(send):
+    def send_with_timing(self, request, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return send(self, request, **kwargs)
+        started = time.perf_counter()
+        try:
+            return send(self, request, **kwargs)
+        finally:
+            timings.http_count += 1
+            timings.http_time += time.perf_counter() - started
+    return send_with_timing
+
+def timed_data(data):
+    def data_with_timing(self):
+        timings = _timings.get()
+        # Only the outermost serializer counts, nested ones are part of it
+        if timings is None or timings.serializing:
+            return data.fget(self)
+        timings.serializing = True
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            timings.serializer_time += time.perf_counter() - started
+            timings.serializing = False
+    return property(data_with_timing)
+
+def add_query_timer(sender=None, connection=None, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+_originals = None
+
+def install_hooks():
+    """Time queries on every connection and wrap requests and DRF serializers, once per process"""
+    global _originals
+    if _originals is not None:
+        return
+    import requests
+    from rest_framework import serializers
+    
+    connection_created.connect(add_query_timer)
+    for connection in connections.all(initialized_only=True):
+        add_query_timer(connection=connection)
+    _originals = {}
+    if not settings.INSTRUMENTATION_HOOKS:
+        return
+    _originals = {
+        (requests.Session, 'send'): requests.Session.send,
+        (serializers.Serializer, 'data'): serializers.Serializer.data,
+        (serializers.ListSerializer, 'data'): serializers.ListSerializer.data,
+    }
+    requests.Session.send = timed_send(requests.Session.send)
+    serializers.Serializer.data = timed_data(serializers.Serializer.data)
+    serializers.ListSerializer.data = timed_data(serializers.ListSerializer.data)
+
+def uninstall_hooks():
+    """Undo ``install_hooks``"""
+    global _originals
+    if _originals is None:
+        return
+    connection_created.disconnect(add_query_timer)
+    for connection in connections.all(initialized_only=True):
+        if time_query in connection.execute_wrappers:
+            connection.execute_wrappers.remove(time_query)
+    for (owner, name), original in _originals.items():
+        setattr(owner, name, original)
+    _originals = None
+
+class ViewStats:
+    __slots__ = ('count', 'buckets', 'wall', 'db_count', 'db_time', 'http_time', 'serializer_time')
+    
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.wall = 0.0
+        self.db_count = 0
+        self.db_time = 0.0
+        self.http_time = 0.0
+        self.serializer_time = 0.0
+
+class MetricsStore:
+    """Per-view histograms over the current and previous window"""
+    
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._current = {}
+        self._previous = {}
+        self._rotate_at = time.monotonic() + window
+    
+    def record(self, view, wall, timings):
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._rotate_at:
+                self._previous = self._current if now < self._rotate_at + self.window else {}
+                self._current = {}
+                self._rotate_at = now + self.window
+            stats = self._current.get(view)
+            if stats is None:
+                stats = self._current[view] = ViewStats()
+            stats.count += 1
+            stats.buckets[bisect.bisect_left(BUCKETS, wall * 1000)] += 1
+            stats.wall += wall
+            stats.db_count += timings.db_count
+            stats.db_time += timings.db_time
+            stats.http_time += timings.http_time
+            stats.serializer_time += timings.serializer_time
+    
+    def snapshot(self):
+        with self._lock:
+            windows = [self._previous, self._current]
+            views = {}
+            for window in windows:
+                for view, stats in window.items():
+                    merged = views.setdefault(view, ViewStats())
+                    merged.count += stats.count
+                    merged.buckets = [a + b for a, b in zip(merged.buckets, stats.buckets)]
+                    for field in ('wall', 'db_count', 'db_time', 'http_time', 'serializer_time'):
+                        setattr(merged, field, getattr(merged, field) + getattr(stats, field))
+        
+        return {
+            view: {
+                'requests': stats.count,
+                'p50_ms': percentile(stats.buckets, stats.count, 0.50),
+                'p95_ms': percentile(stats.buckets, stats.count, 0.95),
+                'p99_ms': percentile(stats.buckets, stats.count, 0.99),
+                'mean_ms': round(stats.wall / stats.count * 1000, 2),
+                'db_queries_per_request': round(stats.db_count / stats.count, 2),
+                'db_ms': round(stats.db_time / stats.count * 1000, 2),
+                'http_ms': round(stats.http_time / stats.count * 1000, 2),
+                'serializer_ms': round(stats.serializer_time / stats.count * 1000, 2),
+                'histogram': dict(zip([f'le_{b}ms' for b in BUCKETS] + ['inf'], stats.buckets)),
+            }
+            for view, stats in sorted(views.items())
+        }
+
+def percentile(buckets, count, fraction):
+    """Upper bound of the bucket holding the given fraction of requests"""
+    target = count * fraction
+    seen = 0
+    for bound, bucket_count in zip(BUCKETS + [None], buckets):
+        seen += bucket_count
+        if seen >= target:
+            return bound
+    return None
+
+_store = None
+
+def get_store():
+    # Created on first use so settings are read after Django is configured
+    global _store
+    if _store is None:
+        _store = MetricsStore(settings.METRICS_WINDOW)
+    return _store
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_hooks()
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        wall = time.perf_counter() - started
+        user = getattr(request, 'user', None)
+        if type(user) is SimpleLazyObject and user._wrapped is empty:
+            # The view never looked at the session user; loading it here would query
+            user = None
+        return self.record(request, response, timings, wall, user)
+    
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        wall = time.perf_counter() - started
+        user = getattr(request, 'user', None)
+        if type(user) is SimpleLazyObject and not settings.DEBUG:
+            # The session user, not yet loaded; loading it queries
+            user = await request.auser()
+        return self.record(request, response, timings, wall, user)
+    
+    def record(self, request, response, timings, wall, user):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        get_store().record(view, wall, timings)
+        
+        if not (settings.DEBUG or getattr(user, 'is_staff', False)):
+            # Query counts and timings say too much about the backend to show everyone
+            return response
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={wall * 1000:.1f}',
+            f'db;dur={timings.db_time * 1000:.1f};desc="{timings.db_count} queries"',
+            f'http;dur={timings.http_time * 1000:.1f};desc="{timings.http_count} calls"',
+            f'serialize;dur={timings.serializer_time * 1000:.1f}',
+        ])
+        return response
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics(request):
+    """Per-view latency histograms and time breakdown for this process"""
+    from .db_router import get_health
+    
+    return Response({
+        'window_seconds': settings.METRICS_WINDOW,
+        'views': get_store().snapshot(),
+        'replica_lag_seconds': get_health().status(),
+    })
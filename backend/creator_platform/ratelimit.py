@@ -0,0 +1,173 @@
+"""Token-bucket rate limiting for login, signup, checkout and messaging.
+
+Limits are set per scope in ``RATE_LIMITS``, one bucket per identity kind
+(``ip``, ``user``, or ``account`` for the email a login is for). A bucket
+holds up to ``count`` tokens and refills at ``count`` per period, so a
+client can burst up to the limit and then continue at the sustained rate.
+
+The buckets live in Redis. One Lua script refills and checks every bucket
+a request touches and takes a token from each only if all of them have
+one, so a check is a single round trip and atomic across processes.
+Each process also remembers which buckets were empty and until when, and
+rejects those without asking Redis. A rejected request therefore costs
+no network, database or password hashing. When the cache isn't Redis
+(tests, local development), the same buckets are kept in process.
+
+The ``ip`` identity is DRF's ``get_ident``, so it follows the
+``NUM_PROXIES`` setting: a client can't pick its own bucket by sending an
+X-Forwarded-For header.
+"""
+import threading
+import time
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+# KEYS are buckets; ARGV holds capacity and refill rate (tokens/s) per bucket.
+# Returns the seconds each bucket needs before it has a token, as strings
+# because Lua numbers are truncated to integers in replies.
+TAKE_SCRIPT = '''
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens, waits, blocked = {}, {}, false
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'at')
+    local level = tonumber(bucket[1]) or capacity
+    local at = tonumber(bucket[2]) or now
+    level = math.min(capacity, level + math.max(0, now - at) * rate)
+    tokens[i] = level
+    if level < 1 then
+        waits[i] = tostring((1 - level) / rate)
+        blocked = true
+    else
+        waits[i] = '0'
+    end
+end
+if not blocked then
+    for i, key in ipairs(KEYS) do
+        local capacity, rate = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+        redis.call('HSET', key, 'tokens', tokens[i] - 1, 'at', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    end
+end
+return waits
+'''
+
+def parse_rate(rate):
+    """'10/min' -> (capacity 10, refill 10/60 tokens per second)"""
+    count, _, period = rate.partition('/')
+    number = ''.join(ch for ch in period if ch.isdigit()) or '1'
+    unit = period.lstrip('0123456789')
+    return int(count), int(count) / (int(number) * PERIODS[unit])
+
+class RedisBuckets:
+    def __init__(self, client):
+        self.script = client.register_script(TAKE_SCRIPT)
+    
+    def take(self, buckets):
+        keys = [key for key, _, _ in buckets]
+        args = [value for _, capacity, rate in buckets for value in (capacity, rate)]
+        return [float(wait) for wait in self.script(keys=keys, args=args)]
+
+class LocalBuckets:
+    """The same buckets in process memory, for caches other than Redis"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+    
+    def take(self, buckets):
+        now = time.monotonic()
+        with self._lock:
+            levels, waits = [], []
+            for key, capacity, rate in buckets:
+                level, at = self._buckets.get(key, (capacity, now))
+                level = min(capacity, level + (now - at) * rate)
+                levels.append(level)
+                waits.append(0.0 if level >= 1 else (1 - level) / rate)
+            if not any(waits):
+                for (key, _, _), level in zip(buckets, levels):
+                    self._buckets[key] = (level - 1, now)
+            return waits
+
+class RateLimiter:
+    def __init__(self, backend, local_size=100000):
+        self.backend = backend
+        self.local_size = local_size
+        self._blocked = {}
+    
+    def check(self, buckets):
+        """Take a token from each (key, capacity, rate) bucket; return seconds to wait, 0 if allowed"""
+        now = time.monotonic()
+        blocked = self._blocked
+        wait = max((blocked.get(key, 0) - now for key, _, _ in buckets), default=0)
+        if wait > 0:
+            return wait
+        
+        waits = self.backend.take(buckets)
+        if not any(waits):
+            return 0
+        if len(blocked) >= self.local_size:
+            blocked.clear()
+        for (key, _, _), key_wait in zip(buckets, waits):
+            if key_wait:
+                blocked[key] = now + key_wait
+        return max(waits)
+
+_limiter = None
+
+def get_limiter():
+    # Created on first use so settings are read after Django is configured
+    global _limiter
+    if _limiter is None:
+        client = getattr(cache, '_cache', None)
+        if hasattr(client, 'get_client'):
+            backend = RedisBuckets(client.get_client(write=True))
+        else:
+            backend = LocalBuckets()
+        _limiter = RateLimiter(backend, settings.RATE_LIMIT_LOCAL_SIZE)
+    return _limiter
+
+def scope_buckets(scope, identities):
+    """Buckets for the identities present, e.g. {'ip': '1.2.3.4', 'user': 7}"""
+    buckets = []
+    for kind, rate in settings.RATE_LIMITS[scope].items():
+        identity = identities.get(kind)
+        if identity in (None, ''):
+            continue
+        capacity, refill = parse_rate(rate)
+        buckets.append((f'rl:{scope}:{kind}:{identity}', capacity, refill))
+    return buckets
+
+def check_rate_limit(scope, **identities):
+    """Seconds until the scope allows these identities again, 0 if allowed (and counted)"""
+    buckets = scope_buckets(scope, identities)
+    return get_limiter().check(buckets) if buckets else 0
+
+class ScopedRateLimit(BaseThrottle):
+    """DRF throttle for the view's ``throttle_scope``; only requests that change something count"""
+    
+    def allow_request(self, request, view):
+        self.wait_time = 0
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        user = request.user
+        email = None
+        # A JSON body can be a list or a scalar; those have no account to count against
+        if 'account' in settings.RATE_LIMITS[view.throttle_scope] and isinstance(request.data, Mapping):
+            email = request.data.get('email')
+        self.wait_time = check_rate_limit(
+            view.throttle_scope,
+            ip=self.get_ident(request),
+            user=user.pk if user and user.is_authenticated else None,
+            account=email.strip().lower() if isinstance(email, str) else None
+        )
+        return not self.wait_time
+    
+    def wait(self):
+        return self.wait_time
@@ -1,5 +1,7 @@
 import os
-from decouple import config
+import sys
+from celery.schedules import crontab
+from decouple import Csv, config
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,9 +26,9 @@ INSTALLED_APPS = [
     
     # Third party apps
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'channels',
-    'django_extensions',
     
     # Local apps
     'accounts',
@@ -35,9 +37,19 @@ INSTALLED_APPS = [
     'content',
     'messaging',
     'payments',
+    'benchmarks',
+    'events',
 ]
 
+# Development-only apps: daphne's ASGI runserver (so WebSockets work) and
+# django-extensions. Importing daphne installs the Twisted reactor, about a
+# quarter second of every worker's startup, and deployed servers are started
+# by their own CLI rather than runserver.
+if DEBUG:
+    INSTALLED_APPS = ['daphne', *INSTALLED_APPS, 'django_extensions']
+
 MIDDLEWARE = [
+    'creator_platform.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -46,8 +58,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'creator_platform.db_router.ReplicaMiddleware',
 ]
 
+# Per-view timing, Server-Timing headers (for staff, or everyone under DEBUG)
+# and the /api/metrics/ endpoint; histograms cover the current and previous
+# window of this many seconds. INSTRUMENTATION_HOOKS patches requests and
+# DRF serializers to time outbound HTTP and serialization
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+INSTRUMENTATION_HOOKS = config('INSTRUMENTATION_HOOKS', default=True, cast=bool)
+METRICS_WINDOW = 300
+
 ROOT_URLCONF = 'creator_platform.urls'
 
 TEMPLATES = [
@@ -78,9 +99,50 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# With DB_POOL_SIZE set, each process keeps a psycopg pool of up to that many
+# connections, checked before they're handed out; this is the setting to use
+# under ASGI, where persistent connections are per-thread. Otherwise
+# connections are reused between requests for DB_CONN_MAX_AGE seconds.
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=0, cast=int)
+if DB_POOL_SIZE:
+    from psycopg_pool import ConnectionPool
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': min(2, DB_POOL_SIZE),
+            'max_size': DB_POOL_SIZE,
+            'timeout': 10,
+            'check': ConnectionPool.check_connection,
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+# Read replicas, as comma-separated host[:port][/name] sharing the primary's
+# credentials; tests mirror them to the test database
+for number, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    address, _, name = replica.partition('/')
+    host, _, port = address.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'OPTIONS': {**DATABASES['default'].get('OPTIONS', {}), 'connect_timeout': 2},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['creator_platform.db_router.ReplicaRouter']
+
+# Users read from the primary for this long after a write; replicas are
+# checked this often and skipped when lagging more than REPLICA_MAX_LAG
+REPLICA_STICKY_SECONDS = 15
+REPLICA_HEALTH_INTERVAL = 5
+REPLICA_MAX_LAG = 10
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -121,13 +183,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Trusted proxies in front of the app. Client IPs (rate limit buckets)
+    # come from REMOTE_ADDR, or the address this many hops back in
+    # X-Forwarded-For; unset, DRF would use the client-supplied header
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 # CORS settings
@@ -138,16 +204,77 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Shared cache (presence, cached token lookups)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    },
+}
+
+# Cached token authentication: seconds a resolved token stays in the shared
+# cache, and entries kept in each process's local LRU
+TOKEN_CACHE_TTL = 300
+TOKEN_CACHE_LOCAL_SIZE = 10000
+
+# Token-bucket limits per scope and identity ('ip', 'user', or 'account' for
+# the email being logged into): '<count>/<period>' allows bursts of <count>
+# refilled at that rate. Empty buckets are remembered in each process (up
+# to RATE_LIMIT_LOCAL_SIZE) so repeat offenders don't reach Redis.
+RATE_LIMITS = {
+    'login': {'ip': '20/min', 'account': '5/min'},
+    'register': {'ip': '10/hour'},
+    'checkout': {'user': '10/min', 'ip': '30/min'},
+    'messaging': {'user': '60/min'},
+    'data_export': {'user': '3/day'},
+}
+RATE_LIMIT_LOCAL_SIZE = 100000
+
 # Channels settings
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
             "hosts": [('127.0.0.1', 6379)],
+            "capacity": 200,  # per-channel buffer; group sends to a full channel are dropped
         },
     },
 }
 
+# Tests use the in-process layer and cache so they don't need Redis
+TESTING = 'test' in sys.argv or 'pytest' in sys.modules
+if TESTING:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+    # Without configured replicas, tests get one mirroring the test database
+    # so routing to it is exercised. A mirror is a second connection: it only
+    # sees committed rows, so tests reading through it use TransactionTestCase
+    if len(DATABASES) == 1:
+        DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# Max events buffered per WebSocket before a slow client is disconnected
+MESSAGING_WS_SEND_QUEUE_SIZE = 100
+
+# Presence: seconds without a heartbeat before a user is offline, how often
+# each process publishes heartbeats to the cache, and the minimum gap between
+# typing events forwarded per conversation
+PRESENCE_TTL = 60
+PRESENCE_FLUSH_INTERVAL = 5
+TYPING_THROTTLE = 3
+
+# Recipients handled per transaction when fanning out a broadcast
+BROADCAST_CHUNK_SIZE = 1000
+# Seconds without progress before a running broadcast counts as abandoned
+BROADCAST_STALE_AFTER = 300
+
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
@@ -155,6 +282,9 @@ STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
 
 # Platform settings
 PLATFORM_FEE_PERCENTAGE = 12  # 12% platform fee
+# Rows each creator's daily earnings rollup is split across, so a burst of
+# tips to one creator doesn't queue on a single row lock
+EARNING_ROLLUP_SHARDS = 8
 
 # Celery settings
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
@@ -163,6 +293,51 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'weekly-payouts': {
+        'task': 'payments.tasks.run_weekly_payouts',
+        'schedule': crontab(hour=2, minute=0, day_of_week='monday'),
+    },
+    'retry-payouts': {
+        'task': 'payments.tasks.retry_payouts',
+        'schedule': crontab(minute=15),
+    },
+    'dispatch-outbox': {
+        'task': 'events.tasks.dispatch_outbox',
+        'schedule': 10.0,
+    },
+    'purge-outbox': {
+        'task': 'events.tasks.purge_outbox',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'purge-data-exports': {
+        'task': 'accounts.tasks.purge_data_exports',
+        'schedule': crontab(hour=4, minute=0),
+    },
+}
+
+# Outbox events: aggregates are spread over OUTBOX_PARTITIONS, each
+# dispatched by one worker at a time; failed events are retried with
+# backoff (OUTBOX_RETRY_BASE doubling up to OUTBOX_RETRY_MAX seconds) and
+# given up on after OUTBOX_MAX_ATTEMPTS
+OUTBOX_PARTITIONS = 8
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_LOCK_TIMEOUT = 300
+OUTBOX_RETRY_BASE = 5
+OUTBOX_RETRY_MAX = 600
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETENTION_DAYS = 7
+
+# Account deletion: dependent rows are deleted this many primary keys per
+# transaction by the background job
+ACCOUNT_DELETION_CHUNK_SIZE = 1000
+
+# Personal data exports: rows are streamed DATA_EXPORT_CHUNK_SIZE at a
+# time; archives and their signed download links last DATA_EXPORT_TTL_DAYS.
+# Links in emails are built on SITE_URL
+DATA_EXPORT_CHUNK_SIZE = 2000
+DATA_EXPORT_TTL_DAYS = 7
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
 
 # Email settings (for production)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -188,3 +363,4 @@ SUBSCRIPTION_TIERS = [
 
 # Tip amounts
 TIP_AMOUNTS = [1, 5, 10, 25, 50, 100]
+MAX_TIP_AMOUNT = 500
@@ -0,0 +1,38 @@
+"""Streaming responses that stay streamed under ASGI.
+
+Django's ASGI handler consumes a sync ``StreamingHttpResponse`` with
+``sync_to_async(list)``, so the whole body is built in memory before the
+first byte is sent. ``stream_for()`` gives ASGI requests an async iterator
+instead, which pulls one chunk at a time from the sync iterator. The chunks
+are pulled on the request's thread-sensitive executor, so a server-side
+cursor stays on the connection that opened it. WSGI requests get the sync
+iterator unchanged.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_done = object()
+
+def is_asgi(request):
+    # DRF requests wrap the Django one
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+async def iterate_async(iterator):
+    """Yield from a sync iterator without blocking the event loop"""
+    iterator = iter(iterator)
+    step = sync_to_async(next)
+    try:
+        while True:
+            chunk = await step(iterator, _done)
+            if chunk is _done:
+                break
+            yield chunk
+    finally:
+        # A client that disconnects early still releases the cursor
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+def stream_for(request, iterator):
+    """Response content for ``iterator`` that streams under the request's server"""
+    return iterate_async(iterator) if is_asgi(request) else iterator
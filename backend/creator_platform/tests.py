@@ -0,0 +1,269 @@
+import time
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from creators.models import Creator
+from messaging.models import Conversation, Message
+from . import db_router, ratelimit
+from .db_router import use_replica
+from .instrumentation import InstrumentationMiddleware, install_hooks, uninstall_hooks
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def tearDown(self):
+        uninstall_hooks()
+        install_hooks()
+
+    @override_settings(DEBUG=False)
+    def test_server_timing_only_for_staff(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('Server-Timing', response)
+
+        self.client.force_authenticate(User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        ))
+        self.assertNotIn('Server-Timing', self.client.get('/api/metrics/'))
+
+        self.client.force_authenticate(User.objects.create_user(
+            username='staff', email='staff@example.com', password='password123', is_staff=True
+        ))
+        self.assertIn('db;dur=', self.client.get('/api/metrics/')['Server-Timing'])
+
+    @override_settings(DEBUG=False)
+    async def test_server_timing_under_asgi(self):
+        response = await AsyncClient().get('/api/metrics/')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('Server-Timing', response)
+
+        staff = await User.objects.acreate(username='staff', email='staff@example.com', is_staff=True)
+        client = AsyncClient()
+        await client.aforce_login(staff)
+        response = await client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+
+    @override_settings(DEBUG=False)
+    def test_does_not_load_the_session_user(self):
+        middleware = InstrumentationMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(mock.Mock(side_effect=AssertionError('session user loaded')))
+        self.assertNotIn('Server-Timing', middleware(request))
+
+        # Already loaded by the view: a staff user still gets the header
+        staff = User(username='staff', is_staff=True)
+        request.user = SimpleLazyObject(lambda: staff)
+        self.assertTrue(request.user.is_staff)
+        self.assertIn('Server-Timing', middleware(request))
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_for_everyone_under_debug(self):
+        self.assertIn('Server-Timing', self.client.get('/api/metrics/'))
+
+    def test_hooks_can_be_left_off(self):
+        uninstall_hooks()
+        send = requests.Session.send
+        with override_settings(INSTRUMENTATION_HOOKS=False):
+            install_hooks()
+        self.assertIs(requests.Session.send, send)
+
+        uninstall_hooks()
+        install_hooks()
+        self.assertIsNot(requests.Session.send, send)
+        uninstall_hooks()
+        self.assertIs(requests.Session.send, send)
+
+    def test_overhead_per_request(self):
+        # Well under 1% of a request that takes 10ms or more
+        middleware = InstrumentationMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/api/metrics/')
+        calls = 2000
+        started = time.perf_counter()
+        for _ in range(calls):
+            middleware(request)
+        self.assertLess((time.perf_counter() - started) / calls, 0.0001)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReplicaRouterTests(TransactionTestCase):
+    """Routing to the ``replica`` test database, which mirrors ``default``"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        db_router._health = None
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        Creator.objects.create(user=creator_user, display_name='Creator')
+        self.user = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def tearDown(self):
+        db_router._health = None
+
+    def queries(self, path):
+        """(replica queries, default queries) made answering a GET"""
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as default:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(replica), len(default)
+
+    def test_reads_only_opted_in_views_from_the_replica(self):
+        self.assertEqual(User.objects.all().db, 'default')
+        with use_replica():
+            self.assertEqual(User.objects.all().db, 'replica')
+            with transaction.atomic():
+                self.assertEqual(User.objects.all().db, 'default')
+        self.assertEqual(User.objects.all().db, 'default')
+
+        replica, _ = self.queries('/api/creators/')
+        self.assertGreater(replica, 0)
+        response = self.client.get('/api/creators/')
+        self.assertEqual(response.data['results'][0]['display_name'], 'Creator')
+
+        replica, _ = self.queries('/api/auth/profile/')
+        self.assertEqual(replica, 0)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        replica, _ = self.queries('/api/subscriptions/')
+        self.assertGreater(replica, 0)
+
+        response = self.client.patch('/api/auth/profile/', {'bio': 'Hello'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        replica, default = self.queries('/api/subscriptions/')
+        self.assertEqual(replica, 0)
+        self.assertGreater(default, 0)
+
+        # Other users still read from the replica
+        self.client.credentials()
+        replica, _ = self.queries('/api/creators/')
+        self.assertGreater(replica, 0)
+
+    def test_falls_back_to_the_primary_when_the_replica_is_unhealthy(self):
+        with mock.patch('creator_platform.db_router.replica_lag', side_effect=OperationalError('down')):
+            replica, default = self.queries('/api/creators/')
+        self.assertEqual(replica, 0)
+        self.assertGreater(default, 0)
+        self.assertEqual(db_router.get_health().status(), {'replica': None})
+
+        db_router._health = None
+        with override_settings(REPLICA_MAX_LAG=5), \
+                mock.patch('creator_platform.db_router.replica_lag', return_value=30.0):
+            replica, _ = self.queries('/api/creators/')
+        self.assertEqual(replica, 0)
+
+        db_router._health = None
+        replica, _ = self.queries('/api/creators/')
+        self.assertGreater(replica, 0)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATE_LIMITS={'register': {'ip': '2/hour'}, 'login': {'ip': '2/hour', 'account': '1/hour'}},
+)
+class RateLimitIdentityTests(TestCase):
+    def setUp(self):
+        ratelimit._limiter = None
+        self.client = APIClient(REMOTE_ADDR='198.51.100.7')
+
+    def tearDown(self):
+        ratelimit._limiter = None
+
+    def register(self, forwarded_for):
+        return self.client.post('/api/auth/register/', {}, format='json', HTTP_X_FORWARDED_FOR=forwarded_for)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_bucket(self):
+        self.assertEqual(self.register('203.0.113.1').status_code, 400)
+        self.assertEqual(self.register('203.0.113.2').status_code, 400)
+        self.assertEqual(self.register('203.0.113.3').status_code, 429)
+
+    def test_trusted_proxy_hop_is_the_client(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            # The proxy appends the address it saw; anything before it is the client's say
+            self.assertEqual(self.register('10.0.0.1, 203.0.113.1').status_code, 400)
+            self.assertEqual(self.register('10.0.0.2, 203.0.113.1').status_code, 400)
+            self.assertEqual(self.register('10.0.0.3, 203.0.113.1').status_code, 429)
+            self.assertEqual(self.register('10.0.0.3, 203.0.113.2').status_code, 400)
+
+    def test_a_body_that_is_not_an_object_is_limited_by_ip(self):
+        for body in [['fan@example.com'], 'fan@example.com']:
+            ratelimit._limiter = None
+            self.assertEqual(self.client.post('/api/auth/login/', body, format='json').status_code, 400)
+            self.assertEqual(self.client.post('/api/auth/login/', body, format='json').status_code, 400)
+            self.assertEqual(self.client.post('/api/auth/login/', body, format='json').status_code, 429)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATE_LIMITS={'messaging': {}},
+)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator = Creator.objects.create(user=self.creator_user, display_name='Creator')
+        self.subscriber = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        self.conversation = Conversation.objects.create(creator=self.creator, subscriber=self.subscriber)
+        self.message = Message.objects.create(conversation=self.conversation, sender=self.creator_user, content='hi')
+        self.client = APIClient()
+        self.client.force_authenticate(self.subscriber)
+
+    def assert_revalidates(self, url):
+        """GET ``url`` and check a repeat with its ETag is a 304; returns the ETag"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for header in ('Authorization', 'Cookie'):
+            self.assertIn(header, response['Vary'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Authorization', response['Vary'])
+        return etag
+
+    def test_creator_detail(self):
+        url = f'/api/creators/{self.creator.pk}/'
+        etag = self.assert_revalidates(url)
+        self.assertIn('Last-Modified', self.client.get(url))
+
+        self.creator.description = 'Updated'
+        self.creator.save()
+        self.assertNotEqual(self.assert_revalidates(url), etag)
+
+    def test_message_history(self):
+        url = f'/api/messaging/conversations/{self.conversation.pk}/messages/'
+        etags = [self.assert_revalidates(url)]
+        self.assertNotIn('Last-Modified', self.client.get(url))
+
+        # A new message, a read receipt and a delete each change the page
+        Message.objects.create(conversation=self.conversation, sender=self.subscriber, content='hello')
+        etags.append(self.assert_revalidates(url))
+        self.conversation.mark_read(self.creator_user)
+        etags.append(self.assert_revalidates(url))
+        self.message.soft_delete()
+        etags.append(self.assert_revalidates(url))
+        self.assertEqual(len(set(etags)), 4)
+
+        # Another page of the same conversation has its own ETag
+        self.assertNotIn(self.assert_revalidates(url + '?limit=1'), etags)
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .instrumentation import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,6 +28,7 @@ urlpatterns = [
     path('api/content/', include('content.urls')),
     path('api/messaging/', include('messaging.urls')),
     path('api/payments/', include('payments.urls')),
+    path('api/metrics/', metrics, name='metrics'),
 ]
 
 # Serve media files in development
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from payments.fees import calculate_fee
 
 class Creator(models.Model):
     user = models.OneToOneField(
@@ -54,8 +56,7 @@ class Creator(models.Model):
     @property
     def earnings_after_fee(self):
         """Calculate earnings after platform fee"""
-        platform_fee = (settings.PLATFORM_FEE_PERCENTAGE / 100) * self.total_earnings
-        return self.total_earnings - platform_fee
+        return calculate_fee(self.total_earnings)[1]
 
 class CreatorSocialLinks(models.Model):
     creator = models.OneToOneField(
@@ -71,3 +72,8 @@ class CreatorSocialLinks(models.Model):
     
     def __str__(self):
         return f"{self.creator.display_name}'s Social Links"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Social links are served as part of the creator profile
+        Creator.objects.filter(pk=self.creator_id).update(updated_at=timezone.now())
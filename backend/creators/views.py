@@ -1,9 +1,12 @@
 from django.shortcuts import render
-from rest_framework import generics, permissions, status, filters
+from rest_framework import generics, permissions, filters
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Count, Max
+from creator_platform.async_api import async_api_view
+from creator_platform.conditional import ConditionalGetMixin
+from creator_platform.db_router import ReplicaReadMixin, use_replica
 from .models import Creator, CreatorSocialLinks
 from .serializers import (
     CreatorSerializer,
@@ -15,7 +18,7 @@ from .serializers import (
 
 # Create your views here.
 
-class CreatorListView(generics.ListAPIView):
+class CreatorListView(ConditionalGetMixin, ReplicaReadMixin, generics.ListAPIView):
     """Public list of creators for discovery"""
     serializer_class = CreatorListSerializer
     permission_classes = [permissions.AllowAny]
@@ -24,6 +27,7 @@ class CreatorListView(generics.ListAPIView):
     search_fields = ['display_name', 'description', 'user__username']
     ordering_fields = ['subscriber_count', 'created_at', 'total_posts']
     ordering = ['-subscriber_count']
+    send_last_modified = False
     
     def get_queryset(self):
         queryset = Creator.objects.filter(is_active=True)
@@ -33,8 +37,18 @@ class CreatorListView(generics.ListAPIView):
             queryset = queryset.filter(is_adult_content=False)
         
         return queryset
+    
+    def get_version(self):
+        version = self.filter_queryset(self.get_queryset()).aggregate(
+            creators=Max('updated_at'),
+            users=Max('user__updated_at'),
+            count=Count('id')
+        )
+        if not version['count']:
+            return None
+        return max(version['creators'], version['users']), version['count']
 
-class CreatorDetailView(generics.RetrieveAPIView):
+class CreatorDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Public creator profile view"""
     serializer_class = CreatorSerializer
     permission_classes = [permissions.AllowAny]
@@ -48,6 +62,13 @@ class CreatorDetailView(generics.RetrieveAPIView):
             queryset = queryset.filter(is_adult_content=False)
         
         return queryset
+    
+    def get_version(self):
+        # Profile and social link saves touch the user and the creator
+        row = self.get_queryset().filter(id=self.kwargs['id']).values_list(
+            'updated_at', 'user__updated_at'
+        ).first()
+        return (max(row), None) if row else None
 
 class CreatorCreateView(generics.CreateAPIView):
     """Create creator profile (requires user to be creator type)"""
@@ -98,38 +119,36 @@ class CreatorSocialLinksView(generics.RetrieveUpdateAPIView):
         except Creator.DoesNotExist:
             raise generics.Http404("Creator profile not found")
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def featured_creators(request):
+def for_viewer(creators, user):
+    """Hide adult content from users who haven't verified their age"""
+    if not (user.is_authenticated and user.is_age_verified):
+        creators = creators.filter(is_adult_content=False)
+    return creators.select_related('user__profile')
+
+@async_api_view()
+async def featured_creators(request):
     """Get featured creators for homepage"""
-    creators = Creator.objects.filter(
+    creators = for_viewer(Creator.objects.filter(
         is_active=True,
         subscriber_count__gte=100  # Minimum subscribers to be featured
-    ).order_by('-subscriber_count')[:6]
+    ).order_by('-subscriber_count'), request.user)
     
-    # Filter adult content for non-verified users
-    if not (request.user.is_authenticated and request.user.is_age_verified):
-        creators = creators.filter(is_adult_content=False)
-    
-    serializer = CreatorListSerializer(creators, many=True)
-    return Response(serializer.data)
+    async with use_replica(request.user):
+        creators = [creator async for creator in creators[:6]]
+    return CreatorListSerializer(creators, many=True).data
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def trending_creators(request):
+@async_api_view()
+async def trending_creators(request):
     """Get trending creators based on recent activity"""
     # This is a simplified version - in production, you'd calculate based on
     # recent subscriber growth, engagement, etc.
-    creators = Creator.objects.filter(
+    creators = for_viewer(Creator.objects.filter(
         is_active=True
-    ).order_by('-total_posts', '-subscriber_count')[:10]
-    
-    # Filter adult content for non-verified users
-    if not (request.user.is_authenticated and request.user.is_age_verified):
-        creators = creators.filter(is_adult_content=False)
+    ).order_by('-total_posts', '-subscriber_count'), request.user)
     
-    serializer = CreatorListSerializer(creators, many=True)
-    return Response(serializer.data)
+    async with use_replica(request.user):
+        creators = [creator async for creator in creators[:10]]
+    return CreatorListSerializer(creators, many=True).data
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -0,0 +1,50 @@
+"""Domain events through a transactional outbox.
+
+A write that others need to react to calls ``publish()`` inside its own
+``transaction.atomic()`` block. The event is a row in the outbox table, so
+it is committed exactly when the change is and rolled back with it. No
+side effect runs on the request path. Handlers are registered per event
+type with ``@handles``, in each app's ``handlers`` module, and are run
+later by the dispatcher (``events.dispatcher``).
+
+Delivery is at least once. A handler can see the same event again after
+a crash or a failed sibling handler, so it must be idempotent; ``event.pk``
+is stable across redeliveries. Events for one aggregate are handled in
+the order they were published.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import OutboxEvent
+
+_handlers = defaultdict(list)
+
+def handles(*event_types):
+    """Register the decorated function as a handler for these event types"""
+    def register(handler):
+        for event_type in event_types:
+            _handlers[event_type].append(handler)
+        return handler
+    return register
+
+def handlers_for(event_type):
+    return _handlers.get(event_type, [])
+
+def publish(aggregate_type, aggregate_id, event_type, payload=None):
+    """Append an event to the outbox, as part of the current transaction"""
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError('publish() must be called inside transaction.atomic() with the change it describes')
+    event = OutboxEvent.objects.create(
+        aggregate_type=aggregate_type,
+        aggregate_id=str(aggregate_id),
+        event_type=event_type,
+        payload=payload or {}
+    )
+    # Dispatch soon after commit; the periodic sweep covers a lost nudge
+    transaction.on_commit(lambda: nudge(event.partition), robust=True)
+    return event
+
+def nudge(partition):
+    from .tasks import dispatch_outbox_partition
+    dispatch_outbox_partition.delay(partition)
@@ -0,0 +1,152 @@
+"""Outbox dispatch: batched, ordered per aggregate, at least once.
+
+Events are spread over ``OUTBOX_PARTITIONS`` partitions by aggregate, and
+a partition is dispatched by one worker at a time under a cache lock. The
+lock is checked and extended before every batch, so a long run keeps it
+and a run that lost it stops. A dispatcher reads a batch of the
+partition's pending events in id order and runs each event's handlers.
+It then marks the delivered events with a single UPDATE. Batches page on
+by id, so a batch that is all held events doesn't end the run.
+
+When a handler raises, the event is retried later with exponential
+backoff. Until it succeeds, later events for the same aggregate are held
+back; other aggregates carry on. Events waiting for a retry are left out
+of the scan, and their aggregates are looked up once per run. After ``OUTBOX_MAX_ATTEMPTS`` the event
+is marked failed and logged. It is kept for inspection, and the
+aggregate's later events are released.
+"""
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .bus import handlers_for
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+def lock_key(partition):
+    return f'outbox:lock:{partition}'
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX))
+
+class Dispatcher:
+    def __init__(self, partition, batch_size=None, log=None):
+        self.partition = partition
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.log = log or (lambda message: None)
+    
+    def run(self, max_batches=None):
+        """Dispatch until the partition has nothing ready; returns events delivered, or None if locked"""
+        token = uuid.uuid4().hex
+        key = lock_key(self.partition)
+        if not cache.add(key, token, timeout=settings.OUTBOX_LOCK_TIMEOUT):
+            return None
+        delivered = 0
+        try:
+            held = self.waiting_aggregates()
+            after, batches = 0, 0
+            while max_batches is None or batches < max_batches:
+                if batches and not self.keep_lock(key, token):
+                    logger.warning('Outbox partition %s: lock lost, stopping', self.partition)
+                    break
+                count, after = self.run_batch(after, held)
+                delivered += count
+                batches += 1
+                if after is None:
+                    break
+        finally:
+            if cache.get(key) == token:
+                cache.delete(key)
+        return delivered
+    
+    def keep_lock(self, key, token):
+        """Whether the lock is still ours; if so it's good for another OUTBOX_LOCK_TIMEOUT"""
+        if cache.get(key) != token:
+            return False
+        return cache.touch(key, settings.OUTBOX_LOCK_TIMEOUT)
+    
+    def undelivered(self):
+        return OutboxEvent.objects.filter(
+            partition=self.partition,
+            dispatched_at__isnull=True,
+            failed_at__isnull=True
+        )
+    
+    def waiting_aggregates(self):
+        """Aggregates whose next event is waiting for a retry"""
+        return set(self.undelivered().filter(
+            next_attempt_at__gt=timezone.now()
+        ).values_list('aggregate_type', 'aggregate_id').distinct())
+    
+    def pending(self, after=0):
+        return self.undelivered().filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+            id__gt=after
+        ).order_by('id')[:self.batch_size]
+    
+    def run_batch(self, after=0, held=None):
+        """Handle the batch after id ``after``; returns (delivered, id to go on from or None when done)
+        
+        ``held`` aggregates are skipped, and aggregates that fail are added to it.
+        """
+        held = set() if held is None else held
+        events = list(self.pending(after))
+        if not events:
+            return 0, None
+        
+        now = timezone.now()
+        started = time.perf_counter()
+        delivered = []
+        for event in events:
+            aggregate = (event.aggregate_type, event.aggregate_id)
+            if aggregate in held:
+                continue
+            try:
+                for handler in handlers_for(event.event_type):
+                    handler(event)
+            except Exception as e:
+                self.record_failure(event, e, now)
+                # Nothing after it for this aggregate until it goes through
+                held.add(aggregate)
+                continue
+            delivered.append(event.pk)
+        
+        if delivered:
+            OutboxEvent.objects.filter(pk__in=delivered).update(dispatched_at=timezone.now())
+            self.log(f'partition {self.partition}: {len(delivered)} events in '
+                     f'{(time.perf_counter() - started) * 1000:.1f}ms')
+        # A short batch had everything that was ready
+        return len(delivered), events[-1].pk if len(events) == self.batch_size else None
+    
+    def record_failure(self, event, error, now):
+        attempts = event.attempts + 1
+        update = {'attempts': attempts, 'last_error': f'{type(error).__name__}: {error}'[:2000]}
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            update['failed_at'] = now
+            logger.error('Outbox event %s (%s) failed after %s attempts', event.pk, event.event_type,
+                         attempts, exc_info=error)
+        else:
+            update['next_attempt_at'] = now + retry_delay(attempts)
+            logger.warning('Outbox event %s (%s) failed, attempt %s', event.pk, event.event_type,
+                           attempts, exc_info=error)
+        OutboxEvent.objects.filter(pk=event.pk).update(**update)
+
+def dispatch_all(batch_size=None, log=None):
+    """One pass over every partition; returns events delivered"""
+    delivered = 0
+    for partition in range(settings.OUTBOX_PARTITIONS):
+        delivered += Dispatcher(partition, batch_size, log).run() or 0
+    return delivered
+
+def purge_dispatched(days=None):
+    """Delete events delivered more than ``days`` ago"""
+    cutoff = timezone.now() - timedelta(days=days or settings.OUTBOX_RETENTION_DAYS)
+    deleted, _ = OutboxEvent.objects.filter(dispatched_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.dispatcher import Dispatcher, purge_dispatched
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox events to their handlers, once or continuously'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--partition', type=int, action='append', help='Repeatable; default all')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when idle (--loop)')
+        parser.add_argument('--purge', action='store_true', help='Also delete events delivered before the retention window')
+    
+    def handle(self, *args, **options):
+        partitions = options['partition'] or range(settings.OUTBOX_PARTITIONS)
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        
+        while True:
+            started = time.perf_counter()
+            delivered = sum(
+                Dispatcher(partition, options['batch_size'], log).run() or 0
+                for partition in partitions
+            )
+            if delivered or not options['loop']:
+                self.stdout.write(f'{delivered} events delivered in {time.perf_counter() - started:.2f}s')
+            if not options['loop']:
+                break
+            if not delivered:
+                time.sleep(options['interval'])
+        
+        if options['purge']:
+            self.stdout.write(f'{purge_dispatched()} delivered events purged')
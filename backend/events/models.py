@@ -0,0 +1,46 @@
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+def partition_for(aggregate_type, aggregate_id):
+    """Events for one aggregate always land in the same partition"""
+    return zlib.crc32(f'{aggregate_type}:{aggregate_id}'.encode()) % settings.OUTBOX_PARTITIONS
+
+class OutboxEvent(models.Model):
+    """A domain event, written in the same transaction as the change it describes"""
+    aggregate_type = models.CharField(max_length=50)
+    aggregate_id = models.CharField(max_length=64)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    partition = models.PositiveSmallIntegerField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    
+    # Delivery bookkeeping: failed_at is set once retries run out
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The dispatcher's scan: a partition's undelivered events in order
+            models.Index(
+                fields=['partition', 'id'],
+                name='outbox_pending',
+                condition=models.Q(dispatched_at__isnull=True, failed_at__isnull=True)
+            ),
+            models.Index(fields=['aggregate_type', 'aggregate_id', 'id'], name='outbox_aggregate'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.aggregate_type}:{self.aggregate_id}"
+    
+    def save(self, *args, **kwargs):
+        if self.partition is None:
+            self.partition = partition_for(self.aggregate_type, self.aggregate_id)
+        super().save(*args, **kwargs)
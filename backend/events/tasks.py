@@ -0,0 +1,16 @@
+from celery import shared_task
+from .dispatcher import Dispatcher, dispatch_all, purge_dispatched
+
+@shared_task(ignore_result=True)
+def dispatch_outbox_partition(partition):
+    """Deliver a partition's pending events (a no-op while another worker holds it)"""
+    return Dispatcher(partition).run()
+
+@shared_task(ignore_result=True)
+def dispatch_outbox():
+    """Periodic sweep: retries, and events whose post-commit nudge was lost"""
+    return dispatch_all()
+
+@shared_task
+def purge_outbox():
+    return purge_dispatched()
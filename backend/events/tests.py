@@ -0,0 +1,77 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .bus import handles
+from .dispatcher import Dispatcher, lock_key
+from .models import OutboxEvent
+
+handled = []
+
+@handles('test.event')
+def record(event):
+    if event.payload.get('fail'):
+        raise RuntimeError('handler failed')
+    handled.append(event.pk)
+
+def add_event(aggregate_id, **fields):
+    return OutboxEvent.objects.create(
+        aggregate_type='test', aggregate_id=str(aggregate_id), event_type='test.event', partition=0, **fields
+    )
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DispatcherTests(TestCase):
+    def setUp(self):
+        handled.clear()
+        cache.clear()
+
+    def test_a_batch_of_held_events_does_not_end_the_run(self):
+        later = timezone.now() + timedelta(minutes=5)
+        waiting = [add_event(n, attempts=1, next_attempt_at=later) for n in range(3)]
+        # Events behind a waiting one stay put, in order
+        behind = [add_event(n) for n in range(3)]
+        ready = [add_event(n) for n in range(10, 13)]
+
+        self.assertEqual(Dispatcher(0, batch_size=2).run(), 3)
+        self.assertEqual(handled, [event.pk for event in ready])
+        self.assertEqual(OutboxEvent.objects.filter(
+            pk__in=[event.pk for event in waiting + behind], dispatched_at__isnull=True
+        ).count(), 6)
+
+    def test_failure_holds_the_aggregate_for_the_rest_of_the_run(self):
+        failing = add_event(1, payload={'fail': True})
+        add_event(2)
+        behind = add_event(1)
+        add_event(3)
+
+        self.assertEqual(Dispatcher(0, batch_size=1).run(), 2)
+        self.assertNotIn(behind.pk, handled)
+        failing.refresh_from_db()
+        self.assertEqual(failing.attempts, 1)
+        self.assertGreater(failing.next_attempt_at, timezone.now())
+
+    def test_lock_is_extended_per_batch_and_a_lost_lock_stops_the_run(self):
+        for n in range(4):
+            add_event(n)
+        dispatcher = Dispatcher(0, batch_size=1)
+        with mock.patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            self.assertEqual(dispatcher.run(), 4)
+        self.assertEqual(touch.call_count, 4)
+        self.assertIsNone(cache.get(lock_key(0)))
+
+        for n in range(4):
+            add_event(n)
+        run_batch = dispatcher.run_batch
+
+        def lose_lock(*args, **kwargs):
+            # Another dispatcher takes over once the lock has expired
+            result = run_batch(*args, **kwargs)
+            cache.set(lock_key(0), 'someone-else')
+            return result
+
+        with mock.patch.object(dispatcher, 'run_batch', side_effect=lose_lock):
+            self.assertEqual(dispatcher.run(), 1)
+        self.assertEqual(cache.get(lock_key(0)), 'someone-else')
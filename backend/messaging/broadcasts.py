@@ -0,0 +1,126 @@
+"""Set-based fan-out of creator broadcasts to every active subscriber.
+
+Recipients are streamed from Subscription in subscriber id order, one chunk
+per transaction. Each chunk upserts the missing conversations, bulk inserts
+the messages and bumps the conversations' last-message fields and unread
+counters with a single UPDATE, then records its progress in the same
+transaction so a failed or interrupted job resumes at the next chunk.
+``bulk_create`` skips ``Message.save``, so once a chunk commits its
+messages are pushed with one channel layer event for the whole chunk.
+
+A run first claims the broadcast with a conditional status update, so a
+redelivered task and a manual resume don't both send it. Each chunk also
+locks the broadcast row and starts from the committed watermark, so even
+two runs that overlap can never send the same chunk twice. Runs bump
+``heartbeat_at`` per chunk. A broadcast left ``running`` by a dead worker
+can be claimed again once its heartbeat is ``BROADCAST_STALE_AFTER``
+seconds old.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
+from django.utils import timezone
+
+from subscriptions.models import Subscription
+from .models import Broadcast, Conversation, Message
+from .realtime import push_broadcast_chunk
+
+def recipients(broadcast):
+    return Subscription.objects.filter(
+        creator_id=broadcast.creator_id,
+        status='active',
+        current_period_end__gt=timezone.now()
+    )
+
+def send_chunk(broadcast, subscriber_ids):
+    creator = broadcast.creator
+    
+    Conversation.objects.bulk_create(
+        [Conversation(creator=creator, subscriber_id=subscriber_id) for subscriber_id in subscriber_ids],
+        ignore_conflicts=True
+    )
+    conversation_ids = list(Conversation.objects.filter(
+        creator=creator,
+        subscriber_id__in=subscriber_ids
+    ).values_list('id', flat=True))
+    
+    messages = [
+        Message(
+            conversation_id=conversation_id,
+            sender_id=creator.user_id,
+            message_type=broadcast.message_type,
+            content=broadcast.content,
+            media_file=broadcast.media_file.name or None,
+            media_thumbnail=broadcast.media_thumbnail.name or None,
+            broadcast=broadcast
+        )
+        for conversation_id in conversation_ids
+    ]
+    Message.objects.bulk_create(messages)
+    if not messages:
+        return
+    
+    # Each conversation's last message time is its copy's own created_at
+    Conversation.objects.filter(id__in=conversation_ids).update(
+        last_message_at=Case(
+            *[When(id=message.conversation_id, then=Value(message.created_at)) for message in messages],
+            output_field=DateTimeField()
+        ),
+        last_message_preview=messages[0].get_preview(),
+        subscriber_unread_count=F('subscriber_unread_count') + 1
+    )
+    transaction.on_commit(lambda: push_broadcast_chunk(broadcast.creator_id, messages))
+
+def resumable():
+    """Broadcasts a run may pick up: failed, or running with a dead worker"""
+    stale = timezone.now() - timedelta(seconds=settings.BROADCAST_STALE_AFTER)
+    return Q(status='failed') | Q(status='running') & (Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True))
+
+def claim(broadcast_id):
+    """Mark the broadcast running for this run; False if it's done or another run has it"""
+    return Broadcast.objects.filter(Q(status='pending') | resumable(), pk=broadcast_id).update(
+        status='running', heartbeat_at=timezone.now(), error=''
+    ) == 1
+
+def run_broadcast(broadcast_id, chunk_size=None):
+    """Deliver a broadcast, resuming from its last completed chunk"""
+    chunk_size = chunk_size or settings.BROADCAST_CHUNK_SIZE
+    if not claim(broadcast_id):
+        return Broadcast.objects.get(pk=broadcast_id)
+    
+    broadcast = Broadcast.objects.select_related('creator').get(pk=broadcast_id)
+    broadcast.started_at = broadcast.started_at or timezone.now()
+    broadcast.total_recipients = broadcast.sent_count + recipients(broadcast).filter(
+        subscriber_id__gt=broadcast.last_subscriber_id
+    ).count()
+    broadcast.save(update_fields=['started_at', 'total_recipients'])
+    
+    try:
+        while True:
+            with transaction.atomic():
+                # Chunks are serialized on the broadcast row and start where
+                # the last committed one stopped
+                last_subscriber_id = Broadcast.objects.select_for_update().values_list(
+                    'last_subscriber_id', flat=True
+                ).get(pk=broadcast.pk)
+                subscriber_ids = list(recipients(broadcast).filter(
+                    subscriber_id__gt=last_subscriber_id
+                ).order_by('subscriber_id').values_list('subscriber_id', flat=True)[:chunk_size])
+                if not subscriber_ids:
+                    break
+                
+                send_chunk(broadcast, subscriber_ids)
+                Broadcast.objects.filter(pk=broadcast.pk).update(
+                    last_subscriber_id=subscriber_ids[-1],
+                    sent_count=F('sent_count') + len(subscriber_ids),
+                    heartbeat_at=timezone.now()
+                )
+    except Exception as e:
+        Broadcast.objects.filter(pk=broadcast.pk).update(status='failed', error=str(e))
+        raise
+    
+    Broadcast.objects.filter(pk=broadcast.pk).update(status='completed', completed_at=timezone.now())
+    broadcast.refresh_from_db()
+    return broadcast
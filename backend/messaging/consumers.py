@@ -0,0 +1,249 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.db.models import Q
+
+from creator_platform.ratelimit import check_rate_limit
+from .models import Conversation, Message
+from .presence import ensure_flusher, get_presence
+from .realtime import broadcast_group, conversation_group, user_group
+
+# Frame types that name a conversation
+CONVERSATION_ACTIONS = {'subscribe', 'unsubscribe', 'message.send', 'typing'}
+
+def is_id(value):
+    # bool is an int subclass, but True is not a conversation
+    return type(value) is int
+
+class MessagingConsumer(AsyncJsonWebsocketConsumer):
+    """Live messages and tip notifications for one authenticated user.
+
+    The socket joins the user's own group on connect, and a conversation's
+    group plus its creator's broadcast group once the client subscribes to
+    it. Outgoing events are buffered in a
+    bounded queue drained by a single writer task, so group delivery never
+    waits on a slow client; a client that falls too far behind is closed with
+    code 4008 and should resync over the HTTP API before reconnecting.
+
+    Presence and typing state never touch the database: heartbeats go to
+    the in-memory presence store, and typing events are throttled per
+    conversation on the socket before they reach the channel layer.
+
+    Client frames:
+        {"type": "subscribe", "conversation": <id>}
+        {"type": "unsubscribe", "conversation": <id>}
+        {"type": "message.send", "conversation": <id>, "content": "..."}
+        {"type": "heartbeat"}
+        {"type": "typing", "conversation": <id>}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        self.user = user
+        # Subscribed conversation id -> its creator id
+        self.conversations = {}
+        self.typing_sent_at = {}
+        self.overflowed = False
+        self.outbox = asyncio.Queue(maxsize=settings.MESSAGING_WS_SEND_QUEUE_SIZE)
+        self.writer = asyncio.ensure_future(self.drain_outbox())
+
+        await self.channel_layer.group_add(user_group(user.pk), self.channel_name)
+        await self.accept()
+
+        get_presence().connect(user.pk)
+        ensure_flusher()
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'user'):
+            return
+
+        self.writer.cancel()
+        await sync_to_async(get_presence().disconnect, thread_sensitive=False)(self.user.pk)
+        await self.channel_layer.group_discard(user_group(self.user.pk), self.channel_name)
+        for conversation_id in self.conversations:
+            await self.channel_layer.group_discard(
+                conversation_group(conversation_id), self.channel_name
+            )
+        for creator_id in set(self.conversations.values()):
+            await self.channel_layer.group_discard(broadcast_group(creator_id), self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        # Malformed frames get an error frame instead of closing the socket
+        try:
+            content = await self.decode_json(text_data)
+        except (TypeError, ValueError):
+            self.enqueue({'type': 'error', 'detail': 'Frames must be JSON text'})
+            return
+        await self.receive_json(content, **kwargs)
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            self.enqueue({'type': 'error', 'detail': 'Frames must be JSON objects'})
+            return
+        action = content.get('type')
+        conversation_id = content.get('conversation')
+        if action in CONVERSATION_ACTIONS and not is_id(conversation_id):
+            self.enqueue({'type': 'error', 'detail': 'conversation must be an integer id'})
+            return
+
+        if action == 'heartbeat':
+            get_presence().heartbeat(self.user.pk)
+        elif action == 'typing':
+            await self.typing(conversation_id)
+        elif action == 'subscribe':
+            await self.subscribe(conversation_id)
+        elif action == 'unsubscribe':
+            await self.unsubscribe(conversation_id)
+        elif action == 'message.send':
+            await self.send_message(conversation_id, content.get('content', ''))
+        else:
+            self.enqueue({'type': 'error', 'detail': 'Unknown event type'})
+
+    async def subscribe(self, conversation_id):
+        if conversation_id in self.conversations:
+            return
+        creator_id = await self.conversation_creator(conversation_id)
+        if creator_id is None:
+            self.enqueue({'type': 'error', 'detail': 'Conversation not found'})
+            return
+
+        self.conversations[conversation_id] = creator_id
+        await self.channel_layer.group_add(
+            conversation_group(conversation_id), self.channel_name
+        )
+        # Broadcast copies arrive per chunk on the creator's group
+        await self.channel_layer.group_add(broadcast_group(creator_id), self.channel_name)
+        self.enqueue({'type': 'subscribed', 'conversation': conversation_id})
+
+    async def unsubscribe(self, conversation_id):
+        if conversation_id not in self.conversations:
+            return
+
+        creator_id = self.conversations.pop(conversation_id)
+        await self.channel_layer.group_discard(
+            conversation_group(conversation_id), self.channel_name
+        )
+        if creator_id not in self.conversations.values():
+            await self.channel_layer.group_discard(broadcast_group(creator_id), self.channel_name)
+
+    async def send_message(self, conversation_id, text):
+        if not isinstance(text, str) or not text:
+            self.enqueue({'type': 'error', 'detail': 'Message content is required'})
+            return
+        # Shares the 'messaging' buckets with the HTTP send endpoints
+        wait = await sync_to_async(check_rate_limit, thread_sensitive=False)('messaging', user=self.user.pk)
+        if wait:
+            self.enqueue({'type': 'error', 'detail': 'Rate limited', 'retry_after': round(wait, 1)})
+            return
+        if not await self.is_participant(conversation_id):
+            self.enqueue({'type': 'error', 'detail': 'Conversation not found'})
+            return
+
+        # Delivery to the group (including this socket) happens on commit
+        await self.create_message(conversation_id, text)
+
+    async def typing(self, conversation_id):
+        # Only subscribed conversations, and at most one event per throttle window
+        if conversation_id not in self.conversations:
+            return
+        now = time.monotonic()
+        if now - self.typing_sent_at.get(conversation_id, 0) < settings.TYPING_THROTTLE:
+            return
+
+        self.typing_sent_at[conversation_id] = now
+        await self.channel_layer.group_send(conversation_group(conversation_id), {
+            'type': 'conversation.typing',
+            'conversation': conversation_id,
+            'user': self.user.pk,
+        })
+
+    @database_sync_to_async
+    def is_participant(self, conversation_id):
+        return Conversation.objects.filter(
+            Q(subscriber=self.user) | Q(creator__user=self.user),
+            id=conversation_id
+        ).exists()
+
+    @database_sync_to_async
+    def conversation_creator(self, conversation_id):
+        """The conversation's creator id if the user is in it, else None"""
+        return Conversation.objects.filter(
+            Q(subscriber=self.user) | Q(creator__user=self.user),
+            id=conversation_id
+        ).values_list('creator_id', flat=True).first()
+
+    @database_sync_to_async
+    def create_message(self, conversation_id, text):
+        conversation = Conversation.objects.get(id=conversation_id)
+        return Message.objects.create(
+            conversation=conversation,
+            sender=self.user,
+            message_type='text',
+            content=text
+        )
+
+    # Channel layer event handlers
+
+    async def chat_message(self, event):
+        self.enqueue({'type': 'message.new', 'message': event['message']})
+
+    async def broadcast_messages(self, event):
+        for conversation_id in self.conversations:
+            copy = event['copies'].get(str(conversation_id))
+            if copy is not None:
+                message_id, created_at = copy
+                self.enqueue({'type': 'message.new', 'message': {
+                    **event['message'], 'id': message_id, 'conversation': conversation_id, 'created_at': created_at
+                }})
+
+    async def tip_received(self, event):
+        self.enqueue({'type': 'tip.received', 'tip': event['tip']})
+
+    async def subscription_changed(self, event):
+        self.enqueue({
+            'type': event['event'],
+            'subscription': event['subscription'],
+            'subscriber': event['subscriber'],
+        })
+
+    async def conversation_read(self, event):
+        self.enqueue({
+            'type': 'conversation.read',
+            'conversation': event['conversation'],
+            'side': event['side'],
+            'last_read': event['last_read'],
+        })
+
+    async def conversation_typing(self, event):
+        if event['user'] != self.user.pk:
+            self.enqueue({
+                'type': 'conversation.typing',
+                'conversation': event['conversation'],
+                'user': event['user'],
+            })
+
+    # Outbound buffering
+
+    def enqueue(self, payload):
+        if self.overflowed:
+            return
+        try:
+            self.outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Don't buffer without bound for a client that stopped reading
+            self.overflowed = True
+            self.writer.cancel()
+            asyncio.ensure_future(self.close(code=4008))
+
+    async def drain_outbox(self):
+        while True:
+            payload = await self.outbox.get()
+            await self.send_json(payload)
@@ -0,0 +1,64 @@
+"""Keyset paging over a conversation's messages by (created_at, id).
+
+Pages are located through the partial ``message_history`` index, so
+loading older or newer messages costs the same at any depth instead of
+sorting or skipping over the whole history. Only the page's own rows are
+then fetched from the table.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Message
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(message):
+    raw = f'{message.created_at.isoformat()}|{message.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, message_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+def get_page(conversation_id, before=None, after=None, limit=50):
+    """Return (messages oldest first, older cursor, newer cursor).
+
+    Without a cursor the newest page is returned. ``before`` pages back
+    towards older messages, ``after`` forward towards newer ones. The older
+    cursor is None once the start of the history is reached; the newer
+    cursor is always set so clients can poll for new messages with it.
+    """
+    queryset = Message.objects.filter(conversation_id=conversation_id, is_deleted=False)
+    
+    if after:
+        created_at, message_id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+        ).order_by('created_at', 'id')
+    else:
+        if before:
+            created_at, message_id = decode_cursor(before)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+            )
+        queryset = queryset.order_by('-created_at', '-id')
+    
+    # One extra row tells us whether another page exists in this direction
+    messages = list(queryset[:limit + 1])
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        messages.reverse()
+    
+    if not messages:
+        return [], None, after
+    
+    older = encode_cursor(messages[0]) if after or has_more else None
+    return messages, older, encode_cursor(messages[-1])
@@ -0,0 +1,104 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from accounts.models import User
+from creators.models import Creator
+from messaging.history import get_page
+from messaging.models import Conversation, Message
+
+class Command(BaseCommand):
+    help = 'Benchmark cursor-paged message history on a very long conversation'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1_000_000)
+        parser.add_argument('--conversation', type=int, help='Benchmark an existing conversation instead of seeding one')
+        parser.add_argument('--pages', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=50)
+    
+    def handle(self, *args, **options):
+        if options['conversation']:
+            conversation = Conversation.objects.get(id=options['conversation'])
+        else:
+            conversation = self.seed(options['messages'])
+        
+        limit = options['limit']
+        pages = options['pages']
+        
+        # Walk back from the newest message, then forward again from the oldest page reached
+        backward = []
+        cursor = None
+        for _ in range(pages):
+            started = time.perf_counter()
+            messages, cursor, _newer = get_page(conversation.id, before=cursor, limit=limit)
+            backward.append(time.perf_counter() - started)
+            if cursor is None:
+                break
+        
+        forward = []
+        cursor = _newer if messages else None
+        for _ in range(pages):
+            if cursor is None:
+                break
+            started = time.perf_counter()
+            messages, _older, newer = get_page(conversation.id, after=cursor, limit=limit)
+            forward.append(time.perf_counter() - started)
+            if not messages:
+                break
+            cursor = newer
+        
+        # Deep page via OFFSET for comparison with the keyset path
+        total = Message.objects.filter(conversation=conversation, is_deleted=False).count()
+        started = time.perf_counter()
+        list(Message.objects.filter(
+            conversation=conversation, is_deleted=False
+        ).order_by('-created_at', '-id')[max(total - limit, 0):total])
+        offset_time = time.perf_counter() - started
+        
+        self.report('backward', backward)
+        self.report('forward', forward)
+        self.stdout.write(f'offset (oldest page of {total}): {offset_time * 1000:.2f}ms')
+    
+    def report(self, label, timings):
+        if not timings:
+            self.stdout.write(f'{label}: no pages')
+            return
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{label}: {len(timings)} pages, p50={statistics.median(timings) * 1000:.2f}ms '
+            f'p95={p95 * 1000:.2f}ms max={timings[-1] * 1000:.2f}ms'
+        )
+    
+    def seed(self, count):
+        suffix = int(time.time())
+        creator_user = User.objects.create_user(
+            email=f'bench-creator-{suffix}@example.com', username=f'bench-creator-{suffix}',
+            password=None, account_type='creator'
+        )
+        subscriber = User.objects.create_user(
+            email=f'bench-subscriber-{suffix}@example.com', username=f'bench-subscriber-{suffix}',
+            password=None
+        )
+        creator = Creator.objects.create(user=creator_user, display_name='History benchmark')
+        conversation = Conversation.objects.create(creator=creator, subscriber=subscriber)
+        
+        self.stdout.write(f'Seeding {count} messages into conversation {conversation.id}...')
+        batch_size = 10_000
+        senders = [creator_user.id, subscriber.id]
+        for start in range(0, count, batch_size):
+            Message.objects.bulk_create([
+                Message(
+                    conversation_id=conversation.id,
+                    sender_id=senders[i % 2],
+                    content=f'Message {i}',
+                    is_deleted=i % 97 == 0
+                )
+                for i in range(start, min(start + batch_size, count))
+            ], batch_size=batch_size)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE messaging_message')
+        return conversation
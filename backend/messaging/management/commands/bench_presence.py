@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from messaging.presence import PresenceStore
+
+class Command(BaseCommand):
+    help = 'Benchmark presence heartbeats, flushes and batched online lookups'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50_000)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--batch', type=int, default=50, help='Ids per online() lookup, like one inbox page')
+    
+    def handle(self, *args, **options):
+        users = options['users']
+        store = PresenceStore()
+        user_ids = list(range(1, users + 1))
+        
+        for user_id in user_ids:
+            store.connect(user_id)
+        store.flush()
+        
+        heartbeat_times = []
+        flush_times = []
+        for _ in range(options['rounds']):
+            random.shuffle(user_ids)
+            started = time.perf_counter()
+            for user_id in user_ids:
+                store.heartbeat(user_id)
+            heartbeat_times.append(time.perf_counter() - started)
+            
+            started = time.perf_counter()
+            store.flush()
+            flush_times.append(time.perf_counter() - started)
+        
+        # Half the lookups miss locally and fall through to the shared cache
+        lookups = 1000
+        batch = options['batch']
+        started = time.perf_counter()
+        for _ in range(lookups):
+            store.online(random.sample(range(1, users * 2), batch))
+        lookup_time = (time.perf_counter() - started) / lookups
+        
+        best = min(heartbeat_times)
+        self.stdout.write(
+            f'{users} users: {users / best:,.0f} heartbeats/s '
+            f'({best / users * 1e6:.2f}us each), '
+            f'flush {min(flush_times) * 1000:.1f}ms, '
+            f'online() for {batch} ids {lookup_time * 1000:.3f}ms'
+        )
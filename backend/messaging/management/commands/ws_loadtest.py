@@ -0,0 +1,76 @@
+import asyncio
+import statistics
+import time
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from messaging.consumers import MessagingConsumer
+from messaging.realtime import conversation_group
+
+class LoadTestConsumer(MessagingConsumer):
+    """Consumer that skips the membership query so sockets need no DB rows"""
+
+    async def is_participant(self, conversation_id):
+        return True
+
+class Command(BaseCommand):
+    help = 'Measure WebSocket fan-out latency for one conversation group with many sockets'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=2000)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--timeout', type=float, default=10.0)
+    
+    def handle(self, *args, **options):
+        latencies = asyncio.run(self.run(
+            options['sockets'], options['rounds'], options['timeout']
+        ))
+        
+        latencies.sort()
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+        
+        self.stdout.write(
+            f"{options['sockets']} sockets x {options['rounds']} rounds: "
+            f"p50={percentile(0.50):.2f}ms p95={percentile(0.95):.2f}ms "
+            f"p99={percentile(0.99):.2f}ms max={latencies[-1] * 1000:.2f}ms "
+            f"mean={statistics.mean(latencies) * 1000:.2f}ms"
+        )
+    
+    async def run(self, sockets, rounds, timeout):
+        application = LoadTestConsumer.as_asgi()
+        conversation_id = 1
+        communicators = []
+        
+        for i in range(sockets):
+            communicator = WebsocketCommunicator(application, '/ws/messaging/')
+            communicator.scope['user'] = User(pk=i + 1, username=f'loadtest{i}')
+            communicators.append(communicator)
+        
+        await asyncio.gather(*(c.connect() for c in communicators))
+        for communicator in communicators:
+            await communicator.send_json_to({'type': 'subscribe', 'conversation': conversation_id})
+        await asyncio.gather(*(c.receive_json_from(timeout) for c in communicators))
+        
+        channel_layer = get_channel_layer()
+        latencies = []
+        
+        async def receive(communicator, sent_at):
+            await communicator.receive_json_from(timeout)
+            latencies.append(time.perf_counter() - sent_at)
+        
+        try:
+            for round_number in range(rounds):
+                sent_at = time.perf_counter()
+                await channel_layer.group_send(conversation_group(conversation_id), {
+                    'type': 'chat.message',
+                    'message': {'id': round_number, 'content': 'load test'},
+                })
+                await asyncio.gather(*(receive(c, sent_at) for c in communicators))
+        finally:
+            await asyncio.gather(*(c.disconnect() for c in communicators))
+        
+        return latencies
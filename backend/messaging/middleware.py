@@ -0,0 +1,34 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+
+from accounts.authentication import resolve_token
+
+@database_sync_to_async
+def get_user_for_token(key):
+    return resolve_token(key) or AnonymousUser()
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticate WebSocket connections with a DRF token.
+
+    Browsers can't set headers on WebSocket requests, so the token may be
+    passed as ``?token=<key>`` as well as an ``Authorization: Token <key>``
+    header.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token_key(scope)
+        scope['user'] = await get_user_for_token(key) if key else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+    
+    def get_token_key(self, scope):
+        headers = dict(scope.get('headers', []))
+        auth = headers.get(b'authorization', b'').decode().split()
+        if len(auth) == 2 and auth[0].lower() == 'token':
+            return auth[1]
+        
+        query = parse_qs(scope.get('query_string', b'').decode())
+        return query.get('token', [None])[0]
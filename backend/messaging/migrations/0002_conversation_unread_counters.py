@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:58
+
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    epoch = Value(datetime(1970, 1, 1, tzinfo=timezone.utc))
+
+    def unread_for(last_read_field, reader_field):
+        counts = Message.objects.filter(
+            conversation=OuterRef('pk'),
+            is_deleted=False,
+            created_at__gt=Coalesce(OuterRef(last_read_field), epoch),
+        ).exclude(sender=F(reader_field)).values('conversation').annotate(
+            count=Count('id')
+        ).values('count')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Conversation.objects.update(
+        subscriber_unread_count=unread_for('subscriber_last_read', 'conversation__subscriber'),
+        creator_unread_count=unread_for('creator_last_read', 'conversation__creator__user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creators', '0001_initial'),
+        ('messaging', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='creator_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='subscriber_unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['subscriber', '-last_message_at'], name='conversation_subscriber_inbox'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['creator', '-last_message_at'], name='conversation_creator_inbox'),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_broadcast'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['conversation', 'created_at', 'id'], include=('sender', 'message_type'), name='message_history'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:03
+
+from django.db import migrations
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def fold_read_status(apps, schema_editor):
+    """Move per-message read rows into the conversations' read watermarks"""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+    MessageReadStatus = apps.get_model('messaging', 'MessageReadStatus')
+
+    for last_read_field, unread_field, reader_field in [
+        ('subscriber_last_read', 'subscriber_unread_count', 'conversation__subscriber'),
+        ('creator_last_read', 'creator_unread_count', 'conversation__creator__user'),
+    ]:
+        latest_read = Subquery(
+            MessageReadStatus.objects.filter(
+                message__conversation=OuterRef('pk'),
+                user=F(f'message__{reader_field}'),
+            ).values('message__conversation').annotate(
+                latest=Max('message__created_at')
+            ).values('latest')
+        )
+
+        Conversation.objects.filter(**{f'{last_read_field}__isnull': True}).update(**{
+            last_read_field: latest_read,
+        })
+        Conversation.objects.filter(**{f'{last_read_field}__isnull': False}).update(**{
+            last_read_field: Greatest(F(last_read_field), Coalesce(latest_read, F(last_read_field))),
+        })
+
+        # Recount unread messages against the folded watermarks
+        unread_count = Subquery(
+            Message.objects.filter(
+                conversation=OuterRef('pk'),
+                is_deleted=False,
+                created_at__gt=OuterRef(last_read_field),
+            ).exclude(sender=F(reader_field)).values('conversation').annotate(
+                count=Count('id')
+            ).values('count'),
+            output_field=IntegerField(),
+        )
+        Conversation.objects.filter(**{f'{last_read_field}__isnull': False}).update(**{
+            unread_field: Coalesce(unread_count, 0),
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_message_history_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_read_status, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='MessageReadStatus',
+        ),
+    ]
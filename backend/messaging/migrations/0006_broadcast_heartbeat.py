@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_fold_read_status_into_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcast',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
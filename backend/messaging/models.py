@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.conf import settings
 from django.utils import timezone
 
@@ -23,25 +25,67 @@ class Conversation(models.Model):
     last_message_at = models.DateTimeField(null=True, blank=True)
     last_message_preview = models.CharField(max_length=100, blank=True)
     
-    # Read status
+    # Read watermarks: every message sent to a side at or before its
+    # watermark has been read by that side
     creator_last_read = models.DateTimeField(null=True, blank=True)
     subscriber_last_read = models.DateTimeField(null=True, blank=True)
     
+    # Unread counters, maintained on send/read so the inbox never COUNTs messages
+    creator_unread_count = models.PositiveIntegerField(default=0)
+    subscriber_unread_count = models.PositiveIntegerField(default=0)
+    
     class Meta:
         unique_together = ['creator', 'subscriber']
         ordering = ['-last_message_at', '-updated_at']
+        indexes = [
+            models.Index(fields=['subscriber', '-last_message_at'], name='conversation_subscriber_inbox'),
+            models.Index(fields=['creator', '-last_message_at'], name='conversation_creator_inbox'),
+        ]
     
     def __str__(self):
         return f"Conversation: {self.creator.display_name} <-> {self.subscriber.username}"
     
+    def get_side(self, user):
+        """Return 'subscriber' or 'creator' for a participant without loading the creator"""
+        return 'subscriber' if user.pk == self.subscriber_id else 'creator'
+    
     def get_unread_count(self, user):
         """Get unread message count for a user"""
-        if user == self.creator.user:
-            last_read = self.creator_last_read or timezone.datetime.min.replace(tzinfo=timezone.utc)
-        else:
-            last_read = self.subscriber_last_read or timezone.datetime.min.replace(tzinfo=timezone.utc)
+        return getattr(self, f'{self.get_side(user)}_unread_count')
+    
+    def mark_read(self, user, up_to=None):
+        """Advance the user's read watermark to `up_to` (default now) in a single UPDATE.
         
-        return self.messages.filter(created_at__gt=last_read).count()
+        The watermark never moves backwards. The unread counter is recounted
+        against the new watermark in the same statement, so messages that
+        arrive while marking read stay unread.
+        """
+        side = self.get_side(user)
+        last_read_field = f'{side}_last_read'
+        unread_field = f'{side}_unread_count'
+        up_to = Value(up_to or timezone.now())
+        
+        unread = Message.objects.filter(
+            conversation_id=OuterRef('pk'),
+            is_deleted=False,
+            created_at__gt=Greatest(Coalesce(OuterRef(last_read_field), up_to), up_to)
+        ).exclude(sender_id=user.pk).values('conversation_id').annotate(
+            count=Count('id')
+        ).values('count')
+        
+        Conversation.objects.filter(pk=self.pk).update(**{
+            last_read_field: Greatest(Coalesce(F(last_read_field), up_to), up_to),
+            unread_field: Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        })
+        self.refresh_from_db(fields=[last_read_field, unread_field])
+    
+    def is_read_by_recipient(self, message):
+        """Whether the other participant has read `message`, from their watermark"""
+        if message.sender_id == self.subscriber_id:
+            watermark = self.creator_last_read
+        else:
+            watermark = self.subscriber_last_read
+        return watermark is not None and message.created_at <= watermark
 
 class Message(models.Model):
     MESSAGE_TYPE_CHOICES = [
@@ -78,40 +122,120 @@ class Message(models.Model):
     # Message status
     is_deleted = models.BooleanField(default=False)
     
+    # Set when the message was fanned out by a creator broadcast
+    broadcast = models.ForeignKey(
+        'Broadcast',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='messages'
+    )
+    
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset paging through a conversation's visible history. Pages
+            # carry the full message, so the index finds and orders a page's
+            # rows rather than covering them
+            models.Index(
+                fields=['conversation', 'created_at', 'id'],
+                name='message_history',
+                condition=Q(is_deleted=False)
+            ),
+        ]
     
     def __str__(self):
         if self.message_type == 'tip':
             return f"Tip: ${self.tip_amount} from {self.sender.username}"
         return f"{self.sender.username}: {self.content[:50]}"
     
+    def get_preview(self):
+        if self.message_type == 'tip':
+            return f"Tip: ${self.tip_amount}"
+        return self.content[:100]
+    
+    def recipient_side(self, conversation):
+        return 'creator' if self.sender_id == conversation.subscriber_id else 'subscriber'
+    
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        is_new = self._state.adding
         
-        # Update conversation's last message info
-        self.conversation.last_message_at = self.created_at
-        if self.message_type == 'tip':
-            self.conversation.last_message_preview = f"Tip: ${self.tip_amount}"
-        else:
-            self.conversation.last_message_preview = self.content[:100]
-        self.conversation.save(update_fields=['last_message_at', 'last_message_preview'])
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not is_new:
+                return
+            
+            # Update last message info and the recipient's unread counter in one UPDATE
+            conversation = self.conversation
+            unread_field = f'{self.recipient_side(conversation)}_unread_count'
+            updates = {
+                'last_message_at': self.created_at,
+                'last_message_preview': self.get_preview(),
+            }
+            if not self.is_deleted:
+                # Unread counts only cover visible messages, as mark_read recounts them
+                updates[unread_field] = F(unread_field) + 1
+            Conversation.objects.filter(pk=conversation.pk).update(**updates)
+            conversation.last_message_at = self.created_at
+            conversation.last_message_preview = self.get_preview()
+        
+        # Push to connected clients once the message is visible to other readers
+        from .realtime import push_message
+        transaction.on_commit(lambda: push_message(self))
 
-class MessageReadStatus(models.Model):
-    """Track when messages are read by recipients"""
-    message = models.ForeignKey(
-        Message,
+    def soft_delete(self):
+        """Hide the message, taking it off the recipient's unread counter if they hadn't read it"""
+        with transaction.atomic():
+            if not Message.objects.filter(pk=self.pk, is_deleted=False).update(is_deleted=True):
+                return False
+            self.is_deleted = True
+            
+            side = self.recipient_side(self.conversation)
+            unread_field = f'{side}_unread_count'
+            Conversation.objects.filter(
+                Q(**{f'{side}_last_read__isnull': True}) | Q(**{f'{side}_last_read__lt': self.created_at}),
+                pk=self.conversation_id
+            ).update(**{unread_field: Greatest(F(unread_field) - 1, 0)})
+        return True
+
+class Broadcast(models.Model):
+    """A mass message from a creator to all of their active subscribers"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    creator = models.ForeignKey(
+        'creators.Creator',
         on_delete=models.CASCADE,
-        related_name='read_status'
-    )
-    user = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        related_name='broadcasts'
     )
-    read_at = models.DateTimeField(auto_now_add=True)
+    
+    message_type = models.CharField(max_length=20, choices=Message.MESSAGE_TYPE_CHOICES, default='text')
+    content = models.TextField(blank=True)
+    
+    # Stored once and referenced by every delivered message
+    media_file = models.FileField(upload_to='messages/', null=True, blank=True)
+    media_thumbnail = models.ImageField(upload_to='message_thumbnails/', null=True, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    
+    # Recipients are processed in subscriber id order; resume after this one
+    last_subscriber_id = models.BigIntegerField(default=0)
+    # Bumped per chunk; a running broadcast with an old heartbeat has lost its worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
-        unique_together = ['message', 'user']
+        ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user.username} read message at {self.read_at}"
+        return f"Broadcast from {self.creator.display_name} ({self.get_status_display()})"
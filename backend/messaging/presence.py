@@ -0,0 +1,102 @@
+"""Ephemeral online presence, kept out of the database entirely.
+
+Each process keeps its connected users' heartbeats in memory. A background
+task flushes the users seen since the last flush to the shared cache in one
+batched write, with a TTL, so heartbeats cost a dict update rather than a
+network round trip and other processes can still answer "who is online".
+Presence disappears on its own when heartbeats stop; a closing socket
+only clears this process's view, since the user may be connected to
+another process too.
+"""
+import asyncio
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+def presence_key(user_id):
+    return f'presence:{user_id}'
+
+class PresenceStore:
+    def __init__(self, ttl=None):
+        self.ttl = ttl or settings.PRESENCE_TTL
+        self._expires = {}
+        self._connections = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def connect(self, user_id):
+        with self._lock:
+            self._connections[user_id] = self._connections.get(user_id, 0) + 1
+        self.heartbeat(user_id)
+
+    def heartbeat(self, user_id):
+        with self._lock:
+            self._expires[user_id] = time.monotonic() + self.ttl
+            self._dirty.add(user_id)
+
+    def disconnect(self, user_id):
+        """Drop the user's local presence once their last socket in this process closes.
+
+        The shared key is left to expire: another process may still hold the user.
+        """
+        with self._lock:
+            remaining = self._connections.get(user_id, 1) - 1
+            if remaining > 0:
+                self._connections[user_id] = remaining
+                return
+            self._connections.pop(user_id, None)
+            self._expires.pop(user_id, None)
+            self._dirty.discard(user_id)
+
+    def flush(self):
+        """Publish recent heartbeats to the shared cache and forget expired heartbeats"""
+        now = time.monotonic()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            # Sockets stay counted until they close, or disconnect would miscount them
+            for user_id in [u for u, deadline in self._expires.items() if deadline <= now]:
+                del self._expires[user_id]
+        if dirty:
+            cache.set_many({presence_key(user_id): 1 for user_id in dirty}, timeout=self.ttl)
+        return len(dirty)
+
+    def is_local(self, user_id, now=None):
+        return self._expires.get(user_id, 0) > (now or time.monotonic())
+
+    def online(self, user_ids):
+        """Return the subset of `user_ids` that is online, with at most one cache read"""
+        now = time.monotonic()
+        user_ids = set(user_ids)
+        online = {user_id for user_id in user_ids if self.is_local(user_id, now)}
+        remaining = user_ids - online
+        if remaining:
+            found = cache.get_many([presence_key(user_id) for user_id in remaining])
+            online.update(user_id for user_id in remaining if presence_key(user_id) in found)
+        return online
+
+_presence = None
+_flusher = None
+
+def get_presence():
+    # Created on first use so settings are read after Django is configured
+    global _presence
+    if _presence is None:
+        _presence = PresenceStore()
+    return _presence
+
+def ensure_flusher():
+    """Start the per-process flush loop from inside a running event loop"""
+    global _flusher
+    loop = asyncio.get_running_loop()
+    if _flusher is None or _flusher.done() or _flusher.get_loop() is not loop:
+        _flusher = loop.create_task(run_flusher())
+
+async def run_flusher():
+    store = get_presence()
+    flush = sync_to_async(store.flush, thread_sensitive=False)
+    while True:
+        await asyncio.sleep(settings.PRESENCE_FLUSH_INTERVAL)
+        await flush()
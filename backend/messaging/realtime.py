@@ -0,0 +1,83 @@
+"""Helpers for pushing messaging events to connected WebSocket clients"""
+import logging
+
+from asgiref.sync import async_to_sync
+
+logger = logging.getLogger(__name__)
+
+def conversation_group(conversation_id):
+    return f'conversation.{conversation_id}'
+
+def user_group(user_id):
+    return f'user.{user_id}'
+
+def broadcast_group(creator_id):
+    """Sockets watching any conversation with the creator"""
+    return f'broadcasts.{creator_id}'
+
+def group_send(group, event):
+    """Send an event to a channel layer group from sync code.
+
+    Delivery is best effort: a failing channel layer is logged and never
+    breaks the database write that triggered the event.
+    """
+    # Imported here so workers that never push events don't load channels
+    from channels.layers import get_channel_layer
+    
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, event)
+    except Exception:
+        logger.exception('Failed to push %s to group %s', event.get('type'), group)
+
+def push_message(message):
+    """Deliver a new message to everyone watching its conversation"""
+    from .serializers import MessageSerializer
+
+    payload = dict(MessageSerializer(message).data)
+    group_send(conversation_group(message.conversation_id), {
+        'type': 'chat.message',
+        'message': payload,
+    })
+
+    if message.message_type == 'tip':
+        # Creators get tips on their user group even without the conversation open
+        from creators.models import Creator
+        creator_user_id = Creator.objects.filter(
+            pk=message.conversation.creator_id
+        ).values_list('user_id', flat=True).first()
+        if creator_user_id is not None:
+            group_send(user_group(creator_user_id), {
+                'type': 'tip.received',
+                'tip': payload,
+            })
+
+def push_broadcast_chunk(creator_id, messages):
+    """Deliver a chunk of broadcast copies in one event; sockets pick out their conversations"""
+    from rest_framework import serializers
+    from .serializers import MessageSerializer
+
+    # The copies differ only in id, conversation and created_at
+    payload = dict(MessageSerializer(messages[0]).data)
+    created_at = serializers.DateTimeField()
+    group_send(broadcast_group(creator_id), {
+        'type': 'broadcast.messages',
+        'message': payload,
+        # String keys, as channel layers serialize events with msgpack
+        'copies': {
+            str(message.conversation_id): [message.pk, created_at.to_representation(message.created_at)]
+            for message in messages
+        },
+    })
+
+def push_read_receipt(conversation, side):
+    """Tell the conversation that one side's read watermark moved"""
+    last_read = getattr(conversation, f'{side}_last_read')
+    group_send(conversation_group(conversation.pk), {
+        'type': 'conversation.read',
+        'conversation': conversation.pk,
+        'side': side,
+        'last_read': last_read.isoformat() if last_read else None,
+    })
@@ -0,0 +1,97 @@
+from rest_framework import serializers
+from .models import Broadcast, Conversation, Message
+
+class MessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Message
+        fields = [
+            'id', 'conversation', 'sender', 'message_type', 'content',
+            'media_file', 'media_thumbnail', 'tip_amount', 'created_at'
+        ]
+        read_only_fields = ['id', 'conversation', 'sender', 'created_at']
+
+class MarkReadSerializer(serializers.Serializer):
+    up_to = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+class HistoryMessageSerializer(MessageSerializer):
+    """Message with sender details from a prefetched ``senders`` mapping.
+    
+    ``is_read`` is derived from the conversation's read watermarks.
+    """
+    sender = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+    
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ['is_read']
+    
+    def get_sender(self, obj):
+        sender = self.context['senders'].get(obj.sender_id)
+        if sender is None:
+            return {'id': obj.sender_id}
+        return {
+            'id': sender.id,
+            'username': sender.username,
+            'full_name': sender.full_name,
+            'profile_picture': sender.profile_picture.url if sender.profile_picture else None,
+        }
+    
+    def get_is_read(self, obj):
+        return self.context['conversation'].is_read_by_recipient(obj)
+
+class InboxConversationSerializer(serializers.ModelSerializer):
+    """Inbox row built from `creator__user` and `subscriber` loaded with select_related"""
+    counterpart = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Conversation
+        fields = [
+            'id', 'counterpart', 'last_message_at', 'last_message_preview',
+            'unread_count', 'created_at'
+        ]
+    
+    def get_counterpart(self, obj):
+        user = self.context['request'].user
+        if obj.get_side(user) == 'subscriber':
+            other = obj.creator.user
+            display_name = obj.creator.display_name
+            creator_id = obj.creator_id
+        else:
+            other = obj.subscriber
+            display_name = other.full_name or other.username
+            creator_id = None
+        
+        return {
+            'id': other.id,
+            'username': other.username,
+            'display_name': display_name,
+            'creator_id': creator_id,
+            'profile_picture': other.profile_picture.url if other.profile_picture else None,
+            'is_online': other.id in self.context.get('online', ()),
+        }
+    
+    def get_unread_count(self, obj):
+        return obj.get_unread_count(self.context['request'].user)
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Broadcast
+        fields = [
+            'id', 'message_type', 'content', 'media_file', 'media_thumbnail',
+            'status', 'total_recipients', 'sent_count', 'error',
+            'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'total_recipients', 'sent_count', 'error',
+            'created_at', 'started_at', 'completed_at'
+        ]
+    
+    def validate_message_type(self, value):
+        if value == 'tip':
+            raise serializers.ValidationError("Tip notifications can't be broadcast")
+        return value
+    
+    def validate(self, attrs):
+        if not attrs.get('content') and not attrs.get('media_file'):
+            raise serializers.ValidationError("A broadcast needs content or a media file")
+        return attrs
@@ -0,0 +1,7 @@
+from celery import shared_task
+from .broadcasts import run_broadcast
+
+@shared_task(acks_late=True)
+def send_broadcast(broadcast_id):
+    """Fan a broadcast out to the creator's subscribers (safe to re-run)"""
+    run_broadcast(broadcast_id)
@@ -1,3 +1,386 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from creators.models import Creator
+from subscriptions.models import Subscription
+from .middleware import TokenAuthMiddleware
+from . import broadcasts
+from .broadcasts import claim, run_broadcast
+from .models import Broadcast, Conversation, Message
+from .presence import PresenceStore, get_presence
+from .routing import websocket_urlpatterns
+
+application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+def subscribe(user, creator):
+    now = timezone.now()
+    return Subscription.objects.create(
+        subscriber=user, creator=creator, stripe_subscription_id=f'sub_{user.pk}', status='active',
+        price=5, current_period_start=now, current_period_end=now + timedelta(days=30)
+    )
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATE_LIMITS={'messaging': {}},
+)
+class MessagingConsumerTests(TransactionTestCase):
+    """The WebSocket consumer end to end, on the in-memory channel layer"""
+
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        self.subscriber = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='password123'
+        )
+        self.conversation = Conversation.objects.create(creator=self.creator, subscriber=self.subscriber)
+        self.creator_token = Token.objects.create(user=creator_user).key
+        self.subscriber_token = Token.objects.create(user=self.subscriber).key
+        self.other_token = Token.objects.create(user=self.other).key
+
+    async def connect(self, token):
+        communicator = WebsocketCommunicator(application, f'/ws/messaging/?token={token}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_connect_requires_token(self):
+        communicator = WebsocketCommunicator(application, '/ws/messaging/')
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4001)
+
+        communicator = WebsocketCommunicator(application, '/ws/messaging/?token=not-a-token')
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4001)
+
+    async def test_subscribe_only_to_own_conversations(self):
+        communicator = await self.connect(self.subscriber_token)
+        await communicator.send_json_to({'type': 'subscribe', 'conversation': self.conversation.pk})
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'subscribed', 'conversation': self.conversation.pk
+        })
+        await communicator.disconnect()
+
+        communicator = await self.connect(self.other_token)
+        await communicator.send_json_to({'type': 'subscribe', 'conversation': self.conversation.pk})
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'error', 'detail': 'Conversation not found'
+        })
+        await communicator.disconnect()
+
+    async def test_send_reaches_both_sides(self):
+        creator = await self.connect(self.creator_token)
+        subscriber = await self.connect(self.subscriber_token)
+        for communicator in (creator, subscriber):
+            await communicator.send_json_to({'type': 'subscribe', 'conversation': self.conversation.pk})
+            self.assertEqual((await communicator.receive_json_from())['type'], 'subscribed')
+
+        await subscriber.send_json_to({
+            'type': 'message.send', 'conversation': self.conversation.pk, 'content': 'hello'
+        })
+        for communicator in (creator, subscriber):
+            event = await communicator.receive_json_from()
+            self.assertEqual(event['type'], 'message.new')
+            self.assertEqual(event['message']['content'], 'hello')
+            self.assertEqual(event['message']['sender'], self.subscriber.pk)
+        self.assertEqual(await Message.objects.filter(conversation=self.conversation).acount(), 1)
+
+        await creator.disconnect()
+        await subscriber.disconnect()
+
+    async def test_typing_goes_to_the_other_side(self):
+        creator = await self.connect(self.creator_token)
+        subscriber = await self.connect(self.subscriber_token)
+        for communicator in (creator, subscriber):
+            await communicator.send_json_to({'type': 'subscribe', 'conversation': self.conversation.pk})
+            await communicator.receive_json_from()
+
+        await subscriber.send_json_to({'type': 'typing', 'conversation': self.conversation.pk})
+        self.assertEqual(await creator.receive_json_from(), {
+            'type': 'conversation.typing', 'conversation': self.conversation.pk, 'user': self.subscriber.pk
+        })
+        self.assertTrue(await subscriber.receive_nothing())
+
+        await creator.disconnect()
+        await subscriber.disconnect()
+
+    async def test_broadcast_copies_reach_watching_sockets(self):
+        subscriber = await self.connect(self.subscriber_token)
+        await subscriber.send_json_to({'type': 'subscribe', 'conversation': self.conversation.pk})
+        await subscriber.receive_json_from()
+
+        await sync_to_async(subscribe)(self.subscriber, self.creator)
+        broadcast = await Broadcast.objects.acreate(creator=self.creator, content='news')
+        await sync_to_async(run_broadcast)(broadcast.pk)
+        event = await subscriber.receive_json_from()
+        message = await Message.objects.aget(broadcast=broadcast)
+        self.assertEqual(event['type'], 'message.new')
+        self.assertEqual(
+            (event['message']['id'], event['message']['conversation'], event['message']['content']),
+            (message.pk, self.conversation.pk, 'news')
+        )
+        await subscriber.disconnect()
+
+    async def test_presence_follows_connection(self):
+        presence = get_presence()
+        communicator = await self.connect(self.subscriber_token)
+        self.assertTrue(presence.is_local(self.subscriber.pk))
+
+        await communicator.send_json_to({'type': 'heartbeat'})
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(presence.online([self.subscriber.pk, self.other.pk]), {self.subscriber.pk})
+
+        await communicator.disconnect()
+        self.assertFalse(presence.is_local(self.subscriber.pk))
+
+    async def test_malformed_frames_get_an_error(self):
+        communicator = await self.connect(self.subscriber_token)
+        frames = [
+            ([1, 2], 'Frames must be JSON objects'),
+            ('subscribe', 'Frames must be JSON objects'),
+            ({'type': 'subscribe', 'conversation': [1]}, 'conversation must be an integer id'),
+            ({'type': 'subscribe', 'conversation': '1'}, 'conversation must be an integer id'),
+            ({'type': 'typing', 'conversation': {'id': 1}}, 'conversation must be an integer id'),
+            ({'type': 'message.send', 'conversation': self.conversation.pk, 'content': ['hi']},
+             'Message content is required'),
+            ({'type': 'dance'}, 'Unknown event type'),
+        ]
+        for frame, detail in frames:
+            await communicator.send_json_to(frame)
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'error', 'detail': detail})
+
+        await communicator.send_to(text_data='{not json')
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'error', 'detail': 'Frames must be JSON text'
+        })
+
+        # Still open and working
+        await communicator.send_json_to({'type': 'subscribe', 'conversation': self.conversation.pk})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'subscribed')
+        await communicator.disconnect()
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class MarkConversationReadTests(TestCase):
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        self.subscriber = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        self.conversation = Conversation.objects.create(creator=creator, subscriber=self.subscriber)
+        self.message = Message.objects.create(
+            conversation=self.conversation, sender=creator_user, content='hello'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.subscriber)
+        self.url = f'/api/messaging/conversations/{self.conversation.pk}/read/'
+
+    def test_up_to_must_be_an_integer(self):
+        for up_to in ['abc', [1], 0]:
+            response = self.client.post(self.url, {'up_to': up_to}, format='json')
+            self.assertEqual(response.status_code, 400, up_to)
+
+    def test_marks_read_up_to_a_message(self):
+        response = self.client.post(self.url, {'up_to': self.message.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unread_count'], 0)
+
+        response = self.client.post(self.url, {'up_to': self.message.pk + 1000}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PresenceStoreTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_closing_a_socket_in_one_process_keeps_the_user_online_in_another(self):
+        first, second = PresenceStore(ttl=60), PresenceStore(ttl=60)
+        for store in (first, second):
+            store.connect(1)
+            store.flush()
+
+        first.disconnect(1)
+        self.assertFalse(first.is_local(1))
+        self.assertEqual(first.online([1]), {1})
+        self.assertEqual(second.online([1]), {1})
+
+    def test_expired_heartbeats_keep_their_sockets_counted(self):
+        store = PresenceStore(ttl=60)
+        store.connect(1)
+        store.connect(1)
+        with mock.patch('messaging.presence.time.monotonic', return_value=store._expires[1] + 1):
+            store.flush()
+        self.assertFalse(store.is_local(1))
+
+        # One socket closes; the other is still open and heartbeats again
+        store.disconnect(1)
+        store.heartbeat(1)
+        self.assertTrue(store.is_local(1))
+        store.disconnect(1)
+        self.assertFalse(store.is_local(1))
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator_user = creator_user
+        creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        self.subscriber = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+        self.conversation = Conversation.objects.create(creator=creator, subscriber=self.subscriber)
+
+    def send(self, sender, content='hi', **fields):
+        return Message.objects.create(conversation=self.conversation, sender=sender, content=content, **fields)
+
+    def counts(self):
+        self.conversation.refresh_from_db()
+        return self.conversation.creator_unread_count, self.conversation.subscriber_unread_count
+
+    def test_send_writes_the_conversation_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            message = Message.objects.create(conversation=self.conversation, sender=self.subscriber, content='hello')
+        [write] = [q['sql'] for q in queries if 'messaging_conversation' in q['sql']]
+        # Last message and counter together, without reading the conversation first
+        self.assertTrue(write.startswith('UPDATE'))
+        self.assertIn('last_message_at', write)
+        self.assertIn('creator_unread_count', write)
+        self.send(self.creator_user, 'hi back')
+        self.send(self.subscriber, 'again')
+
+        self.assertEqual(self.counts(), (2, 1))
+        self.assertEqual(self.conversation.last_message_preview, 'again')
+        self.assertGreaterEqual(self.conversation.last_message_at, message.created_at)
+
+    def test_mark_read_recounts_against_the_watermark(self):
+        first = self.send(self.subscriber)
+        second = self.send(self.subscriber)
+        self.conversation.mark_read(self.creator_user, up_to=first.created_at)
+        self.assertEqual(self.counts(), (1, 0))
+
+        self.conversation.mark_read(self.creator_user)
+        self.assertEqual(self.counts(), (0, 0))
+        # Already read, so there is nothing to take off
+        self.assertTrue(second.soft_delete())
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_soft_delete_takes_unread_messages_off_the_counter(self):
+        read = self.send(self.subscriber)
+        self.conversation.mark_read(self.creator_user, up_to=read.created_at)
+        unread = [self.send(self.subscriber), self.send(self.subscriber)]
+        self.assertEqual(self.counts(), (2, 0))
+
+        self.assertTrue(unread[0].soft_delete())
+        self.assertFalse(unread[0].soft_delete())
+        self.assertTrue(read.soft_delete())
+        self.assertEqual(self.counts(), (1, 0))
+
+        # Already deleted when sent: never counted
+        self.send(self.subscriber, is_deleted=True)
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_backfill_agrees_with_the_maintained_counters(self):
+        read = self.send(self.subscriber)
+        self.conversation.mark_read(self.creator_user, up_to=read.created_at)
+        self.send(self.subscriber).soft_delete()
+        self.send(self.subscriber)
+        self.send(self.creator_user)
+        self.send(self.creator_user, is_deleted=True)
+        maintained = self.counts()
+
+        Conversation.objects.update(creator_unread_count=0, subscriber_unread_count=0)
+        migration = import_module('messaging.migrations.0002_conversation_unread_counters')
+        migration.backfill_unread_counts(apps, None)
+        self.assertEqual(self.counts(), maintained)
+        self.assertEqual(maintained, (1, 1))
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    BROADCAST_STALE_AFTER=300,
+)
+class BroadcastTests(TestCase):
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        self.fans = []
+        for n in range(3):
+            fan = User.objects.create_user(username=f'fan{n}', email=f'fan{n}@example.com', password='password123')
+            subscribe(fan, self.creator)
+            self.fans.append(fan)
+        self.broadcast = Broadcast.objects.create(creator=self.creator, content='news')
+
+    def test_copies_carry_their_own_time_and_are_pushed_per_chunk(self):
+        with mock.patch('messaging.realtime.group_send') as group_send, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_broadcast(self.broadcast.pk, chunk_size=2).status, 'completed')
+
+        self.assertEqual(group_send.call_count, 2)
+        copies = {}
+        for call in group_send.call_args_list:
+            group, event = call.args
+            self.assertEqual((group, event['type']), (f'broadcasts.{self.creator.pk}', 'broadcast.messages'))
+            copies.update(event['copies'])
+        for conversation in Conversation.objects.filter(creator=self.creator):
+            message = conversation.messages.get()
+            self.assertEqual(conversation.last_message_at, message.created_at)
+            self.assertEqual(copies[str(conversation.pk)][0], message.pk)
+            self.assertEqual(conversation.subscriber_unread_count, 1)
+
+    def test_a_stale_run_is_claimed_and_resumed(self):
+        send_chunk = broadcasts.send_chunk
+        sent = []
+
+        def die_after_one_chunk(*args):
+            if sent:
+                # Not an Exception: the worker is killed, so nothing marks the run failed
+                raise KeyboardInterrupt
+            sent.append(send_chunk(*args))
+
+        with mock.patch('messaging.broadcasts.send_chunk', side_effect=die_after_one_chunk), \
+                mock.patch('messaging.broadcasts.push_broadcast_chunk'), self.assertRaises(KeyboardInterrupt):
+            run_broadcast(self.broadcast.pk, chunk_size=1)
+        self.broadcast.refresh_from_db()
+        self.assertEqual((self.broadcast.status, self.broadcast.sent_count), ('running', 1))
+
+        # Its heartbeat is recent: nobody else may take it over yet
+        self.assertFalse(claim(self.broadcast.pk))
+        self.assertEqual(run_broadcast(self.broadcast.pk).status, 'running')
+
+        Broadcast.objects.filter(pk=self.broadcast.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=301))
+        with mock.patch('messaging.broadcasts.push_broadcast_chunk'):
+            broadcast = run_broadcast(self.broadcast.pk, chunk_size=1)
+        self.assertEqual((broadcast.status, broadcast.sent_count, broadcast.total_recipients), ('completed', 3, 3))
+        # Every fan got exactly one copy
+        self.assertEqual(
+            sorted(Message.objects.filter(broadcast=broadcast).values_list('conversation__subscriber_id', flat=True)),
+            sorted(fan.pk for fan in self.fans)
+        )
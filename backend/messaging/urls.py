@@ -1,7 +1,15 @@
 from django.urls import path
+from . import views
 
 app_name = 'messaging'
 
 urlpatterns = [
-    # Messaging URLs will be added here
-]
\ No newline at end of file
+    path('conversations/', views.InboxView.as_view(), name='inbox'),
+    path('conversations/<int:conversation_id>/messages/', views.MessageHistoryView.as_view(), name='message-history'),
+    path('conversations/<int:conversation_id>/read/', views.mark_conversation_read, name='mark-read'),
+    path('unread/', views.unread_badge, name='unread-badge'),
+    path('presence/', views.online_users, name='presence'),
+    path('broadcasts/', views.BroadcastListCreateView.as_view(), name='broadcast-list'),
+    path('broadcasts/<int:pk>/', views.BroadcastDetailView.as_view(), name='broadcast-detail'),
+    path('broadcasts/<int:broadcast_id>/resume/', views.resume_broadcast, name='broadcast-resume'),
+]
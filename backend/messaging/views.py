@@ -1,3 +1,244 @@
-from django.shortcuts import render
+from rest_framework import generics, permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import Case, Count, Q, Sum, When
+from accounts.models import User
+from creator_platform.async_api import async_api_view
+from creator_platform.conditional import ConditionalGetMixin
+from creator_platform.ratelimit import ScopedRateLimit
+from creators.models import Creator
+from .broadcasts import resumable
+from .history import InvalidCursor, get_page
+from .models import Broadcast, Conversation
+from .presence import get_presence
+from .realtime import push_read_receipt
+from .serializers import (
+    BroadcastSerializer,
+    HistoryMessageSerializer,
+    InboxConversationSerializer,
+    MarkReadSerializer,
+    MessageSerializer
+)
+from .tasks import send_broadcast
 
-# Create your views here.
+def conversations_for(user):
+    """Conversations where the user is either the subscriber or the creator"""
+    return Conversation.objects.filter(
+        Q(subscriber_id=user.pk) |
+        Q(creator_id__in=Creator.objects.filter(user_id=user.pk).values('id'))
+    )
+
+class InboxPagination(CursorPagination):
+    page_size = 20
+    ordering = ('-last_message_at', '-id')
+
+class InboxView(generics.ListAPIView):
+    """List the user's conversations, most recent first, in a single query.
+    
+    No conditional GET here: every row carries the counterpart's presence,
+    which changes without any row changing.
+    """
+    serializer_class = InboxConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InboxPagination
+    
+    def get_queryset(self):
+        return conversations_for(self.request.user).filter(
+            last_message_at__isnull=False
+        ).select_related('creator__user', 'subscriber')
+    
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        
+        # Presence for the whole page in one batched lookup
+        counterpart_ids = [
+            conversation.creator.user_id if conversation.get_side(request.user) == 'subscriber'
+            else conversation.subscriber_id
+            for conversation in page
+        ]
+        context = self.get_serializer_context()
+        context['online'] = get_presence().online(counterpart_ids)
+        
+        serializer = self.get_serializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def online_users(request):
+    """Which of the given user ids (``?users=1,2,3``, max 200) are online"""
+    try:
+        user_ids = [int(i) for i in request.query_params.get('users', '').split(',') if i][:200]
+    except ValueError:
+        return Response({
+            'error': 'users must be a comma-separated list of ids'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    online = get_presence().online(user_ids)
+    return Response({'online': sorted(online), 'count': len(online)})
+
+@async_api_view(authenticated=True)
+async def unread_badge(request):
+    """Total unread messages across all of the user's conversations"""
+    user = request.user
+    totals = await conversations_for(user).aaggregate(
+        unread=Sum(Case(
+            When(subscriber_id=user.pk, then='subscriber_unread_count'),
+            default='creator_unread_count'
+        ))
+    )
+    return {'unread': totals['unread'] or 0}
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_conversation_read(request, conversation_id):
+    """Mark messages read for the current user, up to `up_to` (a message id) or everything"""
+    try:
+        conversation = conversations_for(request.user).get(id=conversation_id)
+    except Conversation.DoesNotExist:
+        return Response({
+            'error': 'Conversation not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = MarkReadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    up_to = None
+    if serializer.validated_data.get('up_to') is not None:
+        up_to = conversation.messages.filter(
+            id=serializer.validated_data['up_to']
+        ).values_list('created_at', flat=True).first()
+        if up_to is None:
+            return Response({
+                'error': 'Message not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+    
+    conversation.mark_read(request.user, up_to=up_to)
+    side = conversation.get_side(request.user)
+    push_read_receipt(conversation, side)
+    return Response({
+        'last_read': getattr(conversation, f'{side}_last_read'),
+        'unread_count': conversation.get_unread_count(request.user),
+    })
+
+class MessageHistoryView(ConditionalGetMixin, generics.ListCreateAPIView):
+    """Page through a conversation's messages or send a new one.
+
+    GET takes ``before`` or ``after`` cursors from a previous response and
+    an optional ``limit`` (max 100).
+    """
+    serializer_class = MessageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'messaging'
+    # A soft delete changes the page without moving any timestamp
+    send_last_modified = False
+    
+    def get_conversation(self):
+        try:
+            return conversations_for(self.request.user).get(id=self.kwargs['conversation_id'])
+        except Conversation.DoesNotExist:
+            raise generics.Http404("Conversation not found")
+    
+    def get_version(self):
+        # New messages move last_message_at, reads move a watermark (is_read),
+        # deletes the visible count, and profile saves a participant's updated_at
+        row = conversations_for(self.request.user).filter(id=self.kwargs['conversation_id']).annotate(
+            visible=Count('messages', filter=Q(messages__is_deleted=False))
+        ).values_list(
+            'updated_at', 'subscriber__updated_at', 'creator__user__updated_at',
+            'last_message_at', 'creator_last_read', 'subscriber_last_read', 'visible'
+        ).first()
+        if row is None:
+            return None
+        return max(row[:3]), row[3:]
+    
+    def list(self, request, *args, **kwargs):
+        conversation = self.get_conversation()
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 100)
+            messages, older, newer = get_page(
+                conversation.id,
+                before=request.query_params.get('before'),
+                after=request.query_params.get('after'),
+                limit=max(limit, 1)
+            )
+        except (InvalidCursor, ValueError):
+            return Response({
+                'error': 'Invalid cursor or limit'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # A conversation has two participants; load them in one query
+        senders = User.objects.only(
+            'id', 'username', 'first_name', 'last_name', 'profile_picture'
+        ).in_bulk({message.sender_id for message in messages})
+        serializer = HistoryMessageSerializer(messages, many=True, context={
+            'request': request,
+            'senders': senders,
+            'conversation': conversation,
+        })
+        return Response({
+            'results': serializer.data,
+            'older': older,
+            'newer': newer,
+        })
+    
+    def create(self, request, *args, **kwargs):
+        conversation = self.get_conversation()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if serializer.validated_data.get('message_type') == 'tip':
+            return Response({
+                'error': 'Tips must be sent through the tips API'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        message = serializer.save(conversation=conversation, sender=request.user)
+        return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
+
+class BroadcastListCreateView(generics.ListCreateAPIView):
+    """List a creator's broadcasts or queue a new one to all active subscribers"""
+    serializer_class = BroadcastSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'messaging'
+    
+    def get_creator(self):
+        try:
+            return self.request.user.creator_profile
+        except Creator.DoesNotExist:
+            raise generics.Http404("Creator profile not found")
+    
+    def get_queryset(self):
+        return Broadcast.objects.filter(creator=self.get_creator())
+    
+    def perform_create(self, serializer):
+        broadcast = serializer.save(creator=self.get_creator())
+        transaction.on_commit(lambda: send_broadcast.delay(broadcast.id))
+
+class BroadcastDetailView(generics.RetrieveAPIView):
+    """Broadcast progress"""
+    serializer_class = BroadcastSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'messaging'
+    
+    def get_queryset(self):
+        return Broadcast.objects.filter(creator__user=self.request.user)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def resume_broadcast(request, broadcast_id):
+    """Re-queue a failed or abandoned broadcast; delivery picks up after the last sent chunk"""
+    try:
+        broadcast = Broadcast.objects.filter(resumable()).get(
+            id=broadcast_id,
+            creator__user=request.user
+        )
+    except Broadcast.DoesNotExist:
+        return Response({
+            'error': 'Broadcast not found or not resumable'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    send_broadcast.delay(broadcast.id)
+    return Response({'message': 'Broadcast resumed'})
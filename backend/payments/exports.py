@@ -0,0 +1,84 @@
+"""Constant-memory CSV/NDJSON exports of the payments ledgers.
+
+Rows are read as tuples with ``values_list().iterator()``, which uses a
+server-side cursor on PostgreSQL, and encoded in batches, so memory stays
+flat no matter how many rows an export covers.
+"""
+import csv
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Earning, Payout, Transaction
+
+EXPORTS = {
+    'transactions': (Transaction, [
+        'id', 'user_id', 'transaction_type', 'amount', 'status',
+        'stripe_transaction_id', 'subscription_id', 'tip_id', 'payout_id', 'created_at'
+    ]),
+    'earnings': (Earning, [
+        'id', 'creator_id', 'earning_type', 'gross_amount', 'platform_fee', 'net_amount',
+        'subscription_id', 'tip_id', 'is_paid_out', 'payout_id', 'payout_date', 'created_at'
+    ]),
+    'payouts': (Payout, [
+        'id', 'creator_id', 'amount', 'period_start', 'period_end', 'stripe_transfer_id',
+        'status', 'earnings_count', 'created_at', 'processed_at'
+    ]),
+}
+
+FORMATS = ['csv', 'ndjson']
+
+def parse_timestamp(value):
+    """ISO date or datetime; one without an offset is in the current time zone"""
+    value = datetime.fromisoformat(value)
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+def export_rows(kind, start=None, end=None, creator_id=None, chunk_size=5000):
+    """Return (field names, row tuple iterator) for a ledger export.
+
+    ``start`` is inclusive and ``end`` exclusive, both on ``created_at``.
+    """
+    model, fields = EXPORTS[kind]
+    queryset = model.objects.all()
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    if creator_id is not None:
+        if model is Transaction:
+            queryset = queryset.filter(
+                Q(subscription__creator_id=creator_id) |
+                Q(tip__creator_id=creator_id) |
+                Q(payout__creator_id=creator_id)
+            )
+        else:
+            queryset = queryset.filter(creator_id=creator_id)
+    
+    rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+    return fields, rows
+
+class Echo:
+    """File-like object that hands back what csv.writer writes"""
+    def write(self, value):
+        return value
+
+def encode(fields, rows, output_format, batch_size=1000):
+    """Yield the export as text chunks of about ``batch_size`` rows"""
+    if output_format == 'csv':
+        writer = csv.writer(Echo())
+        encode_row = writer.writerow
+        yield encode_row(fields)
+    else:
+        encoder = DjangoJSONEncoder()
+        encode_row = lambda row: encoder.encode(dict(zip(fields, row))) + '\n'
+    
+    batch = []
+    for row in rows:
+        batch.append(encode_row(row))
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
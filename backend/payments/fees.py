@@ -0,0 +1,56 @@
+"""Platform fee calculation.
+
+All fee math happens on integer cents with the fee rate expressed in basis
+points, so there is no float anywhere in the path. The fee is rounded half
+up to the cent and the creator gets the remainder, which keeps
+``fee + net == amount`` exact for every amount.
+
+``calculate_fee`` handles one Decimal amount; ``calculate_fees_cents``
+handles a whole batch of cent amounts at once for bulk earnings, payouts
+and backfills. Both go through ``fee_cents`` so they always agree.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+CENT = Decimal('0.01')
+
+def to_cents(amount):
+    """Decimal dollars (or a numeric string) to integer cents"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    return (Decimal(cents) * CENT).quantize(CENT)
+
+def fee_basis_points(percentage=None):
+    """The platform fee as an integer number of basis points"""
+    if percentage is None:
+        percentage = settings.PLATFORM_FEE_PERCENTAGE
+    basis_points = Decimal(str(percentage)) * 100
+    if basis_points != basis_points.to_integral_value() or not 0 <= basis_points <= 10000:
+        raise ImproperlyConfigured('PLATFORM_FEE_PERCENTAGE must be 0-100 with at most two decimals')
+    return int(basis_points)
+
+def fee_cents(amount_cents, basis_points):
+    """Fee in cents for an amount in cents, rounded half up (away from zero for refunds)"""
+    if amount_cents < 0:
+        return -fee_cents(-amount_cents, basis_points)
+    return (amount_cents * basis_points + 5000) // 10000
+
+def calculate_fee(amount, percentage=None):
+    """Return (platform_fee, net_amount) as Decimals for one amount"""
+    cents = to_cents(amount)
+    fee = fee_cents(cents, fee_basis_points(percentage))
+    return from_cents(fee), from_cents(cents - fee)
+
+def calculate_fees_cents(amounts_cents, percentage=None):
+    """Return parallel lists (fees, nets) in cents for a batch of cent amounts"""
+    basis_points = fee_basis_points(percentage)
+    if all(amount >= 0 for amount in amounts_cents):
+        # Same formula as fee_cents, without a call per amount
+        fees = [(amount * basis_points + 5000) // 10000 for amount in amounts_cents]
+    else:
+        fees = [fee_cents(amount, basis_points) for amount in amounts_cents]
+    nets = [amount - fee for amount, fee in zip(amounts_cents, fees)]
+    return fees, nets
@@ -0,0 +1,37 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.fees import calculate_fee, calculate_fees_cents, from_cents, to_cents
+
+class Command(BaseCommand):
+    help = 'Compare the single-amount and batch fee paths for speed and identical results'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=1)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Every cent value from $0.01 to $500, including all the .xx5 rounding edges
+        amounts = [from_cents(rng.randint(1, 50000)) for _ in range(options['count'])]
+        
+        started = time.perf_counter()
+        single = [calculate_fee(amount) for amount in amounts]
+        single_time = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        fees, nets = calculate_fees_cents([to_cents(amount) for amount in amounts])
+        batch_time = time.perf_counter() - started
+        
+        for (fee, net), batch_fee, batch_net, amount in zip(single, fees, nets, amounts):
+            if to_cents(fee) != batch_fee or to_cents(net) != batch_net:
+                raise CommandError(f'Paths disagree for {amount}: {fee}/{net} vs {batch_fee}/{batch_net}')
+            if fee + net != amount:
+                raise CommandError(f'Fee and net do not add up for {amount}')
+        
+        count = len(amounts)
+        self.stdout.write(f'single: {single_time * 1000:.1f}ms ({count / single_time:,.0f} amounts/s)')
+        self.stdout.write(f'batch:  {batch_time * 1000:.1f}ms ({count / batch_time:,.0f} amounts/s)')
+        self.stdout.write(self.style.SUCCESS(f'{count} amounts identical on both paths'))
@@ -0,0 +1,47 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.exports import EXPORTS, FORMATS, encode, export_rows, parse_timestamp
+
+class Command(BaseCommand):
+    help = 'Stream a payments ledger export to a file or stdout with constant memory'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help='File path, or - for stdout')
+        parser.add_argument('--start', type=parse_timestamp, help='Inclusive ISO date/datetime')
+        parser.add_argument('--end', type=parse_timestamp, help='Exclusive ISO date/datetime')
+        parser.add_argument('--creator', type=int)
+    
+    def handle(self, *args, **options):
+        fields, rows = export_rows(
+            options['kind'],
+            start=options['start'],
+            end=options['end'],
+            creator_id=options['creator']
+        )
+        
+        count = 0
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+        
+        started = time.perf_counter()
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='')
+        try:
+            for chunk in encode(fields, counted(rows), options['format']):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Exported {count} {options["kind"]} rows in {elapsed:.1f}s '
+            f'({count / elapsed if elapsed else 0:,.0f} rows/s)'
+        )
@@ -0,0 +1,20 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from payments.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild daily earnings rollups from the Earning ledger'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--creator', type=int, help='Only rebuild this creator')
+        parser.add_argument('--since', type=date.fromisoformat, help='Only rebuild days on or after YYYY-MM-DD')
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_rollups(creator_id=options['creator'], since=options['since'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} rollup rows in {time.perf_counter() - started:.1f}s'
+        ))
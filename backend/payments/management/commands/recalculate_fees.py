@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+
+from payments.fees import calculate_fees_cents, from_cents, to_cents
+from payments.models import Earning, Tip
+from payments.rollups import rebuild_rollups
+
+# model, gross field, fee field, net field, rows not yet settled. Settled
+# rows (charged tips, paid-out earnings) keep the fee they were settled
+# with, so payouts still add up to the earnings they paid; their drift is
+# only reported. A tip's Earning is copied from the tip once it's charged,
+# so it counts as settled with its tip and the pair never disagree
+LEDGERS = [
+    (Tip, 'amount', 'platform_fee', 'creator_amount', Q(status='pending')),
+    (Earning, 'gross_amount', 'platform_fee', 'net_amount', Q(is_paid_out=False, tip__isnull=True)),
+]
+
+class Command(BaseCommand):
+    help = 'Recompute stored platform fees with the exact fee engine and fix unsettled rows that differ'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        earnings_changed = False
+        for model, gross_field, fee_field, net_field, unsettled in LEDGERS:
+            scanned, changed, drifted = self.recalculate(
+                model, gross_field, fee_field, net_field, unsettled,
+                options['chunk_size'], options['dry_run']
+            )
+            earnings_changed |= model is Earning and changed > 0
+            self.stdout.write(
+                f'{model.__name__}: {changed} of {scanned} rows differ and are unsettled; '
+                f'{drifted} settled rows differ (left unchanged)'
+            )
+        
+        if earnings_changed and not options['dry_run']:
+            rebuild_rollups()
+            self.stdout.write('Rebuilt earnings rollups')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+    
+    def recalculate(self, model, gross_field, fee_field, net_field, unsettled, chunk_size, dry_run):
+        scanned = changed = drifted = 0
+        last_id = 0
+        while True:
+            rows = list(model.objects.filter(pk__gt=last_id).annotate(
+                unsettled=ExpressionWrapper(unsettled, output_field=BooleanField())
+            ).order_by('pk').values_list(
+                'pk', gross_field, fee_field, net_field, 'unsettled'
+            )[:chunk_size])
+            if not rows:
+                return scanned, changed, drifted
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            
+            fees, nets = calculate_fees_cents([to_cents(row[1]) for row in rows])
+            updates = []
+            for row, fee, net in zip(rows, fees, nets):
+                if to_cents(row[2]) == fee and to_cents(row[3]) == net:
+                    continue
+                if row[4]:
+                    updates.append(model(pk=row[0], **{fee_field: from_cents(fee), net_field: from_cents(net)}))
+                else:
+                    drifted += 1
+            if updates and not dry_run:
+                with transaction.atomic():
+                    # Lock the rows, and skip any settled since they were read
+                    still_unsettled = set(model.objects.select_for_update().filter(
+                        unsettled, pk__in=[update.pk for update in updates]
+                    ).values_list('pk', flat=True))
+                    drifted += len(updates) - len(still_unsettled)
+                    updates = [update for update in updates if update.pk in still_unsettled]
+                    model.objects.bulk_update(updates, [fee_field, net_field])
+            changed += len(updates)
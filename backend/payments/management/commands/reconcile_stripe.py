@@ -0,0 +1,56 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.exports import parse_timestamp
+from payments.reconciliation import CATEGORIES, DEFAULT_TYPES, Reconciler
+
+class Command(BaseCommand):
+    help = 'Reconcile local transactions, tips and earnings against a Stripe balance-transaction export'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('export', help='Stripe balance-transaction CSV export')
+        parser.add_argument('--start', type=parse_timestamp, help='Only local rows created on/after this ISO date')
+        parser.add_argument('--end', type=parse_timestamp, help='Only local rows created before this ISO date')
+        parser.add_argument('--types', default=','.join(DEFAULT_TYPES),
+                            help='Comma-separated Stripe types/reporting categories to include')
+        parser.add_argument('--report', help='Write every discrepancy to this CSV file')
+        parser.add_argument('--partitions', type=int, default=64)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+    
+    def handle(self, *args, **options):
+        report_file = open(options['report'], 'w', newline='') if options['report'] else None
+        report = None
+        if report_file:
+            report = csv.writer(report_file)
+            report.writerow(['category', 'key', 'source', 'local_id', 'local_cents', 'stripe_cents', 'detail'])
+        
+        reconciler = Reconciler(
+            options['export'],
+            start=options['start'],
+            end=options['end'],
+            types=[t.strip() for t in options['types'].split(',') if t.strip()],
+            partitions=options['partitions'],
+            chunk_size=options['chunk_size'],
+            report=report
+        )
+        try:
+            counts = reconciler.run()
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if report_file:
+                report_file.close()
+        
+        rows = reconciler.stripe_rows + reconciler.local_rows
+        self.stdout.write(
+            f'Compared {reconciler.stripe_rows} Stripe rows with {reconciler.local_rows} local rows '
+            f'in {reconciler.elapsed:.1f}s ({rows / reconciler.elapsed if reconciler.elapsed else 0:,.0f} rows/s)'
+        )
+        for category in CATEGORIES:
+            self.stdout.write(f'  {category}: {counts[category]}')
+        
+        if any(counts.values()):
+            self.stdout.write(self.style.WARNING('Discrepancies found'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Ledgers match'))
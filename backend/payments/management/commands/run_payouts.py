@@ -0,0 +1,40 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.payouts import create_payouts, previous_week, process_payouts
+
+class Command(BaseCommand):
+    help = 'Create payouts for a period (default: last week) and send Stripe transfers'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--period-start', type=date.fromisoformat)
+        parser.add_argument('--period-end', type=date.fromisoformat)
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent Stripe transfers')
+        parser.add_argument('--skip-transfers', action='store_true')
+    
+    def handle(self, *args, **options):
+        period_start, period_end = previous_week()
+        period_start = options['period_start'] or period_start
+        period_end = options['period_end'] or period_end
+        
+        started = time.perf_counter()
+        try:
+            created = create_payouts(period_start, period_end)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f'Created {created} payouts for {period_start} - {period_end} '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+        
+        if options['skip_transfers']:
+            return
+        
+        started = time.perf_counter()
+        results = process_payouts(max_workers=options['workers'])
+        self.stdout.write(
+            f"Transfers: {results['completed']} completed, {results['retrying']} to retry, "
+            f"{results['failed']} failed, {results['skipped']} skipped in {time.perf_counter() - started:.1f}s"
+        )
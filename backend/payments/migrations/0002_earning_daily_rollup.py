@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creators', '0001_initial'),
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('earning_type', models.CharField(choices=[('subscription', 'Subscription'), ('tip', 'Tip'), ('bonus', 'Bonus')], max_length=20)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('platform_fee', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('earnings_count', models.PositiveIntegerField(default=0)),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earning_rollups', to='creators.creator')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('creator', 'day', 'earning_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creators', '0001_initial'),
+        ('payments', '0002_earning_daily_rollup'),
+        ('subscriptions', '0002_subscription_creator_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earning',
+            name='payout',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings', to='payments.payout'),
+        ),
+        migrations.AddIndex(
+            model_name='earning',
+            index=models.Index(condition=models.Q(('is_paid_out', False)), fields=['creator', 'created_at'], name='earning_unpaid'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_earning_payout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tip',
+            name='failure_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='tip',
+            name='stripe_payment_method_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='tip',
+            name='stripe_payment_intent_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
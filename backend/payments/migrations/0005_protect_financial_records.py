@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creators', '0001_initial'),
+        ('payments', '0004_tip_async_charge'),
+        ('subscriptions', '0002_subscription_creator_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='earning',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='earnings', to='creators.creator'),
+        ),
+        migrations.AlterField(
+            model_name='earning',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='subscriptions.subscription'),
+        ),
+        migrations.AlterField(
+            model_name='earning',
+            name='tip',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='payments.tip'),
+        ),
+        migrations.AlterField(
+            model_name='payout',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payouts', to='creators.creator'),
+        ),
+        migrations.AlterField(
+            model_name='tip',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='tips_received', to='creators.creator'),
+        ),
+        migrations.AlterField(
+            model_name='tip',
+            name='tipper',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='tips_sent', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creators', '0001_initial'),
+        ('payments', '0005_protect_financial_records'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='earningdailyrollup',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='earningdailyrollup',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='earningdailyrollup',
+            unique_together={('creator', 'day', 'earning_type', 'shard')},
+        ),
+    ]
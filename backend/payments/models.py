@@ -1,7 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
-from decimal import Decimal
+from .fees import calculate_fee
 
 class Tip(models.Model):
     """One-time tips from subscribers to creators"""
@@ -12,23 +12,26 @@ class Tip(models.Model):
         ('refunded', 'Refunded'),
     ]
     
+    # Financial records outlive their accounts: deleting either side is refused
     tipper = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
         related_name='tips_sent'
     )
     creator = models.ForeignKey(
         'creators.Creator',
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
         related_name='tips_received'
     )
     
     amount = models.DecimalField(max_digits=6, decimal_places=2)
     message = models.TextField(max_length=500, blank=True)
     
-    # Stripe details
-    stripe_payment_intent_id = models.CharField(max_length=255, unique=True)
+    # Stripe details (the intent is created by the worker that charges the tip)
+    stripe_payment_method_id = models.CharField(max_length=255, blank=True)
+    stripe_payment_intent_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    failure_reason = models.CharField(max_length=255, blank=True)
     
     # Platform fee calculation
     platform_fee = models.DecimalField(max_digits=6, decimal_places=2)
@@ -45,8 +48,7 @@ class Tip(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.platform_fee:
-            self.platform_fee = self.amount * Decimal(settings.PLATFORM_FEE_PERCENTAGE / 100)
-            self.creator_amount = self.amount - self.platform_fee
+            self.platform_fee, self.creator_amount = calculate_fee(self.amount)
         super().save(*args, **kwargs)
 
 class Earning(models.Model):
@@ -59,7 +61,7 @@ class Earning(models.Model):
     
     creator = models.ForeignKey(
         'creators.Creator',
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
         related_name='earnings'
     )
     
@@ -71,13 +73,13 @@ class Earning(models.Model):
     # Reference to related objects
     subscription = models.ForeignKey(
         'subscriptions.Subscription',
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
         null=True,
         blank=True
     )
     tip = models.OneToOneField(
         Tip,
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
         null=True,
         blank=True
     )
@@ -85,14 +87,64 @@ class Earning(models.Model):
     # Payout status
     is_paid_out = models.BooleanField(default=False)
     payout_date = models.DateTimeField(null=True, blank=True)
+    payout = models.ForeignKey(
+        'Payout',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='earnings'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unpaid earnings grouped by creator for payout runs
+            models.Index(
+                fields=['creator', 'created_at'],
+                name='earning_unpaid',
+                condition=models.Q(is_paid_out=False)
+            ),
+        ]
     
     def __str__(self):
         return f"{self.creator.display_name}: ${self.net_amount} ({self.get_earning_type_display()})"
+    
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                # In the earning's transaction, so the rollups commit or roll back with it
+                from .rollups import add_to_rollup
+                add_to_rollup(self)
+
+class EarningDailyRollup(models.Model):
+    """Per-creator daily earnings totals by type, maintained as earnings are recorded.
+    
+    A day's totals are spread over ``EARNING_ROLLUP_SHARDS`` rows; readers sum them.
+    """
+    creator = models.ForeignKey(
+        'creators.Creator',
+        on_delete=models.CASCADE,
+        related_name='earning_rollups'
+    )
+    day = models.DateField()
+    earning_type = models.CharField(max_length=20, choices=Earning.EARNING_TYPE_CHOICES)
+    shard = models.PositiveSmallIntegerField(default=0)
+    
+    gross_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    platform_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    earnings_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = ['creator', 'day', 'earning_type', 'shard']
+    
+    def __str__(self):
+        return f"{self.creator.display_name} {self.day} {self.earning_type}/{self.shard}: ${self.net_amount}"
 
 class Payout(models.Model):
     """Weekly payouts to creators"""
@@ -105,7 +157,7 @@ class Payout(models.Model):
     
     creator = models.ForeignKey(
         'creators.Creator',
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
         related_name='payouts'
     )
     
@@ -176,7 +228,7 @@ class Transaction(models.Model):
     
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
         related_name='transactions'
     )
     
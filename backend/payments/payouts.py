@@ -0,0 +1,167 @@
+"""Weekly creator payouts.
+
+Payout creation is set-based and runs in one transaction. A payout row is
+inserted for every creator with unpaid earnings, and the earnings are then
+marked paid and pointed at their payout by one UPDATE per chunk of
+creators. Payout amounts and counts are summed from the rows that UPDATE
+marked. An earning committed while the run is going is therefore either
+marked and counted, or left unpaid for the next run, never marked without
+being paid. The (creator, period_start, period_end) unique key makes
+re-running a period a no-op.
+
+Stripe transfers run afterwards on a bounded thread pool. Every transfer is
+sent with an idempotency key derived from the payout id. Payouts left in
+``processing`` by a crash or a transient Stripe error (network, rate limit,
+Stripe outage) are retried by the next run, which the hourly
+``retry_payouts`` task provides. A payout Stripe rejects outright is marked
+failed and its earnings are reopened, so they roll into the next payout.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .fees import to_cents
+from .stripe_client import stripe
+from .models import Earning, Payout, Transaction
+
+logger = logging.getLogger(__name__)
+
+def previous_week():
+    """(Monday, Sunday) of the last complete week"""
+    today = timezone.localdate()
+    period_start = today - timedelta(days=today.weekday() + 7)
+    return period_start, period_start + timedelta(days=6)
+
+def create_payouts(period_start, period_end, chunk_size=1000):
+    """Create payouts for all unpaid earnings up to the end of the period.
+
+    Unpaid earnings from before ``period_start`` are carried into this
+    payout. Returns the number of payouts created.
+    """
+    cutoff = timezone.make_aware(datetime.combine(period_end + timedelta(days=1), time.min))
+    if cutoff > timezone.now():
+        raise ValueError('Payout period has not ended yet')
+
+    unpaid = Earning.objects.filter(is_paid_out=False, created_at__lt=cutoff)
+    payouts = Payout.objects.filter(period_start=period_start, period_end=period_end)
+
+    with transaction.atomic():
+        existing = set(payouts.values_list('creator_id', flat=True))
+        creator_ids = [
+            creator_id
+            for creator_id in unpaid.order_by('creator_id').values_list('creator_id', flat=True).distinct()
+            if creator_id not in existing
+        ]
+        Payout.objects.bulk_create([
+            Payout(creator_id=creator_id, amount=0, period_start=period_start, period_end=period_end)
+            for creator_id in creator_ids
+        ], batch_size=chunk_size, ignore_conflicts=True)
+
+        now = timezone.now()
+        included = Earning.objects.filter(payout_id=OuterRef('pk')).order_by().values('payout_id')
+        created = 0
+        for start in range(0, len(creator_ids), chunk_size):
+            chunk = creator_ids[start:start + chunk_size]
+            # Mark the earnings paid and point them at their payout
+            unpaid.filter(creator_id__in=chunk).update(
+                is_paid_out=True,
+                payout_date=now,
+                payout_id=Subquery(
+                    payouts.filter(creator_id=OuterRef('creator_id')).values('id')[:1]
+                )
+            )
+
+            # Totals come from exactly the rows just marked
+            new_payouts = payouts.filter(creator_id__in=chunk)
+            new_payouts.update(
+                amount=Coalesce(Subquery(included.annotate(total=Sum('net_amount')).values('total')), Decimal(0)),
+                earnings_count=Coalesce(Subquery(included.annotate(n=Count('id')).values('n')), 0)
+            )
+
+            # Creators whose earnings net to nothing aren't paid; their earnings stay open
+            empty = new_payouts.filter(amount__lte=0)
+            Earning.objects.filter(payout__in=empty).update(is_paid_out=False, payout_date=None, payout=None)
+            created += len(chunk) - empty.delete()[0]
+
+    return created
+
+def reopen_earnings(payout_id):
+    """Mark a failed payout's earnings unpaid so the next payout includes them"""
+    with transaction.atomic():
+        if Payout.objects.filter(pk=payout_id, status='processing').update(status='failed'):
+            Earning.objects.filter(payout_id=payout_id).update(is_paid_out=False, payout_date=None, payout=None)
+
+def send_transfer(payout_id):
+    """Transfer one payout to the creator's connected Stripe account"""
+    try:
+        claimed = Payout.objects.filter(
+            pk=payout_id,
+            status__in=['pending', 'processing']
+        ).update(status='processing')
+        if not claimed:
+            return 'skipped'
+
+        payout = Payout.objects.select_related('creator__user').get(pk=payout_id)
+        destination = payout.creator.user.stripe_account_id
+        if not destination:
+            reopen_earnings(payout_id)
+            return 'failed'
+
+        try:
+            transfer = stripe.Transfer.create(
+                amount=to_cents(payout.amount),
+                currency='usd',
+                destination=destination,
+                metadata={'payout_id': payout.id},
+                idempotency_key=f'payout-{payout.id}'
+            )
+        except (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError,
+                stripe.error.IdempotencyError):
+            # Transient, or another run is sending this transfer right now.
+            # Left processing; the next run retries with the same idempotency key
+            logger.warning('Stripe transfer for payout %s will be retried', payout_id, exc_info=True)
+            return 'retrying'
+        except stripe.error.StripeError:
+            logger.exception('Stripe transfer failed for payout %s', payout_id)
+            reopen_earnings(payout_id)
+            return 'failed'
+
+        with transaction.atomic():
+            completed = Payout.objects.filter(pk=payout_id, status='processing').update(
+                status='completed',
+                stripe_transfer_id=transfer.id,
+                processed_at=timezone.now()
+            )
+            if not completed:
+                # A concurrent run finished this payout with the same transfer
+                return 'skipped'
+            Transaction.objects.create(
+                user=payout.creator.user,
+                transaction_type='payout',
+                amount=payout.amount,
+                status='completed',
+                stripe_transaction_id=transfer.id,
+                payout=payout
+            )
+        return 'completed'
+    finally:
+        # Worker threads each hold their own connection
+        connection.close()
+
+def process_payouts(max_workers=8):
+    """Send transfers for all pending payouts, plus any interrupted mid-transfer"""
+    payout_ids = list(Payout.objects.filter(
+        status__in=['pending', 'processing']
+    ).order_by('id').values_list('id', flat=True))
+
+    results = {'completed': 0, 'retrying': 0, 'failed': 0, 'skipped': 0}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for result in pool.map(send_transfer, payout_ids):
+            results[result] += 1
+    return results
@@ -0,0 +1,181 @@
+"""Offline reconciliation of the payments ledgers against a Stripe export.
+
+Both sides are streamed into hash partitions on disk (a Grace hash join):
+the balance-transaction CSV row by row, and the local ledgers through
+``values_list().iterator()`` in chunks, unsorted. Each partition
+pair is then small enough to join in memory, so a month with millions of
+rows runs in bounded memory without a single Stripe API call.
+
+Amounts are compared in integer cents. The report lists Stripe entries we
+have no record of, local rows Stripe never settled, ids seen more than once
+on either side, and amount mismatches.
+"""
+import csv
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from decimal import InvalidOperation
+
+from .fees import to_cents
+from .models import Earning, Tip, Transaction
+
+# Stripe columns tried in order for the id a row is matched on
+KEY_COLUMNS = ['payment_intent_id', 'transfer_id', 'source_id', 'source', 'id']
+AMOUNT_COLUMNS = ['gross', 'amount']
+TYPE_COLUMNS = ['reporting_category', 'type']
+DEFAULT_TYPES = ['charge', 'payment', 'transfer']
+
+CATEGORIES = ['missing_locally', 'missing_in_stripe', 'duplicate_in_stripe', 'duplicate_locally', 'amount_mismatch']
+
+def local_sources(start=None, end=None):
+    """(name, queryset of (id, stripe key, amount)) for each local ledger"""
+    sources = [
+        ('transaction', Transaction.objects.filter(status='completed').exclude(
+            stripe_transaction_id=''
+        ), 'stripe_transaction_id', 'amount'),
+        ('tip', Tip.objects.filter(status='completed'), 'stripe_payment_intent_id', 'amount'),
+        ('earning', Earning.objects.filter(
+            earning_type='tip', tip__status='completed'
+        ), 'tip__stripe_payment_intent_id', 'gross_amount'),
+    ]
+    for name, queryset, key_field, amount_field in sources:
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        # No ORDER BY: rows are hashed into partitions, so order doesn't matter
+        yield name, queryset.order_by().values_list('id', key_field, amount_field)
+
+def pick_column(header, candidates, required=True):
+    for column in candidates:
+        if column in header:
+            return header.index(column)
+    if required:
+        raise ValueError(f'Export has none of the columns: {", ".join(candidates)}')
+    return None
+
+class Partitions:
+    """One CSV spill file per hash bucket"""
+    def __init__(self, directory, prefix, count):
+        self.paths = [os.path.join(directory, f'{prefix}-{n}.csv') for n in range(count)]
+        self.files = [open(path, 'w', newline='') for path in self.paths]
+        self.writers = [csv.writer(f) for f in self.files]
+    
+    def write(self, key, row):
+        bucket = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=4).digest(), 'big')
+        self.writers[bucket % len(self.writers)].writerow(row)
+    
+    def close(self):
+        for f in self.files:
+            f.close()
+    
+    def read(self, bucket):
+        with open(self.paths[bucket], newline='') as f:
+            yield from csv.reader(f)
+
+class Reconciler:
+    def __init__(self, export_path, start=None, end=None, types=None,
+                 partitions=64, chunk_size=10000, report=None):
+        self.export_path = export_path
+        self.start = start
+        self.end = end
+        self.types = set(types or DEFAULT_TYPES)
+        self.partition_count = partitions
+        self.chunk_size = chunk_size
+        self.report = report
+        self.counts = Counter()
+        self.stripe_rows = 0
+        self.local_rows = 0
+    
+    def run(self):
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix='reconcile-') as directory:
+            stripe = Partitions(directory, 'stripe', self.partition_count)
+            local = Partitions(directory, 'local', self.partition_count)
+            try:
+                self.partition_stripe(stripe)
+                self.partition_local(local)
+            finally:
+                stripe.close()
+                local.close()
+            
+            for bucket in range(self.partition_count):
+                self.join(stripe.read(bucket), local.read(bucket))
+        
+        self.elapsed = time.perf_counter() - started
+        return self.counts
+    
+    def partition_stripe(self, partitions):
+        with open(self.export_path, newline='') as f:
+            reader = csv.reader(f)
+            header = [column.strip().lower() for column in next(reader)]
+            amount_column = pick_column(header, AMOUNT_COLUMNS)
+            type_column = pick_column(header, TYPE_COLUMNS, required=False)
+            key_columns = [header.index(c) for c in KEY_COLUMNS if c in header]
+            if not key_columns:
+                raise ValueError(f'Export has none of the columns: {", ".join(KEY_COLUMNS)}')
+            
+            for line, row in enumerate(reader, start=2):
+                try:
+                    if type_column is not None and row[type_column] not in self.types:
+                        continue
+                    key = next((row[c] for c in key_columns if row[c]), None)
+                    if key is None:
+                        continue
+                    # Transfers are debits in the export; compare magnitudes
+                    cents = abs(to_cents(row[amount_column]))
+                except (IndexError, InvalidOperation) as e:
+                    raise ValueError(f'Line {line} of the export is malformed: {row!r}') from e
+                partitions.write(key, [key, cents, line])
+                self.stripe_rows += 1
+    
+    def partition_local(self, partitions):
+        for name, rows in local_sources(self.start, self.end):
+            for pk, key, amount in rows.iterator(chunk_size=self.chunk_size):
+                if not key:
+                    continue
+                partitions.write(key, [name, key, to_cents(amount), pk])
+                self.local_rows += 1
+    
+    def join(self, stripe_rows, local_rows):
+        stripe = defaultdict(list)
+        for key, cents, line in stripe_rows:
+            stripe[key].append((int(cents), line))
+        
+        local = defaultdict(list)
+        for name, key, cents, pk in local_rows:
+            local[(name, key)].append((int(cents), pk))
+        
+        for key, entries in stripe.items():
+            if len(entries) > 1:
+                self.record('duplicate_in_stripe', key, stripe_cents=entries[0][0],
+                            detail=f'lines {",".join(str(line) for _, line in entries)}')
+        
+        matched = set()
+        for (name, key), entries in local.items():
+            if len(entries) > 1:
+                self.record('duplicate_locally', key, source=name,
+                            detail=f'ids {",".join(str(pk) for _, pk in entries)}')
+            if key not in stripe:
+                for cents, pk in entries:
+                    self.record('missing_in_stripe', key, source=name, local_id=pk, local_cents=cents)
+                continue
+            
+            matched.add(key)
+            stripe_cents = stripe[key][0][0]
+            for cents, pk in entries:
+                if cents != stripe_cents:
+                    self.record('amount_mismatch', key, source=name, local_id=pk,
+                                local_cents=cents, stripe_cents=stripe_cents)
+        
+        for key, entries in stripe.items():
+            if key not in matched:
+                self.record('missing_locally', key, stripe_cents=entries[0][0],
+                            detail=f'line {entries[0][1]}')
+    
+    def record(self, category, key, source='', local_id='', local_cents='', stripe_cents='', detail=''):
+        self.counts[category] += 1
+        if self.report is not None:
+            self.report.writerow([category, key, source, local_id, local_cents, stripe_cents, detail])
@@ -0,0 +1,94 @@
+"""Daily earnings rollups per creator and earning type.
+
+Dashboards read EarningDailyRollup instead of aggregating the full Earning
+history. Rows are incremented in the same transaction that records the
+earning, so a committed earning is always counted and a rolled back one
+never is. They can be rebuilt from Earning at any time with the
+``rebuild_earning_rollups`` command.
+
+Each (creator, day, type) is split over ``EARNING_ROLLUP_SHARDS`` rows and
+an earning is added to the shard picked by its id, so concurrent tips to
+one creator mostly lock different rows while their transactions are open.
+Readers sum over the shards; a rebuild deletes every shard in its range
+before writing the totals to shard 0.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Earning, EarningDailyRollup
+
+def add_to_rollup(earning):
+    """Add one earning to a shard of its day's rollup"""
+    lookup = {
+        'creator_id': earning.creator_id,
+        'day': timezone.localdate(earning.created_at),
+        'earning_type': earning.earning_type,
+        'shard': earning.pk % settings.EARNING_ROLLUP_SHARDS,
+    }
+    increments = {
+        'gross_amount': F('gross_amount') + earning.gross_amount,
+        'platform_fee': F('platform_fee') + earning.platform_fee,
+        'net_amount': F('net_amount') + earning.net_amount,
+        'earnings_count': F('earnings_count') + 1,
+    }
+    
+    if EarningDailyRollup.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            EarningDailyRollup.objects.create(
+                gross_amount=earning.gross_amount,
+                platform_fee=earning.platform_fee,
+                net_amount=earning.net_amount,
+                earnings_count=1,
+                **lookup
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        EarningDailyRollup.objects.filter(**lookup).update(**increments)
+
+def rebuild_rollups(creator_id=None, since=None, batch_size=5000):
+    """Recompute rollups from Earning with one grouped aggregate; returns rows written"""
+    earnings = Earning.objects.all()
+    rollups = EarningDailyRollup.objects.all()
+    if creator_id is not None:
+        earnings = earnings.filter(creator_id=creator_id)
+        rollups = rollups.filter(creator_id=creator_id)
+    if since is not None:
+        earnings = earnings.filter(created_at__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+    
+    totals = earnings.annotate(
+        day=TruncDate('created_at')
+    ).values('creator_id', 'day', 'earning_type').annotate(
+        gross=Sum('gross_amount'),
+        fee=Sum('platform_fee'),
+        net=Sum('net_amount'),
+        count=Count('id')
+    ).order_by()
+    
+    written = 0
+    with transaction.atomic():
+        # Every shard, not just shard 0, or the old increments would be counted twice
+        rollups.delete()
+        batch = []
+        for row in totals.iterator(chunk_size=batch_size):
+            batch.append(EarningDailyRollup(
+                creator_id=row['creator_id'],
+                day=row['day'],
+                earning_type=row['earning_type'],
+                gross_amount=row['gross'],
+                platform_fee=row['fee'],
+                net_amount=row['net'],
+                earnings_count=row['count']
+            ))
+            if len(batch) >= batch_size:
+                EarningDailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        EarningDailyRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,50 @@
+from decimal import Decimal
+from django.conf import settings
+from rest_framework import serializers
+from .models import Tip
+
+class TipSerializer(serializers.ModelSerializer):
+    creator_name = serializers.CharField(source='creator.display_name', read_only=True)
+    
+    class Meta:
+        model = Tip
+        fields = [
+            'id', 'creator', 'creator_name', 'amount', 'message', 'status',
+            'failure_reason', 'created_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+class TipCreateSerializer(serializers.Serializer):
+    creator_id = serializers.IntegerField()
+    amount = serializers.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=Decimal(min(settings.TIP_AMOUNTS)),
+        max_value=Decimal(settings.MAX_TIP_AMOUNT)
+    )
+    message = serializers.CharField(max_length=500, required=False, allow_blank=True)
+    payment_method_id = serializers.CharField(max_length=255)
+    
+    def validate_creator_id(self, value):
+        from creators.models import Creator
+        try:
+            return Creator.objects.get(id=value, is_active=True)
+        except Creator.DoesNotExist:
+            raise serializers.ValidationError("Creator not found or inactive")
+    
+    def validate(self, attrs):
+        creator = attrs['creator_id']
+        if not creator.accepts_tips:
+            raise serializers.ValidationError("This creator doesn't accept tips")
+        if creator.user_id == self.context['request'].user.id:
+            raise serializers.ValidationError("Cannot tip yourself")
+        return attrs
+    
+    def create(self, validated_data):
+        return Tip.objects.create(
+            tipper=self.context['request'].user,
+            creator=validated_data['creator_id'],
+            amount=validated_data['amount'],
+            message=validated_data.get('message', ''),
+            stripe_payment_method_id=validated_data['payment_method_id']
+        )
@@ -0,0 +1,26 @@
+"""Stripe calls for async views.
+
+stripe-python's own ``*_async`` methods need httpx or aiohttp, which this
+project doesn't install. Instead each call runs on a thread outside
+Django's thread-sensitive executor, so a slow Stripe request holds up
+neither the event loop nor the request's ORM calls. The Stripe function is
+looked up at call time, so anything patching ``stripe`` (tests, the
+benchmark's fake Stripe) applies here too.
+"""
+from asgiref.sync import sync_to_async
+
+from .stripe_client import stripe
+
+async def call_stripe(resource, method, *args, **kwargs):
+    """``await call_stripe('Subscription', 'modify', id, ...)`` runs ``stripe.Subscription.modify`` off the loop"""
+    func = getattr(getattr(stripe, resource), method)
+    return await sync_to_async(func, thread_sensitive=False)(*args, **kwargs)
+
+async def modify_subscription(subscription_id, **params):
+    return await call_stripe('Subscription', 'modify', subscription_id, **params)
+
+async def retrieve_subscription(subscription_id):
+    return await call_stripe('Subscription', 'retrieve', subscription_id)
+
+async def retrieve_payment_intent(payment_intent_id):
+    return await call_stripe('PaymentIntent', 'retrieve', payment_intent_id)
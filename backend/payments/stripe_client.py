@@ -0,0 +1,32 @@
+"""The Stripe SDK, imported on first use.
+
+Importing ``stripe`` takes most of a second and nearly all of a worker's
+import time, while most requests, tasks and management commands never call
+Stripe. Modules that call Stripe do ``from payments.stripe_client import
+stripe`` and use it like the module. The first attribute access imports
+the SDK and sets the API key.
+
+Attributes are looked up on the real module on every access, so anything
+patching ``stripe`` (tests, the benchmark's fake Stripe) applies here too.
+Exception classes are only reached inside ``except`` clauses, which Python
+evaluates only once an exception is raised, so the SDK is loaded by then.
+"""
+from django.conf import settings
+
+_stripe = None
+
+def get_stripe():
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        _stripe = stripe
+    return _stripe
+
+class LazyStripe:
+    """Stands in for the ``stripe`` module until it's used"""
+    
+    def __getattr__(self, name):
+        return getattr(get_stripe(), name)
+
+stripe = LazyStripe()
@@ -0,0 +1,32 @@
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from .payouts import create_payouts, previous_week, process_payouts
+from .tips import RetryableChargeError, UnrecordedChargeError, charge_tip, fail_tip
+
+@shared_task
+def run_weekly_payouts():
+    """Create last week's payouts and send their transfers"""
+    period_start, period_end = previous_week()
+    create_payouts(period_start, period_end)
+    return process_payouts()
+
+@shared_task
+def retry_payouts():
+    """Resend transfers left processing by a crash or a transient Stripe error"""
+    return process_payouts()
+
+@shared_task(bind=True, acks_late=True, max_retries=5)
+def process_tip(self, tip_id):
+    """Charge a pending tip and record its earning, transaction and message"""
+    try:
+        return charge_tip(tip_id)
+    except RetryableChargeError as e:
+        if self.request.retries >= self.max_retries:
+            if isinstance(e, UnrecordedChargeError):
+                # The card was charged: leave the tip pending and the task failed for someone to look at
+                raise
+            # Out of retries: fail the tip rather than leave it pending for good
+            return fail_tip(tip_id, 'Payment could not be processed, please try again')
+        raise self.retry(exc=e, countdown=get_exponential_backoff_interval(
+            factor=1, retries=self.request.retries, maximum=600, full_jitter=True
+        ))
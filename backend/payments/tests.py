@@ -1,3 +1,342 @@
-from django.test import TestCase
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from creators.models import Creator
+from .fees import calculate_fee, calculate_fees_cents, from_cents, to_cents
+from .models import Earning, EarningDailyRollup, Payout, Tip, Transaction
+from .payouts import create_payouts, previous_week, send_transfer
+from .rollups import rebuild_rollups
+from .stripe_client import get_stripe
+from .tasks import process_tip
+from .tips import UnrecordedChargeError, complete_tip
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ExportLedgerTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='password123', is_staff=True
+        )
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=staff).key}'}
+        Transaction.objects.bulk_create([
+            Transaction(user=staff, transaction_type='tip_payment', amount=n, status='completed')
+            for n in range(1, 6)
+        ])
+
+    def test_streams_asynchronously_under_asgi(self):
+        response = self.client.get('/api/payments/exports/transactions.ndjson', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        expected = b''.join(response.streaming_content)
+
+        async def fetch():
+            response = await AsyncClient().get('/api/payments/exports/transactions.ndjson', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            # An async iterator, so the ASGI handler doesn't buffer it with list()
+            self.assertTrue(response.is_async)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(async_to_sync(fetch)(), expected)
+        self.assertEqual(len(expected.splitlines()), 5)
+
+    def test_accepts_offsets_in_the_range(self):
+        for start in ['2020-01-01T00:00:00Z', '2020-01-01T00:00:00+02:00', '2020-01-01']:
+            response = self.client.get(
+                '/api/payments/exports/transactions.ndjson', {'start': start}, headers=self.headers
+            )
+            self.assertEqual(response.status_code, 200, start)
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+            self.assertEqual(len(rows), 5)
+
+        response = self.client.get(
+            '/api/payments/exports/transactions.ndjson', {'start': 'yesterday'}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 400)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProcessTipTests(TestCase):
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        tipper = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123', stripe_customer_id='cus_1'
+        )
+        self.tip = Tip.objects.create(
+            tipper=tipper, creator=self.creator, amount=5, platform_fee=Decimal('0.60'),
+            creator_amount=Decimal('4.40'), stripe_payment_method_id='pm_1'
+        )
+
+    def test_fails_the_tip_once_retries_run_out(self):
+        error = get_stripe().error.APIConnectionError('Network down')
+        with mock.patch.object(get_stripe().PaymentIntent, 'create', side_effect=error) as create:
+            self.assertEqual(process_tip.apply(args=[self.tip.pk]).get(), 'failed')
+        self.assertEqual(create.call_count, process_tip.max_retries + 1)
+        self.tip.refresh_from_db()
+        self.assertEqual(self.tip.status, 'failed')
+
+    def test_retries_until_the_charge_goes_through(self):
+        error = get_stripe().error.RateLimitError('Slow down')
+        intent = mock.Mock(id='pi_1', status='succeeded')
+        with mock.patch.object(get_stripe().PaymentIntent, 'create', side_effect=[error, intent]):
+            self.assertEqual(process_tip.apply(args=[self.tip.pk]).get(), 'completed')
+        self.tip.refresh_from_db()
+        self.assertEqual(self.tip.status, 'completed')
+
+    def test_recording_the_charge_is_retried_with_the_same_intent(self):
+        intent = mock.Mock(id='pi_1', status='succeeded')
+        calls = []
+
+        def fail_once(tip, payment_intent_id):
+            calls.append(payment_intent_id)
+            if len(calls) == 1:
+                raise DatabaseError('connection lost')
+            return complete_tip(tip, payment_intent_id)
+
+        with mock.patch.object(get_stripe().PaymentIntent, 'create', return_value=intent) as create, \
+                mock.patch('payments.tips.complete_tip', side_effect=fail_once):
+            self.assertEqual(process_tip.apply(args=[self.tip.pk]).get(), 'completed')
+        keys = [call.kwargs['idempotency_key'] for call in create.call_args_list]
+        self.assertEqual(keys, [f'tip-{self.tip.pk}'] * 2)
+        self.tip.refresh_from_db()
+        self.assertEqual((self.tip.status, self.tip.stripe_payment_intent_id), ('completed', 'pi_1'))
+        self.assertEqual(Earning.objects.filter(tip=self.tip).count(), 1)
+
+    def test_a_charged_tip_is_never_failed(self):
+        intent = mock.Mock(id='pi_1', status='succeeded')
+        with mock.patch.object(get_stripe().PaymentIntent, 'create', return_value=intent), \
+                mock.patch('payments.tips.complete_tip', side_effect=DatabaseError('connection lost')):
+            result = process_tip.apply(args=[self.tip.pk])
+        self.assertIsInstance(result.result, UnrecordedChargeError)
+        self.tip.refresh_from_db()
+        self.assertEqual(self.tip.status, 'pending')
+
+    def test_cancels_an_intent_that_needs_the_customer(self):
+        intent = mock.Mock(id='pi_1', status='requires_action')
+        with mock.patch.object(get_stripe().PaymentIntent, 'create', return_value=intent), \
+                mock.patch.object(get_stripe().PaymentIntent, 'cancel') as cancel:
+            self.assertEqual(process_tip.apply(args=[self.tip.pk]).get(), 'failed')
+        cancel.assert_called_once_with('pi_1')
+        self.tip.refresh_from_db()
+        self.assertEqual((self.tip.status, self.tip.failure_reason), ('failed', 'Payment requires action'))
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EARNING_ROLLUP_SHARDS=4,
+)
+class EarningRollupTests(TestCase):
+    def test_series_sums_the_shards(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(10):
+                Earning.objects.create(
+                    creator=creator, earning_type='tip', gross_amount=5,
+                    platform_fee=Decimal('0.60'), net_amount=Decimal('4.40')
+                )
+        self.assertEqual(EarningDailyRollup.objects.filter(creator=creator).count(), 4)
+
+        client = APIClient()
+        client.force_authenticate(creator_user)
+        response = client.get('/api/payments/earnings/series/')
+        self.assertEqual(response.status_code, 200)
+        [day] = response.data['series']
+        self.assertEqual(day['earnings_count'], 10)
+        self.assertEqual(Decimal(day['net_amount']), Decimal('44.00'))
+
+    def create_creator(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        return Creator.objects.create(user=creator_user, display_name='Creator')
+
+    def test_the_increment_commits_with_the_earning(self):
+        creator = self.create_creator()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Earning.objects.create(
+                creator=creator, earning_type='tip', gross_amount=5,
+                platform_fee=Decimal('0.60'), net_amount=Decimal('4.40')
+            )
+            # Counted before the transaction commits, not in a callback after it
+            self.assertEqual(EarningDailyRollup.objects.filter(creator=creator).count(), 1)
+            raise RuntimeError('Rolled back')
+        self.assertFalse(EarningDailyRollup.objects.filter(creator=creator).exists())
+
+    def test_rebuild_replaces_every_shard(self):
+        creator = self.create_creator()
+        for _ in range(10):
+            Earning.objects.create(
+                creator=creator, earning_type='tip', gross_amount=5,
+                platform_fee=Decimal('0.60'), net_amount=Decimal('4.40')
+            )
+        self.assertEqual(EarningDailyRollup.objects.filter(creator=creator).count(), 4)
+
+        self.assertEqual(rebuild_rollups(creator_id=creator.pk), 1)
+        [rollup] = EarningDailyRollup.objects.filter(creator=creator)
+        self.assertEqual((rollup.shard, rollup.earnings_count, rollup.net_amount), (0, 10, Decimal('44.00')))
+
+class FeeEngineTests(TestCase):
+    def test_batch_matches_single_amounts(self):
+        cases = {
+            # Half a cent of fee at 10% and at 2.5%, either side of it, and refunds
+            10: ['0.05', '0.15', '0.14', '0.16', '1.25', '999.95', '0', '-0.05', '-1.25'],
+            Decimal('2.5'): ['0.20', '0.60', '0.19', '0.21', '99.80', '-0.20'],
+            12: ['0.01', '4.99', '5.00', '1234.56'],
+        }
+        for percentage, amounts in cases.items():
+            amounts = [Decimal(amount) for amount in amounts]
+            fees, nets = calculate_fees_cents([to_cents(amount) for amount in amounts], percentage)
+            for amount, fee, net in zip(amounts, fees, nets):
+                self.assertEqual(
+                    calculate_fee(amount, percentage), (from_cents(fee), from_cents(net)), (percentage, amount)
+                )
+        # Non-negative batches take the inlined formula; a refund sends the whole batch through fee_cents
+        self.assertEqual(calculate_fees_cents([5, 15], 10), ([1, 2], [4, 13]))
+        self.assertEqual(calculate_fees_cents([5, -5], 10), ([1, -1], [4, -4]))
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RecalculateFeesTests(TestCase):
+    stale = {'platform_fee': Decimal('1.00'), 'creator_amount': Decimal('9.00')}
+
+    def setUp(self):
+        creator_user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', account_type='creator'
+        )
+        self.creator = Creator.objects.create(user=creator_user, display_name='Creator')
+        self.tipper = User.objects.create_user(
+            username='fan', email='fan@example.com', password='password123'
+        )
+
+    def tip(self, **fields):
+        return Tip.objects.create(tipper=self.tipper, creator=self.creator, amount=10, **self.stale, **fields)
+
+    def earning(self, earning_type='bonus', **fields):
+        return Earning.objects.create(
+            creator=self.creator, earning_type=earning_type, gross_amount=10,
+            platform_fee=Decimal('1.00'), net_amount=Decimal('9.00'), **fields
+        )
+
+    def test_fixes_unsettled_rows_and_leaves_settled_ones(self):
+        pending = self.tip()
+        charged = self.tip(status='completed')
+        # Unpaid, but copied from a charged tip: it stays in step with the tip
+        charged_earning = self.earning(earning_type='tip', tip=charged)
+        unpaid = self.earning()
+        paid = self.earning(is_paid_out=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recalculate_fees', stdout=io.StringIO())
+
+        expected = (Decimal('1.20'), Decimal('8.80'))
+        pending.refresh_from_db()
+        self.assertEqual((pending.platform_fee, pending.creator_amount), expected)
+        unpaid.refresh_from_db()
+        self.assertEqual((unpaid.platform_fee, unpaid.net_amount), expected)
+
+        charged.refresh_from_db()
+        self.assertEqual((charged.platform_fee, charged.creator_amount), (Decimal('1.00'), Decimal('9.00')))
+        for earning in [charged_earning, paid]:
+            earning.refresh_from_db()
+            self.assertEqual((earning.platform_fee, earning.net_amount), (Decimal('1.00'), Decimal('9.00')))
+
+    def test_a_tip_charged_after_recalculation_carries_the_new_fee(self):
+        pending = self.tip()
+        loaded = Tip.objects.get(pk=pending.pk)
+        call_command('recalculate_fees', stdout=io.StringIO())
+
+        # The worker loaded the tip before its fee was fixed
+        self.assertEqual(complete_tip(loaded, 'pi_1'), 'completed')
+        earning = Earning.objects.get(tip=pending)
+        self.assertEqual((earning.platform_fee, earning.net_amount), (Decimal('1.20'), Decimal('8.80')))
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PayoutTests(TestCase):
+    def setUp(self):
+        self.creators = []
+        for n, nets in enumerate([['4.40', '8.80'], ['2.00'], ['3.00', '-3.00']]):
+            user = User.objects.create_user(
+                username=f'creator{n}', email=f'creator{n}@example.com', password='password123',
+                account_type='creator', stripe_account_id=f'acct_{n}'
+            )
+            creator = Creator.objects.create(user=user, display_name=f'Creator {n}')
+            for net in nets:
+                Earning.objects.create(
+                    creator=creator, earning_type='bonus', gross_amount=net, platform_fee=0, net_amount=net
+                )
+            self.creators.append(creator)
+        self.period = previous_week()
+        Earning.objects.update(created_at=timezone.now() - timedelta(days=8))
+        # Earned after the period ends: left for the next payout
+        self.later = Earning.objects.create(
+            creator=self.creators[0], earning_type='bonus', gross_amount=1, platform_fee=0, net_amount=1
+        )
+
+        # Worker threads close their connection; here that would end the test's transaction
+        patcher = mock.patch.object(connection, 'close')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_marks_earnings_and_totals_them_per_payout(self):
+        self.assertEqual(create_payouts(*self.period), 2)
+
+        for creator, amount, count in [(self.creators[0], '13.20', 2), (self.creators[1], '2.00', 1)]:
+            payout = Payout.objects.get(creator=creator)
+            self.assertEqual((payout.amount, payout.earnings_count), (Decimal(amount), count))
+            marked = Earning.objects.filter(payout=payout)
+            self.assertEqual(marked.count(), count)
+            self.assertFalse(marked.filter(is_paid_out=False).exists())
+
+        # Netting to zero, so no payout and the earnings stay open
+        self.assertFalse(Payout.objects.filter(creator=self.creators[2]).exists())
+        self.assertEqual(Earning.objects.filter(creator=self.creators[2], is_paid_out=False, payout=None).count(), 2)
+        self.later.refresh_from_db()
+        self.assertFalse(self.later.is_paid_out)
+
+        # Re-running the period changes nothing
+        self.assertEqual(create_payouts(*self.period), 0)
+        self.assertEqual(Payout.objects.count(), 2)
+
+    def test_rejected_transfer_reopens_the_earnings(self):
+        create_payouts(*self.period)
+        payout = Payout.objects.get(creator=self.creators[0])
+        error = get_stripe().error.InvalidRequestError('No such destination', 'destination')
+        with mock.patch.object(get_stripe().Transfer, 'create', side_effect=error):
+            self.assertEqual(send_transfer(payout.pk), 'failed')
+
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, 'failed')
+        self.assertFalse(Earning.objects.filter(payout=payout).exists())
+        self.assertEqual(Earning.objects.filter(creator=self.creators[0], is_paid_out=False).count(), 3)
+
+    def test_retry_reuses_the_idempotency_key(self):
+        create_payouts(*self.period)
+        payout = Payout.objects.get(creator=self.creators[0])
+        error = get_stripe().error.APIConnectionError('Network down')
+        with mock.patch.object(get_stripe().Transfer, 'create', side_effect=[error, mock.Mock(id='tr_1')]) as create:
+            self.assertEqual(send_transfer(payout.pk), 'retrying')
+            payout.refresh_from_db()
+            self.assertEqual(payout.status, 'processing')
+            self.assertEqual(send_transfer(payout.pk), 'completed')
+
+        keys = [call.kwargs['idempotency_key'] for call in create.call_args_list]
+        self.assertEqual(keys, [f'payout-{payout.pk}'] * 2)
+        self.assertEqual(create.call_args.kwargs['amount'], 1320)
+        payout.refresh_from_db()
+        self.assertEqual((payout.status, payout.stripe_transfer_id), ('completed', 'tr_1'))
+        self.assertTrue(Transaction.objects.filter(payout=payout, amount=Decimal('13.20')).exists())
+        # Already completed: a late duplicate run sends nothing
+        self.assertEqual(send_transfer(payout.pk), 'skipped')
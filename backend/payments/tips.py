@@ -0,0 +1,134 @@
+"""Tip charging, done by a worker after the API has recorded a pending Tip.
+
+The Stripe PaymentIntent is created with an idempotency key derived from
+the tip id, so a retried or re-delivered task never charges twice. Once the
+charge succeeds the Earning, Transaction and ``tip`` Message are written in
+one transaction; if that fails the task is retried, and the retry gets the
+same succeeded intent back instead of charging again. An intent that can't
+complete off-session is cancelled before the tip is failed, so no
+authorization is left hanging on the card. Nothing here touches the Creator row: earnings totals come
+from the daily rollups, so a burst of tips to one creator doesn't queue on
+a single lock.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from messaging.models import Conversation, Message
+from .fees import to_cents
+from .models import Earning, Tip, Transaction
+from .stripe_client import stripe
+
+logger = logging.getLogger(__name__)
+
+class RetryableChargeError(Exception):
+    """A connection or rate limit error from Stripe; the idempotency key makes a retry safe"""
+
+class UnrecordedChargeError(RetryableChargeError):
+    """The charge went through but recording it failed; the tip must not be failed"""
+
+def cancel_intent(intent_id):
+    try:
+        stripe.PaymentIntent.cancel(intent_id)
+    except stripe.error.StripeError:
+        logger.warning('Could not cancel payment intent %s', intent_id, exc_info=True)
+
+def fail_tip(tip_id, reason):
+    Tip.objects.filter(pk=tip_id, status='pending').update(
+        status='failed',
+        failure_reason=reason[:255]
+    )
+    return 'failed'
+
+def charge_tip(tip_id):
+    """Charge a pending tip and record it. Safe to call more than once."""
+    tip = Tip.objects.select_related('tipper').filter(pk=tip_id, status='pending').first()
+    if tip is None:
+        return 'skipped'
+    
+    tipper = tip.tipper
+    try:
+        if not tipper.stripe_customer_id:
+            customer = stripe.Customer.create(
+                email=tipper.email,
+                name=tipper.full_name,
+                idempotency_key=f'customer-{tipper.pk}'
+            )
+            tipper.stripe_customer_id = customer.id
+            tipper.save(update_fields=['stripe_customer_id'])
+        
+        intent = stripe.PaymentIntent.create(
+            amount=to_cents(tip.amount),
+            currency='usd',
+            customer=tipper.stripe_customer_id,
+            payment_method=tip.stripe_payment_method_id,
+            confirm=True,
+            off_session=True,
+            metadata={'tip_id': tip.pk},
+            idempotency_key=f'tip-{tip.pk}'
+        )
+    except (stripe.error.APIConnectionError, stripe.error.RateLimitError) as e:
+        raise RetryableChargeError(str(e)) from e
+    except stripe.error.StripeError as e:
+        logger.warning('Tip %s charge failed: %s', tip_id, e)
+        # A declined card leaves the intent waiting for another payment method
+        declined = getattr(e.error, 'payment_intent', None) if e.error else None
+        if declined is not None:
+            cancel_intent(declined.id)
+        return fail_tip(tip_id, e.user_message or 'Payment failed')
+    
+    if intent.status != 'succeeded':
+        # Nobody is on the page to complete 3D Secure for a queued charge
+        if intent.status in ('requires_action', 'requires_payment_method', 'requires_confirmation'):
+            cancel_intent(intent.id)
+        return fail_tip(tip_id, f'Payment {intent.status.replace("_", " ")}')
+    
+    try:
+        return complete_tip(tip, intent.id)
+    except Exception as e:
+        raise UnrecordedChargeError(f'Tip {tip_id} charged as {intent.id} but not recorded: {e}') from e
+
+def complete_tip(tip, payment_intent_id):
+    """Record a charged tip: Earning, Transaction and the tip message, atomically"""
+    with transaction.atomic():
+        completed = Tip.objects.filter(pk=tip.pk, status='pending').update(
+            status='completed',
+            stripe_payment_intent_id=payment_intent_id,
+            completed_at=timezone.now()
+        )
+        if not completed:
+            return 'skipped'
+        # The fee as of the locked row, in case it was recalculated while pending
+        tip.refresh_from_db(fields=['platform_fee', 'creator_amount'])
+        
+        Earning.objects.create(
+            creator_id=tip.creator_id,
+            earning_type='tip',
+            gross_amount=tip.amount,
+            platform_fee=tip.platform_fee,
+            net_amount=tip.creator_amount,
+            tip=tip
+        )
+        Transaction.objects.create(
+            user_id=tip.tipper_id,
+            transaction_type='tip_payment',
+            amount=tip.amount,
+            status='completed',
+            stripe_transaction_id=payment_intent_id,
+            tip=tip
+        )
+        
+        # The message save pushes the tip to the creator once this commits
+        conversation, _ = Conversation.objects.get_or_create(
+            creator_id=tip.creator_id,
+            subscriber_id=tip.tipper_id
+        )
+        Message.objects.create(
+            conversation=conversation,
+            sender_id=tip.tipper_id,
+            message_type='tip',
+            content=tip.message,
+            tip_amount=tip.amount
+        )
+    return 'completed'
@@ -1,7 +1,11 @@
 from django.urls import path
+from . import views
 
 app_name = 'payments'
 
 urlpatterns = [
-    # Payment URLs will be added here
-]
\ No newline at end of file
+    path('tips/', views.TipListCreateView.as_view(), name='tip-list'),
+    path('tips/<int:pk>/', views.TipDetailView.as_view(), name='tip-detail'),
+    path('earnings/series/', views.earnings_series, name='earnings-series'),
+    path('exports/<slug:kind>.<slug:output_format>', views.export_ledger, name='export-ledger'),
+]
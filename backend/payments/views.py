@@ -1,3 +1,152 @@
-from django.shortcuts import render
+from datetime import date, timedelta
+from decimal import Decimal
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from rest_framework import generics, permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from creator_platform.ratelimit import ScopedRateLimit
+from creator_platform.streaming import stream_for
+from creators.models import Creator
+from .exports import EXPORTS, FORMATS, encode, export_rows, parse_timestamp
+from .models import EarningDailyRollup, Tip
+from .serializers import TipCreateSerializer, TipSerializer
+from .tasks import process_tip
 
-# Create your views here.
+SERIES_GRANULARITIES = {
+    'day': (lambda field: F(field), 30),
+    'week': (TruncWeek, 7 * 12),
+    'month': (TruncMonth, 365),
+}
+
+class TipListCreateView(generics.ListCreateAPIView):
+    """List the user's sent tips or send a new one.
+    
+    Sending only records a pending tip; the charge runs in a worker and the
+    tip's status can be polled on its detail endpoint.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'checkout'
+    
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return TipCreateSerializer
+        return TipSerializer
+    
+    def get_queryset(self):
+        return Tip.objects.filter(tipper=self.request.user).select_related('creator')
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tip = serializer.save()
+        transaction.on_commit(lambda: process_tip.delay(tip.id))
+        return Response(TipSerializer(tip).data, status=status.HTTP_202_ACCEPTED)
+
+class TipDetailView(generics.RetrieveAPIView):
+    """Status of a sent tip"""
+    serializer_class = TipSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Tip.objects.filter(tipper=self.request.user).select_related('creator')
+
+def money(value):
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def earnings_series(request):
+    """Creator earnings per day, week or month, read from the daily rollups"""
+    try:
+        creator = request.user.creator_profile
+    except Creator.DoesNotExist:
+        return Response({
+            'error': 'Creator profile not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    granularity = request.query_params.get('granularity', 'day')
+    if granularity not in SERIES_GRANULARITIES:
+        return Response({
+            'error': 'granularity must be day, week or month'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    truncate, default_days = SERIES_GRANULARITIES[granularity]
+    
+    try:
+        end = date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else timezone.localdate()
+        start = date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else end - timedelta(days=default_days)
+    except ValueError:
+        return Response({
+            'error': 'start and end must be YYYY-MM-DD dates'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    rollups = EarningDailyRollup.objects.filter(creator=creator, day__gte=start, day__lte=end)
+    group_by = ['period']
+    if request.query_params.get('earning_type'):
+        rollups = rollups.filter(earning_type=request.query_params['earning_type'])
+    if request.query_params.get('by_type') == 'true':
+        group_by.append('earning_type')
+    
+    rows = rollups.annotate(period=truncate('day')).values(*group_by).annotate(
+        gross=Sum('gross_amount'),
+        fee=Sum('platform_fee'),
+        net=Sum('net_amount'),
+        count=Sum('earnings_count')
+    ).order_by(*group_by)
+    
+    return Response({
+        'granularity': granularity,
+        'start': start,
+        'end': end,
+        'series': [
+            {
+                **{key: row[key] for key in group_by},
+                'gross_amount': money(row['gross']),
+                'platform_fee': money(row['fee']),
+                'net_amount': money(row['net']),
+                'earnings_count': row['count'],
+            }
+            for row in rows
+        ],
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_ledger(request, kind, output_format):
+    """Stream a ledger export as ``<kind>.csv`` or ``<kind>.ndjson`` (``?start=&end=&creator=``)"""
+    if kind not in EXPORTS:
+        return Response({
+            'error': 'Unknown export'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if output_format not in FORMATS:
+        return Response({
+            'error': 'Export format must be csv or ndjson'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        creator = request.query_params.get('creator')
+        fields, rows = export_rows(
+            kind,
+            start=parse_timestamp(start) if start else None,
+            end=parse_timestamp(end) if end else None,
+            creator_id=int(creator) if creator else None
+        )
+    except ValueError:
+        return Response({
+            'error': 'start/end must be ISO dates and creator an id'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    content_type = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        stream_for(request, encode(fields, rows, output_format)),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{output_format}"'
+    return response
@@ -0,0 +1,13 @@
+"""Reactions to subscription events, run by the outbox dispatcher"""
+from events.bus import handles
+from messaging.realtime import group_send, user_group
+
+@handles('subscription.created', 'subscription.cancelled', 'subscription.reactivated')
+def notify_creator(event):
+    """Tell the creator's open sockets about a subscriber change"""
+    group_send(user_group(event.payload['creator_user']), {
+        'type': 'subscription.changed',
+        'event': event.event_type,
+        'subscription': int(event.aggregate_id),
+        'subscriber': event.payload['subscriber'],
+    })
@@ -0,0 +1,99 @@
+"""Local subscription state changes, after Stripe has accepted them.
+
+Each change is one transaction: the subscription row, the creator's
+subscriber count (an F() update, so concurrent changes don't lose
+counts), the history record and an outbox event are written together or
+not at all. Cancel and reactivate only apply from the right status, so
+a repeated or concurrent request changes nothing and counts nothing twice.
+Stripe calls stay outside the transaction, in the views.
+"""
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from creators.models import Creator
+from events.bus import publish
+from .models import Subscription, SubscriptionHistory
+
+def event_payload(subscription, creator):
+    return {
+        'subscriber': subscription.subscriber_id,
+        'creator': creator.pk,
+        'creator_user': creator.user_id,
+        'price': subscription.price,
+        'status': subscription.status,
+    }
+
+def adjust_subscriber_count(creator_id, delta):
+    # updated_at moves too, so creator ETags change with the count
+    Creator.objects.filter(pk=creator_id).update(
+        subscriber_count=F('subscriber_count') + delta,
+        updated_at=timezone.now()
+    )
+
+def record_subscription(subscriber, creator, stripe_subscription):
+    """Store a subscription Stripe has created"""
+    with transaction.atomic():
+        subscription = Subscription.objects.create(
+            subscriber=subscriber,
+            creator=creator,
+            stripe_subscription_id=stripe_subscription.id,
+            status='active' if stripe_subscription.status == 'active' else 'pending',
+            price=creator.subscription_price,
+            current_period_start=timezone.datetime.fromtimestamp(
+                stripe_subscription.current_period_start, tz=dt_timezone.utc
+            ),
+            current_period_end=timezone.datetime.fromtimestamp(
+                stripe_subscription.current_period_end, tz=dt_timezone.utc
+            )
+        )
+        adjust_subscriber_count(creator.pk, 1)
+        SubscriptionHistory.objects.create(
+            subscription=subscription,
+            action='created',
+            amount=creator.subscription_price,
+            notes='Subscription created successfully'
+        )
+        publish('subscription', subscription.pk, 'subscription.created', event_payload(subscription, creator))
+    return subscription
+
+def record_cancellation(subscription):
+    """Mark a subscription cancelled; False if it already was"""
+    now = timezone.now()
+    with transaction.atomic():
+        changed = Subscription.objects.filter(
+            pk=subscription.pk, status__in=['active', 'pending']
+        ).update(status='cancelled', cancelled_at=now)
+        if not changed:
+            return False
+        subscription.status, subscription.cancelled_at = 'cancelled', now
+        adjust_subscriber_count(subscription.creator_id, -1)
+        SubscriptionHistory.objects.create(
+            subscription=subscription,
+            action='cancelled',
+            notes='Subscription cancelled by user'
+        )
+        publish('subscription', subscription.pk, 'subscription.cancelled',
+                event_payload(subscription, subscription.creator))
+    return True
+
+def record_reactivation(subscription):
+    """Mark a cancelled subscription active again; False if it wasn't cancelled"""
+    with transaction.atomic():
+        changed = Subscription.objects.filter(
+            pk=subscription.pk, status='cancelled'
+        ).update(status='active', cancelled_at=None)
+        if not changed:
+            return False
+        subscription.status, subscription.cancelled_at = 'active', None
+        adjust_subscriber_count(subscription.creator_id, 1)
+        SubscriptionHistory.objects.create(
+            subscription=subscription,
+            action='reactivated',
+            notes='Subscription reactivated by user'
+        )
+        publish('subscription', subscription.pk, 'subscription.reactivated',
+                event_payload(subscription, subscription.creator))
+    return True
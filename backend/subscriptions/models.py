@@ -38,6 +38,10 @@ class Subscription(models.Model):
     class Meta:
         unique_together = ['subscriber', 'creator']
         ordering = ['-created_at']
+        indexes = [
+            # Walk a creator's subscribers in id order (broadcasts, payouts)
+            models.Index(fields=['creator', 'status', 'subscriber'], name='subscription_creator_status'),
+        ]
     
     def __str__(self):
         return f"{self.subscriber.username} -> {self.creator.display_name}"
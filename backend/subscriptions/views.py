@@ -1,10 +1,15 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from django.utils import timezone
-from datetime import timedelta
-import stripe
-from django.conf import settings
+from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from creator_platform.async_api import async_api_view
+from creator_platform.db_router import ReplicaReadMixin
+from creator_platform.ratelimit import ScopedRateLimit
+from payments.fees import to_cents
+from payments.stripe_async import modify_subscription
+from payments.stripe_client import stripe
+from .lifecycle import record_cancellation, record_reactivation, record_subscription
 from .models import Subscription, SubscriptionHistory
 from .serializers import (
     SubscriptionSerializer,
@@ -13,10 +18,7 @@ from .serializers import (
     SubscriptionHistorySerializer
 )
 
-# Set Stripe API key
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-class MySubscriptionsView(generics.ListAPIView):
+class MySubscriptionsView(ReplicaReadMixin, generics.ListAPIView):
     """List user's subscriptions"""
     serializer_class = MySubscriptionsSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -28,6 +30,8 @@ class SubscriptionCreateView(generics.CreateAPIView):
     """Create a new subscription"""
     serializer_class = SubscriptionCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateLimit]
+    throttle_scope = 'checkout'
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -62,7 +66,7 @@ class SubscriptionCreateView(generics.CreateAPIView):
                         'product_data': {
                             'name': f'Subscription to {creator.display_name}',
                         },
-                        'unit_amount': int(creator.subscription_price * 100),  # Convert to cents
+                        'unit_amount': to_cents(creator.subscription_price),
                         'recurring': {
                             'interval': 'month',
                         },
@@ -72,32 +76,9 @@ class SubscriptionCreateView(generics.CreateAPIView):
                 expand=['latest_invoice.payment_intent'],
             )
             
-            # Create local subscription record
-            subscription = Subscription.objects.create(
-                subscriber=subscriber,
-                creator=creator,
-                stripe_subscription_id=stripe_subscription.id,
-                status='active' if stripe_subscription.status == 'active' else 'pending',
-                price=creator.subscription_price,
-                current_period_start=timezone.datetime.fromtimestamp(
-                    stripe_subscription.current_period_start, tz=timezone.utc
-                ),
-                current_period_end=timezone.datetime.fromtimestamp(
-                    stripe_subscription.current_period_end, tz=timezone.utc
-                )
-            )
-            
-            # Update creator subscriber count
-            creator.subscriber_count += 1
-            creator.save()
-            
-            # Create subscription history record
-            SubscriptionHistory.objects.create(
-                subscription=subscription,
-                action='created',
-                amount=creator.subscription_price,
-                notes='Subscription created successfully'
-            )
+            # Subscription, counter, history and event in one transaction
+            subscription = record_subscription(subscriber, creator, stripe_subscription)
+            creator.refresh_from_db(fields=['subscriber_count', 'updated_at'])
             
             return Response({
                 'subscription': SubscriptionSerializer(subscription).data,
@@ -117,94 +98,66 @@ class SubscriptionDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return Subscription.objects.filter(subscriber=self.request.user)
 
-@api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
-def cancel_subscription(request, subscription_id):
+@async_api_view(methods=['POST'], authenticated=True)
+async def cancel_subscription(request, subscription_id):
     """Cancel a subscription"""
     try:
-        subscription = Subscription.objects.get(
+        subscription = await Subscription.objects.select_related('creator').aget(
             id=subscription_id,
             subscriber=request.user
         )
         
-        # Cancel in Stripe
-        stripe.Subscription.modify(
+        # Cancel in Stripe, off the event loop
+        await modify_subscription(
             subscription.stripe_subscription_id,
             cancel_at_period_end=True
         )
         
-        # Update local record
-        subscription.status = 'cancelled'
-        subscription.cancelled_at = timezone.now()
-        subscription.save()
-        
-        # Update creator subscriber count
-        subscription.creator.subscriber_count -= 1
-        subscription.creator.save()
-        
-        # Create history record
-        SubscriptionHistory.objects.create(
-            subscription=subscription,
-            action='cancelled',
-            notes='Subscription cancelled by user'
-        )
+        # Local record, counter, history and event in one transaction
+        await sync_to_async(record_cancellation)(subscription)
         
-        return Response({
+        return {
             'message': 'Subscription cancelled successfully'
-        })
+        }
         
     except Subscription.DoesNotExist:
-        return Response({
+        return JsonResponse({
             'error': 'Subscription not found'
         }, status=status.HTTP_404_NOT_FOUND)
     except stripe.error.StripeError as e:
-        return Response({
+        return JsonResponse({
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
-def reactivate_subscription(request, subscription_id):
+@async_api_view(methods=['POST'], authenticated=True)
+async def reactivate_subscription(request, subscription_id):
     """Reactivate a cancelled subscription"""
     try:
-        subscription = Subscription.objects.get(
+        subscription = await Subscription.objects.select_related('creator').aget(
             id=subscription_id,
             subscriber=request.user,
             status='cancelled'
         )
         
-        # Reactivate in Stripe
-        stripe.Subscription.modify(
+        # Reactivate in Stripe, off the event loop
+        await modify_subscription(
             subscription.stripe_subscription_id,
             cancel_at_period_end=False
         )
         
-        # Update local record
-        subscription.status = 'active'
-        subscription.cancelled_at = None
-        subscription.save()
-        
-        # Update creator subscriber count
-        subscription.creator.subscriber_count += 1
-        subscription.creator.save()
+        # Local record, counter, history and event in one transaction
+        await sync_to_async(record_reactivation)(subscription)
         
-        # Create history record
-        SubscriptionHistory.objects.create(
-            subscription=subscription,
-            action='reactivated',
-            notes='Subscription reactivated by user'
-        )
-        
-        return Response({
+        return {
             'message': 'Subscription reactivated successfully'
-        })
+        }
         
     except Subscription.DoesNotExist:
-        return Response({
+        return JsonResponse({
             'error': 'Subscription not found or not cancelled'
         }, status=status.HTTP_404_NOT_FOUND)
     except stripe.error.StripeError as e:
-        return Response({
+        return JsonResponse({
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 